@@ -0,0 +1,228 @@
+# admission.py
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Iterable, Optional
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Controle de admissão na frente do pipeline de classificação.
+
+    Até `max_concurrent` requisições rodam ao mesmo tempo; as seguintes esperam
+    em uma fila FIFO de no máximo `max_queue` posições, por até `queue_timeout`
+    segundos. Fila cheia ou espera esgotada resultam em 503, e um cliente com
+    `per_client_limit` requisições em andamento (rodando ou na fila) recebe 429.
+    As rejeições trazem `Retry-After`, estimado pelo tempo médio de serviço e
+    pela profundidade da fila.
+    """
+
+    # Peso da última amostra na média móvel do tempo de serviço
+    SERVICE_TIME_ALPHA = 0.1
+
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64, per_client_limit: int = 8,
+                 queue_timeout: float = 10.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.per_client_limit = max(0, per_client_limit)
+        self.queue_timeout = queue_timeout
+
+        self.running = 0
+        self._waiters: deque = deque()
+        self._clients: Dict[str, int] = {}
+        self.service_time = 0.0
+
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_client_limit": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "max_queue_depth": 0
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Segundos até a fila atual provavelmente ter sido atendida (mínimo 1)"""
+        pending = self.queue_depth + self.running
+        return max(1, math.ceil(self.service_time * pending / self.max_concurrent))
+
+    def _reject(self, status_code: int, stat: str, detail: str) -> AdmissionRejected:
+        self.stats[stat] += 1
+        return AdmissionRejected(status_code, detail, self.retry_after())
+
+    async def acquire(self, client: str):
+        """Ocupa uma vaga de execução, esperando na fila se preciso; levanta AdmissionRejected"""
+        if self.per_client_limit and self._clients.get(client, 0) >= self.per_client_limit:
+            raise self._reject(429, "rejected_client_limit", "Muitas requisições simultâneas deste cliente")
+
+        if self.running < self.max_concurrent and not self._waiters:
+            self.running += 1
+            self._add_client(client)
+        else:
+            if self.queue_depth >= self.max_queue:
+                raise self._reject(503, "rejected_queue_full", "Servidor sobrecarregado. Tente novamente em instantes")
+
+            # Na fila já conta para o limite do cliente
+            self._add_client(client)
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.stats["queued"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # A vaga chegou junto com o timeout/cancelamento: devolve para o próximo
+                    self._release_slot()
+                else:
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+                self._remove_client(client)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise self._reject(503, "rejected_queue_timeout", "Tempo de espera na fila esgotado. Tente novamente")
+
+        self.stats["admitted"] += 1
+
+    def _add_client(self, client: str):
+        self._clients[client] = self._clients.get(client, 0) + 1
+
+    def _remove_client(self, client: str):
+        count = self._clients.get(client, 0) - 1
+        if count > 0:
+            self._clients[client] = count
+        else:
+            self._clients.pop(client, None)
+
+    def release(self, client: str, service_time: float):
+        self._remove_client(client)
+        self.service_time += self.SERVICE_TIME_ALPHA * (service_time - self.service_time)
+        self._release_slot()
+
+    def _release_slot(self):
+        # A vaga passa direto para o próximo da fila, sem voltar ao contador
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "per_client_limit": self.per_client_limit,
+            "queue_timeout_s": self.queue_timeout,
+            "clients": len(self._clients),
+            "avg_service_time": round(self.service_time, 4),
+            **self.stats
+        }
+
+    def prometheus(self) -> str:
+        """Profundidade da fila e rejeições no formato texto do Prometheus"""
+        lines = [
+            "# HELP email_classifier_admission_running Requisições de classificação em execução.",
+            "# TYPE email_classifier_admission_running gauge",
+            f"email_classifier_admission_running {self.running}",
+            "# HELP email_classifier_admission_queue_depth Requisições esperando vaga.",
+            "# TYPE email_classifier_admission_queue_depth gauge",
+            f"email_classifier_admission_queue_depth {self.queue_depth}",
+            "# HELP email_classifier_admission_admitted_total Requisições admitidas.",
+            "# TYPE email_classifier_admission_admitted_total counter",
+            f"email_classifier_admission_admitted_total {self.stats['admitted']}",
+            "# HELP email_classifier_admission_rejected_total Requisições recusadas por motivo.",
+            "# TYPE email_classifier_admission_rejected_total counter"
+        ]
+        for reason in ("client_limit", "queue_full", "queue_timeout"):
+            lines.append(f'email_classifier_admission_rejected_total{{reason="{reason}"}} {self.stats[f"rejected_{reason}"]}')
+        return "\n".join(lines) + "\n"
+
+
+class AdmissionMiddleware:
+    """Aplica o controle de admissão antes de o corpo da requisição ser lido.
+
+    Recusas não chegam a receber o upload nem o JSON, então o excesso de carga
+    não acumula memória dentro do worker. O cliente é o IP da conexão ou, com
+    `trust_forwarded`, o primeiro endereço do X-Forwarded-For.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str], trust_forwarded: bool = False):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+        self.trust_forwarded = trust_forwarded
+
+    def _client(self, scope) -> str:
+        if self.trust_forwarded:
+            forwarded = dict(scope["headers"]).get(b"x-forwarded-for")
+            if forwarded:
+                return forwarded.split(b",")[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        # Chegada antes da fila: o prazo da requisição conta a espera por uma vaga
+        scope.setdefault("state", {})["arrived_at"] = time.time()
+        client = self._client(scope)
+        try:
+            await self.controller.acquire(client)
+        except AdmissionRejected as e:
+            logger.warning(f"🚦 {scope['path']} recusado ({e.status_code}) para {client}: {e.detail}")
+            response = JSONResponse(
+                status_code=e.status_code,
+                content={"status": "error", "error": e.detail, "message": "Erro na requisição"},
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(client, time.perf_counter() - started)
+
+
+def create_admission_controller() -> Optional[AdmissionController]:
+    """Cria o controle de admissão a partir das variáveis de ambiente (None se desligado)."""
+    if os.getenv("ADMISSION_ENABLED", "true").lower() != "true":
+        return None
+
+    controller = AdmissionController(
+        max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "16")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+        per_client_limit=int(os.getenv("ADMISSION_PER_CLIENT_LIMIT", "8")),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "10"))
+    )
+    logger.info(
+        f"🚦 Admissão: {controller.max_concurrent} simultâneas, fila de {controller.max_queue}, "
+        f"{controller.per_client_limit or 'sem limite'} por cliente"
+    )
+    return controller
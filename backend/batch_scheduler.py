@@ -0,0 +1,172 @@
+# batch_scheduler.py
+import asyncio
+import time
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatchScheduler:
+    """Agrupa requisições concorrentes em micro-lotes para inferência.
+
+    Até `max_in_flight` lotes rodam ao mesmo tempo (por padrão, um por worker
+    do executor); com todos ocupados, os itens seguintes se acumulam no
+    próximo lote.
+    """
+
+    BATCH_SIZE_BUCKETS = ((1, "1"), (4, "2-4"), (8, "5-8"), (16, "9-16"), (32, "17-32"))
+
+    def __init__(self, executor, max_batch_size: int = 16, max_wait_ms: float = 5.0, max_in_flight: int = None):
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_in_flight = max(1, max_in_flight or getattr(executor, "max_workers", 1))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+        self.stats = {
+            "total_batches": 0,
+            "total_items": 0,
+            "largest_batch": 0,
+            "total_queue_wait": 0.0,
+            "max_queue_wait": 0.0,
+            "batch_size_distribution": {label: 0 for _, label in self.BATCH_SIZE_BUCKETS + ((None, "33+"),)}
+        }
+
+    def start(self):
+        """Inicia o consumidor da fila no event loop atual."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+            logger.info(
+                f"📦 Micro-batching ativo (lote máx: {self.max_batch_size}, espera máx: {self.max_wait * 1000:.1f}ms, "
+                f"{self.max_in_flight} lote(s) simultâneo(s))"
+            )
+
+    async def stop(self):
+        """Encerra o consumidor e falha as requisições pendentes."""
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        for task in self._in_flight:
+            task.cancel()
+        await asyncio.gather(self._worker, *self._in_flight, return_exceptions=True)
+        self._worker = None
+        self._in_flight.clear()
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Scheduler encerrado"))
+
+    async def classify(self, text: str) -> Dict[str, Any]:
+        """Enfileira um email e aguarda o resultado do lote em que ele entrar."""
+        self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        while True:
+            # Só monta o próximo lote quando há um worker livre para ele
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not batch:
+                self._slots.release()
+                continue
+
+            self._record_batch(batch, time.perf_counter())
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        texts = [text for text, _, _ in batch]
+        try:
+            results = await self.executor.classify_batch(texts)
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                logger.error(f"Erro no lote de classificação: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e if isinstance(e, Exception) else RuntimeError("Scheduler encerrado"))
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        finally:
+            self._slots.release()
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future, float]]:
+        """Aguarda o primeiro item e agrega os seguintes até o tamanho ou tempo máximo."""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+
+            getter = asyncio.ensure_future(self._queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=remaining)
+            if getter in done:
+                batch.append(getter.result())
+            else:
+                getter.cancel()
+                break
+
+        # Descarta itens cujo chamador já desistiu
+        return [item for item in batch if not item[1].done()]
+
+    def _record_batch(self, batch, dispatched_at: float):
+        size = len(batch)
+        self.stats["total_batches"] += 1
+        self.stats["total_items"] += size
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], size)
+
+        for _, _, enqueued_at in batch:
+            wait = dispatched_at - enqueued_at
+            self.stats["total_queue_wait"] += wait
+            self.stats["max_queue_wait"] = max(self.stats["max_queue_wait"], wait)
+
+        label = next((label for limit, label in self.BATCH_SIZE_BUCKETS if size <= limit), "33+")
+        self.stats["batch_size_distribution"][label] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas de tamanho de lote e tempo de espera na fila."""
+        batches = self.stats["total_batches"]
+        items = self.stats["total_items"]
+
+        return {
+            "enabled": True,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "max_in_flight": self.max_in_flight,
+            "in_flight": len(self._in_flight),
+            "total_batches": batches,
+            "total_items": items,
+            "average_batch_size": round(items / batches, 3) if batches else 0.0,
+            "largest_batch": self.stats["largest_batch"],
+            "average_queue_wait_ms": round(self.stats["total_queue_wait"] / items * 1000, 3) if items else 0.0,
+            "max_queue_wait_ms": round(self.stats["max_queue_wait"] * 1000, 3),
+            "pending": self._queue.qsize() if self._queue else 0,
+            "batch_size_distribution": dict(self.stats["batch_size_distribution"])
+        }
@@ -0,0 +1,119 @@
+# bench_preprocess.py
+"""Micro-benchmark de TextProcessor.preprocess contra a implementação anterior.
+
+Antes de medir, confere que a saída é idêntica byte a byte em um corpus de
+regressão (casos de borda fixos + emails sintéticos gerados com semente fixa):
+
+    python benchmarks/bench_preprocess.py
+    python benchmarks/bench_preprocess.py --samples 5000 --repeat 5
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_processor import TextProcessor
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "Olá, estou com um PROBLEMA no sistema!!! Erro 500 ao salvar.",
+    "Contato: joao.silva@empresa.com.br ou (11) 91234-5678, site https://exemplo.com/a?b=1",
+    "e-mail de-para auto-atendimento pós-venda a-b-c -x y- --z",
+    "abc(11) 91234-5678def junta palavras quando o telefone some",
+    "htx@y.comtp://a.b remoção encadeada de email e url",
+    "Ünïcödé: ÀÉÎÕÜ ção ÇÃO ß ÿ Ø × ÷ ª º µ ğ ş ł 東京 é K",
+    "snake_case_words e números 123 4567 12-34 a1b2",
+    "Reembolsos solicitações pedidos status andamentos assistências",
+    "Obrigado!!! Feliz Natal e um próspero Ano Novo 🎄🎉",
+    "tabs\tand\nnewlines\r\nand nbsp em-space",
+]
+
+WORDS = [
+    "problema", "erro", "sistema", "login", "senha", "pagamento", "reembolso", "pedido",
+    "obrigado", "parabéns", "feliz", "natal", "ano", "novo", "para", "com", "que", "os",
+    "Urgente", "ATUALIZAÇÃO", "transações", "acesso", "ajuda", "suporte", "fatura", "boletos",
+    "pós-venda", "auto-atendimento", "não", "você", "está", "fim-de-semana", "123", "R$", "50,00",
+]
+SEPARATORS = [" ", " ", " ", ", ", ". ", "! ", "? ", "\n", " - ", "; ", ": ", "/", "(", ")", "\"", " #"]
+INSERTS = ["cliente{n}@empresa.com", "https://portal.exemplo.com/pedido/{n}", "(11) 9{n:04d}-1234", "protocolo {n}"]
+
+
+def legacy_preprocess(processor: TextProcessor, text: str) -> str:
+    """preprocess() antes da passada única: limpeza em várias etapas e listas intermediárias."""
+    if not text or not isinstance(text, str):
+        return ""
+
+    text = processor.patterns['email'].sub("", text)
+    text = processor.patterns['url'].sub("", text)
+    text = processor.patterns['phone'].sub("", text)
+    text = re.sub(r"[^0-9A-Za-zÀ-ÖØ-öø-ÿ!?.,\s-]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+
+    tokens = re.findall(r'\b[\wçáàâãéêíóôõú]+(?:-[\w]+)?\b', text.lower())
+    tokens = [t for t in tokens if t not in processor.stop_words and len(t) > 2]
+    tokens = [processor._simple_lemmatize(t) for t in tokens]
+    return " ".join(tokens)
+
+
+def build_corpus(samples: int, seed: int = 42):
+    rnd = random.Random(seed)
+    corpus = list(EDGE_CASES)
+
+    for n in range(samples):
+        length = rnd.choice((5, 20, 80, 300, 1500))
+        parts = []
+        for _ in range(length):
+            if rnd.random() < 0.02:
+                parts.append(rnd.choice(INSERTS).format(n=rnd.randint(0, 9999)))
+            else:
+                word = rnd.choice(WORDS)
+                parts.append(word.upper() if rnd.random() < 0.05 else word)
+            parts.append(rnd.choice(SEPARATORS))
+        corpus.append("".join(parts))
+
+    return corpus
+
+
+def timed(function, corpus, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            function(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de TextProcessor.preprocess")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    processor = TextProcessor()
+    corpus = build_corpus(args.samples, args.seed)
+
+    mismatches = [text for text in corpus if processor.preprocess(text) != legacy_preprocess(processor, text)]
+    if mismatches:
+        print(f"❌ {len(mismatches)} divergências; primeira: {mismatches[0][:200]!r}")
+        return 1
+
+    total_chars = sum(len(text) for text in corpus)
+    legacy = timed(lambda text: legacy_preprocess(processor, text), corpus, args.repeat)
+    fused = timed(processor.preprocess, corpus, args.repeat)
+
+    print(f"✅ Saída idêntica em {len(corpus)} textos ({total_chars / 1e6:.1f} M caracteres)")
+    print(f"legado:  {legacy * 1000:8.1f} ms  ({total_chars / legacy / 1e6:6.2f} M caracteres/s)")
+    print(f"fundido: {fused * 1000:8.1f} ms  ({total_chars / fused / 1e6:6.2f} M caracteres/s)")
+    print(f"ganho:   {legacy / fused:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
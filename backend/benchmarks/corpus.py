@@ -0,0 +1,155 @@
+# corpus.py
+"""Corpus sintético e determinístico de emails em português para os benchmarks.
+
+A mesma semente gera sempre os mesmos emails e os mesmos PDFs, em qualquer
+máquina, para que os resultados sejam comparáveis entre execuções.
+"""
+import random
+from typing import Dict, List
+
+from models import EmailCategory
+
+GREETINGS = ["Olá", "Bom dia", "Boa tarde", "Prezados", "Caro suporte", "Oi, tudo bem?", "Prezada equipe"]
+CLOSINGS = ["Atenciosamente", "Obrigado", "Abraços", "Aguardo retorno", "Cordialmente", "Att"]
+NAMES = ["João Silva", "Maria Souza", "Ana Costa", "Pedro Lima", "Carla Mendes", "Rafael Alves"]
+
+TOPICS = {
+    "suporte técnico": (EmailCategory.PRODUTIVO, [
+        "Estou com um problema no sistema desde ontem e aparece erro {code} ao salvar.",
+        "O aplicativo trava quando tento gerar o relatório mensal, preciso de ajuda urgente.",
+        "Depois da atualização o sistema não funciona no navegador e a tela fica em branco.",
+        "Poderiam verificar a falha na integração? O serviço retorna erro {code} intermitente."
+    ]),
+    "financeiro": (EmailCategory.PRODUTIVO, [
+        "A fatura {ref} veio com valor errado, o pagamento foi cobrado em duplicidade.",
+        "Solicito o reembolso da transação {ref} que não foi reconhecida.",
+        "Preciso da segunda via do boleto com vencimento em {day}/{month}.",
+        "O pagamento via cartão foi recusado mas o valor de R$ {amount},00 saiu da conta."
+    ]),
+    "pedidos": (EmailCategory.PRODUTIVO, [
+        "Gostaria de saber o status do meu pedido {ref}, o prazo de entrega já passou.",
+        "Qual o andamento da solicitação {ref}? Não recebi nenhuma atualização do protocolo.",
+        "O produto chegou com defeito, como faço para solicitar a troca do pedido {ref}?",
+        "Favor confirmar o recebimento da documentação enviada para o processo {ref}."
+    ]),
+    "acesso": (EmailCategory.PRODUTIVO, [
+        "Não consigo fazer login, a senha não é aceita e o acesso está bloqueado.",
+        "Preciso redefinir a senha do usuário {ref}, o link de recuperação expirou.",
+        "Solicito liberação de acesso ao módulo financeiro para a nova colaboradora."
+    ]),
+    "agradecimento": (EmailCategory.IMPRODUTIVO, [
+        "Muito obrigado pelo excelente atendimento de ontem, resolveram tudo rapidamente.",
+        "Agradeço a atenção e a paciência da equipe durante todo o processo.",
+        "Quero registrar meu agradecimento pelo suporte, foi ótimo trabalhar com vocês."
+    ]),
+    "felicitações": (EmailCategory.IMPRODUTIVO, [
+        "Feliz Natal a toda a equipe e um próspero Ano Novo!",
+        "Parabéns pelo aniversário da empresa, desejamos muito sucesso.",
+        "Boas festas! Que o próximo ano seja repleto de conquistas para todos.",
+        "Desejo um ótimo fim de semana e um feriado tranquilo a todos."
+    ]),
+    "social": (EmailCategory.IMPRODUTIVO, [
+        "Só passando para dar um oi e saber como estão as coisas por aí.",
+        "Foi um prazer conhecer vocês no evento da semana passada.",
+        "Segue a foto da confraternização, ficou muito boa!"
+    ])
+}
+
+FILLERS = [
+    "Fico no aguardo de um retorno assim que possível.",
+    "Segue em anexo a documentação para análise.",
+    "Caso precisem de mais informações, estou à disposição pelo telefone (11) 9{phone}-1234.",
+    "Meu email de contato é cliente{n}@empresa.com.br.",
+    "Mais detalhes em https://portal.exemplo.com/chamados/{ref}.",
+    "Conforme conversamos na reunião, reforço os pontos abaixo.",
+    "Desde já agradeço pela atenção.",
+    "Esse assunto já foi tratado anteriormente sem solução definitiva."
+]
+
+# Número de frases do corpo e a fração do corpus com cada tamanho
+LENGTHS = {"curto": (1, 0.35), "médio": (4, 0.35), "longo": (15, 0.2), "muito longo": (60, 0.1)}
+
+
+def _fill(template: str, rnd: random.Random) -> str:
+    return template.format(
+        code=rnd.choice([400, 401, 403, 404, 500, 502, 503]),
+        ref=f"{rnd.randint(10000, 99999)}",
+        day=f"{rnd.randint(1, 28):02d}",
+        month=f"{rnd.randint(1, 12):02d}",
+        amount=rnd.randint(20, 5000),
+        phone=f"{rnd.randint(0, 9999):04d}",
+        n=rnd.randint(1, 999)
+    )
+
+
+def generate_emails(count: int, seed: int = 42) -> List[Dict[str, str]]:
+    """Emails sintéticos com tópico, categoria esperada e tamanho variados"""
+    rnd = random.Random(seed)
+    topics = sorted(TOPICS)
+    length_names = list(LENGTHS)
+    length_weights = [weight for _, weight in LENGTHS.values()]
+
+    emails = []
+    for _ in range(count):
+        topic = rnd.choice(topics)
+        category, sentences = TOPICS[topic]
+        length = rnd.choices(length_names, weights=length_weights)[0]
+        body_size = LENGTHS[length][0]
+
+        body = [_fill(rnd.choice(sentences), rnd)]
+        for _ in range(body_size - 1):
+            pool = sentences if rnd.random() < 0.5 else FILLERS
+            body.append(_fill(rnd.choice(pool), rnd))
+
+        text = f"{rnd.choice(GREETINGS)},\n\n{' '.join(body)}\n\n{rnd.choice(CLOSINGS)},\n{rnd.choice(NAMES)}"
+        emails.append({"text": text, "topic": topic, "category": category.value, "length": length})
+
+    return emails
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, seed: int = 42, lines_per_page: int = 45) -> bytes:
+    """PDF de várias páginas (Helvetica, WinAnsi) com texto do corpus, sem dependências externas"""
+    rnd = random.Random(seed)
+    lines = []
+    for email in generate_emails(pages * 8, seed):
+        for paragraph in email["text"].split("\n"):
+            words = paragraph.split()
+            while words:
+                lines.append(" ".join(words[:14]))
+                words = words[14:]
+
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    ]
+    kids = []
+    for page in range(pages):
+        start = rnd.randrange(0, max(1, len(lines) - lines_per_page))
+        page_lines = lines[start:start + lines_per_page]
+        content = "BT /F1 10 Tf 40 800 Td 16 TL " + " ".join(f"({_pdf_string(line)}) '" for line in page_lines) + " ET"
+        stream = content.encode("cp1252", errors="replace")
+        objects.append((f"<< /Length {len(stream)} >>\nstream\n".encode("ascii") + stream + b"\nendstream"))
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        body = body if isinstance(body, bytes) else body.encode("ascii")
+        output += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    output += b"".join(f"{offset:010d} 00000 n \n".encode("ascii") for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(output)
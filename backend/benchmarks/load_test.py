@@ -0,0 +1,313 @@
+# load_test.py
+"""Teste de carga local: varre níveis de concorrência e tamanhos de payload.
+
+Para cada combinação de endpoint (/classify, /classify/file, /upload),
+tamanho de payload e concorrência, mantém N clientes em laço fechado pelo
+tempo configurado e mede vazão, latência p50/p99, taxa de erro e pico de RSS
+do servidor. No fim imprime a curva de saturação (vazão x concorrência) de
+cada endpoint e grava tudo em JSON.
+
+    # App importado no próprio processo (sem rede, sem modelos)
+    python benchmarks/load_test.py
+    # uvicorn local iniciado pelo script, mais próximo da produção
+    python benchmarks/load_test.py --uvicorn --concurrency 1,4,16,64 --duration 20
+    # Servidor já em execução (RSS só com --server-pid)
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --server-pid 1234
+
+Por padrão o app sobe só com as regras (USE_ML_MODELS=false, HF_HUB_OFFLINE=1),
+então roda sem rede; com --ml valem as variáveis de modelo do ambiente
+(INFERENCE_BACKEND, ONNX_MODEL_DIR...). Cada requisição leva um sufixo único
+para não ser respondida pelo cache de resultados.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import itertools
+import threading
+import subprocess
+from typing import Dict, Any, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+from corpus import generate_emails, make_pdf
+from memory_stats import process_memory
+
+ENDPOINTS = ("/classify", "/classify/file", "/upload")
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "benchmarks", "results", "load_test.json")
+
+# Ganho mínimo de vazão ao dobrar a concorrência para não considerar o app saturado
+SATURATION_GAIN = 0.10
+
+
+def build_payloads(size_kb: float, variants: int, seed: int, pdf_pages: int = 0) -> List[Dict[str, Any]]:
+    """Textos distintos de ~size_kb (e o PDF, se pedido) gerados a partir do corpus"""
+    emails = itertools.cycle(email["text"] for email in generate_emails(variants * 4, seed))
+    target = int(size_kb * 1024)
+
+    payloads = []
+    for _ in range(variants):
+        parts, length = [], 0
+        while length < target:
+            part = next(emails)
+            parts.append(part)
+            length += len(part.encode("utf-8")) + 2
+        payloads.append({"text": "\n\n".join(parts)[:target]})
+
+    if pdf_pages:
+        pdf = make_pdf(pdf_pages, seed)
+        for payload in payloads:
+            payload["pdf"] = pdf
+    return payloads
+
+
+def build_request(endpoint: str, payload: Dict[str, Any], sequence: int) -> Dict[str, Any]:
+    text = f"{payload['text']}\n\nRef. {sequence}"
+    if endpoint == "/classify":
+        return {"json": {"text": text}}
+    if payload.get("pdf"):
+        return {"files": {"file": ("carga.pdf", payload["pdf"], "application/pdf")}}
+    return {"files": {"file": ("carga.txt", text.encode("utf-8"), "text/plain")}}
+
+
+class RSSSampler:
+    """Pico de RSS de um processo, lido em intervalo fixo numa thread própria"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _read(self):
+        try:
+            self.peak = max(self.peak, process_memory(self.pid)["rss"])
+        except OSError:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._read()
+
+    def __enter__(self):
+        if self.pid is not None:
+            self._read()
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.pid is not None:
+            self._stop.set()
+            self._thread.join()
+            self._read()
+        return False
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_setting(client: httpx.AsyncClient, endpoint: str, payloads: List[Dict[str, Any]],
+                      concurrency: int, duration: float, server_pid: Optional[int]) -> Dict[str, Any]:
+    """Mantém `concurrency` clientes em laço fechado por `duration` segundos"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    sequence = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int):
+        while time.perf_counter() < deadline:
+            number = next(sequence)
+            request = build_request(endpoint, payloads[number % len(payloads)], number)
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, **request)
+                if response.status_code >= 400:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+    with RSSSampler(server_pid) as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    failed = sum(errors.values())
+    total = len(latencies) + failed
+    return {
+        "requests": total,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "errors": errors,
+        "peak_rss_mb": round(rss.peak / (1024 * 1024), 1) if server_pid is not None else None
+    }
+
+
+def saturation_point(curve: List[Dict[str, Any]]) -> Optional[int]:
+    """Menor concorrência a partir da qual aumentar a carga não rende mais vazão"""
+    for previous, current in zip(curve, curve[1:]):
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 + SATURATION_GAIN):
+            return previous["concurrency"]
+    return None
+
+
+def print_curve(name: str, curve: List[Dict[str, Any]]):
+    peak = max((point["throughput_rps"] for point in curve), default=0) or 1
+    saturated_at = saturation_point(curve)
+    print(f"\n📈 {name}" + (f" (satura em ~{saturated_at} clientes)" if saturated_at else ""))
+    for point in curve:
+        bar = "█" * int(40 * point["throughput_rps"] / peak)
+        print(f"  {point['concurrency']:4d} | {bar:40s} {point['throughput_rps']:8.1f} req/s  p99 {point['p99_ms']:8.1f} ms")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env}
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn encerrou com código {server.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("uvicorn não respondeu ao /health em 120s")
+
+
+async def run(args, app_env: Dict[str, str]) -> Dict[str, Any]:
+    server = app = None
+    server_pid = args.server_pid
+    if args.url:
+        base_url = args.url.rstrip("/")
+    elif args.uvicorn:
+        server, base_url = start_uvicorn(app_env)
+        server_pid = server.pid
+    else:
+        os.environ.update(app_env)
+        os.chdir(BACKEND_DIR)
+        from main import app
+        await app.router.startup()
+        base_url, server_pid = "http://loadtest", os.getpid()
+
+    transport = httpx.ASGITransport(app=app) if app is not None else None
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=args.timeout) as client:
+            for endpoint in args.endpoints:
+                for size_kb in args.payload_kb:
+                    payloads = build_payloads(size_kb, args.variants, args.seed, args.pdf_pages)
+                    for concurrency in args.concurrency:
+                        result = await run_setting(client, endpoint, payloads, concurrency, args.duration, server_pid)
+                        result.update(endpoint=endpoint, payload_kb=size_kb, concurrency=concurrency)
+                        results.append(result)
+                        print(
+                            f"{endpoint:15s} {size_kb:6.1f} KB  c={concurrency:<4d} {result['throughput_rps']:8.1f} req/s  "
+                            f"p50 {result['p50_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+                            f"erros {result['error_rate']:6.1%}  RSS {result['peak_rss_mb']} MB"
+                        )
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {"target": "url" if args.url else "uvicorn" if args.uvicorn else "inprocess", "results": results}
+
+
+def parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do Email Classifier")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Servidor já em execução (padrão: app no próprio processo)")
+    target.add_argument("--uvicorn", action="store_true", help="Inicia um uvicorn local com o app")
+    parser.add_argument("--server-pid", type=int, help="PID do servidor em --url, para medir o RSS")
+    parser.add_argument("--endpoints", type=lambda value: parse_list(value, str), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=lambda value: parse_list(value, int), default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--payload-kb", type=lambda value: parse_list(value, float), default=[1, 8])
+    parser.add_argument("--pdf-pages", type=int, default=0, help="Envia PDFs com N páginas nos endpoints de arquivo")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos por combinação")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--variants", type=int, default=50, help="Textos distintos por tamanho de payload")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ml", action="store_true", help="Sobe o app com os modelos configurados no ambiente")
+    parser.add_argument("--save", default=DEFAULT_OUTPUT, help="Arquivo JSON de saída")
+    args = parser.parse_args()
+
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Endpoints não suportados: {', '.join(sorted(unknown))}")
+
+    app_env = {"MODEL_BACKGROUND_LOADING": "false"}
+    if not args.ml:
+        app_env.update(USE_ML_MODELS="false", HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+
+    report = asyncio.run(run(args, app_env))
+    report["meta"] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "ml": args.ml,
+        "duration_s": args.duration,
+        "pdf_pages": args.pdf_pages,
+        "seed": args.seed
+    }
+
+    curves = {}
+    for (endpoint, size_kb), points in itertools.groupby(report["results"], key=lambda r: (r["endpoint"], r["payload_kb"])):
+        curve = sorted(points, key=lambda point: point["concurrency"])
+        name = f"{endpoint} {size_kb:g} KB"
+        print_curve(name, curve)
+        curves[name] = {
+            "saturation_concurrency": saturation_point(curve),
+            "max_throughput_rps": max(point["throughput_rps"] for point in curve),
+            "points": [
+                {key: point[key] for key in ("concurrency", "throughput_rps", "p50_ms", "p99_ms", "error_rate")}
+                for point in curve
+            ]
+        }
+    report["saturation_curves"] = curves
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\n💾 Resultados salvos em {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# run_benchmarks.py
+"""Suíte de benchmarks: micro-benchmarks por estágio e classificação ponta a ponta.
+
+Usa o corpus sintético de `corpus.py` (mesma semente, mesmos emails e PDFs),
+grava os resultados em JSON e compara com um baseline, falhando (código 1)
+quando algum benchmark fica mais lento que o limite configurado:
+
+    python benchmarks/run_benchmarks.py --save benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json --threshold 0.15
+    python benchmarks/run_benchmarks.py --ml --only e2e.ml
+
+O modo ML usa as mesmas variáveis do app (INFERENCE_BACKEND, ONNX_MODEL_DIR...).
+"""
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from corpus import generate_emails, make_pdf
+
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, "benchmarks", "results", "latest.json")
+
+# nome -> (função que roda uma vez sobre todos os itens, quantidade de itens)
+Benchmark = Tuple[Callable[[], Any], int]
+
+
+def measure(function: Callable[[], Any], items: int, repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        function()
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+
+    median = statistics.median(runs)
+    return {
+        "items": items,
+        "repeat": repeat,
+        "median_s": median,
+        "min_s": min(runs),
+        "max_s": max(runs),
+        "per_item_us": median / items * 1e6,
+        "items_per_s": items / median if median else 0.0
+    }
+
+
+def text_benchmarks(emails: List[Dict[str, str]]) -> Dict[str, Benchmark]:
+    from text_processor import TextProcessor
+    from response_generator import ResponseGenerator
+    from models import EmailCategory
+
+    processor = TextProcessor()
+    generator = ResponseGenerator()
+    texts = [email["text"] for email in emails]
+    categories = [EmailCategory(email["category"]) for email in emails]
+
+    def preprocess():
+        # Sem o memo de tokens entre execuções: mede o custo de um corpus novo
+        processor._normalized_tokens.clear()
+        for text in texts:
+            processor.preprocess(text)
+
+    return {
+        "text.preprocess": (preprocess, len(texts)),
+        "text.extract_keyword_features": (lambda: [processor.extract_keyword_features(text) for text in texts], len(texts)),
+        "text.detect_topics": (lambda: [processor.detect_topics(text) for text in texts], len(texts)),
+        "response.generate": (
+            lambda: [generator.generate(category, text, {}) for category, text in zip(categories, texts)], len(texts)
+        )
+    }
+
+
+def file_benchmarks(pdf_pages: int, seed: int) -> Dict[str, Benchmark]:
+    from starlette.datastructures import UploadFile
+    from file_processor import FileProcessor
+
+    processor = FileProcessor(max_upload_bytes=1 << 30, max_pdf_pages=pdf_pages, max_text_chars=1 << 30)
+    pdf = make_pdf(pdf_pages, seed)
+    txt = "\n\n".join(email["text"] for email in generate_emails(2000, seed)).encode("utf-8")
+
+    def read_txt():
+        upload = UploadFile(io.BytesIO(txt), size=len(txt), filename="corpus.txt")
+        return asyncio.run(processor._read_text(upload))
+
+    return {
+        "file.pdf_extract": (lambda: processor._extract_pdf_pages(io.BytesIO(pdf)), pdf_pages),
+        "file.txt_read": (read_txt, max(1, len(txt) // (1024 * 1024)))
+    }
+
+
+def classifier_benchmarks(emails: List[Dict[str, str]], ml: bool, batch_size: int) -> Dict[str, Benchmark]:
+    from email_classifier import EmailClassifier
+
+    mode = "ml" if ml else "rules"
+    options: Dict[str, Any] = {"use_ml_models": ml, "background_loading": False}
+    if ml:
+        options.update(
+            inference_backend=os.getenv("INFERENCE_BACKEND", "torch").lower(),
+            onnx_model_dir=os.getenv("ONNX_MODEL_DIR", "models/onnx"),
+            onnx_quantized=os.getenv("ONNX_QUANTIZED", "true").lower() == "true",
+            inference_batch_size=batch_size
+        )
+    classifier = EmailClassifier(**options)
+    if ml and not classifier.models_ready:
+        print(f"⚠️ Modelos não carregaram ({classifier.model_load_error}); benchmarks e2e.ml ignorados")
+        return {}
+
+    texts = [email["text"] for email in emails]
+    batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+
+    benchmarks = {
+        f"e2e.{mode}.classify_batch": (lambda: [classifier.classify_batch(batch) for batch in batches], len(texts)),
+        f"e2e.{mode}.classify": (lambda: [classifier.classify(text) for text in texts[:200]], min(len(texts), 200))
+    }
+
+    if ml:
+        processed = [classifier.text_processor.preprocess(text) for text in texts]
+        processed_batches = [processed[start:start + batch_size] for start in range(0, len(processed), batch_size)]
+        benchmarks["ml.primary_model"] = (
+            lambda: [classifier._primary_classification_batch(batch) for batch in processed_batches], len(texts)
+        )
+        benchmarks["ml.similarity"] = (
+            lambda: [classifier._semantic_similarity_batch(batch) for batch in processed_batches], len(texts)
+        )
+
+    return benchmarks
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Variação do tempo mediano por item de cada benchmark presente nos dois arquivos"""
+    rows = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        change = result["per_item_us"] / previous["per_item_us"] - 1
+        rows.append({
+            "name": name,
+            "baseline_us": previous["per_item_us"],
+            "current_us": result["per_item_us"],
+            "change": change,
+            "regression": change > threshold
+        })
+    return rows
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Email Classifier")
+    parser.add_argument("--samples", type=int, default=1000, help="Emails no corpus sintético")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--pdf-pages", type=int, default=50)
+    parser.add_argument("--ml", action="store_true", help="Inclui os benchmarks com os modelos")
+    parser.add_argument("--only", default="", help="Roda só os benchmarks com este prefixo")
+    parser.add_argument("--save", default=DEFAULT_OUTPUT, help="Arquivo JSON de saída")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.15")),
+                        help="Aumento máximo aceito no tempo por item (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    emails = generate_emails(args.samples, args.seed)
+    benchmarks: Dict[str, Benchmark] = {}
+    benchmarks.update(text_benchmarks(emails))
+    benchmarks.update(file_benchmarks(args.pdf_pages, args.seed))
+    benchmarks.update(classifier_benchmarks(emails, ml=False, batch_size=args.batch_size))
+    if args.ml:
+        benchmarks.update(classifier_benchmarks(emails, ml=True, batch_size=args.batch_size))
+
+    results = {}
+    for name, (function, items) in benchmarks.items():
+        if not name.startswith(args.only):
+            continue
+        results[name] = measure(function, items, args.repeat)
+        print(f"{name:34s} {results[name]['per_item_us']:12.1f} µs/item  {results[name]['items_per_s']:12.1f} itens/s")
+
+    import torch
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "inference_backend": os.getenv("INFERENCE_BACKEND", "torch") if args.ml else None,
+            "samples": args.samples,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "batch_size": args.batch_size,
+            "pdf_pages": args.pdf_pages
+        },
+        "results": results
+    }
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"💾 Resultados salvos em {args.save}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    rows = compare(results, baseline, args.threshold)
+
+    print(f"\nComparação com {args.baseline} (limite: +{args.threshold:.0%})")
+    for row in rows:
+        flag = "❌" if row["regression"] else "✅"
+        print(f"{flag} {row['name']:34s} {row['baseline_us']:10.1f} -> {row['current_us']:10.1f} µs/item ({row['change']:+.1%})")
+
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressão(ões) acima de {args.threshold:.0%}")
+        return 1
+    print("\n✅ Nenhuma regressão")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
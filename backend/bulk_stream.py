@@ -0,0 +1,189 @@
+# bulk_stream.py
+import json
+import time
+import asyncio
+import uuid
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, Any, Optional, List, Tuple
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from text_windows import count_tokens as estimate_tokens, exceeds_char_bound
+
+logger = logging.getLogger(__name__)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse que não disputa o corpo da requisição.
+
+    A StreamingResponse padrão escuta `receive` para detectar desconexão, o que
+    consumiria os chunks do upload que ainda está sendo lido. Aqui a desconexão
+    é percebida pelo próprio stream de entrada (ClientDisconnect).
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+class StreamProgressRegistry:
+    """Contadores de progresso por stream, para retomada após queda de conexão."""
+
+    def __init__(self, max_streams: int = 1000):
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def open(self, stream_id: Optional[str] = None, resume_from: int = 0) -> Dict[str, Any]:
+        stream_id = stream_id or uuid.uuid4().hex
+        progress = {
+            "stream_id": stream_id,
+            "status": "running",
+            "resume_from": resume_from,
+            "received": 0,
+            "skipped": 0,
+            "processed": 0,
+            "failed": 0,
+            "last_index": resume_from - 1,
+            "started_at": time.time(),
+            "updated_at": time.time()
+        }
+
+        self._streams.pop(stream_id, None)
+        self._streams[stream_id] = progress
+        while len(self._streams) > self.max_streams:
+            self._streams.popitem(last=False)
+
+        return progress
+
+    def get(self, stream_id: str) -> Optional[Dict[str, Any]]:
+        progress = self._streams.get(stream_id)
+        return dict(progress) if progress else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        running = sum(1 for progress in self._streams.values() if progress["status"] == "running")
+        return {"tracked_streams": len(self._streams), "running_streams": running}
+
+
+async def stream_classifications(records: AsyncIterator[Optional[Dict[str, Any]]], executor,
+                                 progress: Dict[str, Any], chunk_size: int = 32,
+                                 max_tokens: int = 4096,
+                                 count_tokens: Optional[Callable[[str], int]] = None) -> AsyncIterator[bytes]:
+    """Classifica registros em pequenos lotes e produz uma linha NDJSON por registro.
+
+    Apenas um lote fica em memória por vez e as linhas saem na ordem de entrada,
+    de modo que `last_index` sempre marca um prefixo completo do stream.
+    Registros com índice menor que `resume_from` são lidos e descartados.
+    `count_tokens` mede o texto no tokenizer do modelo (estimativa por padrão);
+    a validação roda por lote, fora do event loop.
+    """
+    chunk: List[Tuple[int, Optional[Dict[str, Any]]]] = []
+    count_tokens = count_tokens or estimate_tokens
+    index = -1
+
+    try:
+        async for record in records:
+            index += 1
+            progress["received"] += 1
+
+            if index < progress["resume_from"]:
+                progress["skipped"] += 1
+                continue
+
+            chunk.append((index, record))
+            if len(chunk) >= chunk_size:
+                validated = await _validate_chunk(chunk, max_tokens, count_tokens)
+                async for line in _classify_chunk(validated, executor, progress):
+                    yield line
+                chunk = []
+
+        if chunk:
+            validated = await _validate_chunk(chunk, max_tokens, count_tokens)
+            async for line in _classify_chunk(validated, executor, progress):
+                yield line
+
+        progress["status"] = "completed"
+
+    except ClientDisconnect:
+        progress["status"] = "interrupted"
+        logger.info(f"🔌 Stream {progress['stream_id']} interrompido no registro {progress['last_index']}")
+        return
+    except Exception as e:
+        progress["status"] = "failed"
+        logger.error(f"❌ Erro no stream {progress['stream_id']}: {e}")
+        yield _json_line({"type": "error", "error": "Erro interno ao processar o stream"})
+    finally:
+        progress["updated_at"] = time.time()
+
+    yield _json_line({"type": "summary", **{key: progress[key] for key in (
+        "stream_id", "status", "received", "skipped", "processed", "failed", "last_index"
+    )}})
+
+
+async def _validate_chunk(chunk, max_tokens: int, count_tokens: Callable[[str], int]):
+    """Valida um lote de registros com o tokenizer fora do event loop."""
+    return await asyncio.get_running_loop().run_in_executor(None, lambda: [
+        _validate_record(index, record, max_tokens, count_tokens) for index, record in chunk
+    ])
+
+
+def _validate_record(index: int, record: Optional[Dict[str, Any]], max_tokens: int,
+                     count_tokens: Callable[[str], int]):
+    """Retorna (índice, id, texto, erro) para um registro de entrada."""
+    if record is None:
+        return index, None, None, "Registro inválido"
+
+    record_id = record.get("id")
+    email_text = str(record.get("text") or record.get("file_content") or "").strip()
+
+    if not email_text:
+        return index, record_id, None, "Texto do email é obrigatório"
+    if exceeds_char_bound(email_text, max_tokens) or count_tokens(email_text) > max_tokens:
+        return index, record_id, None, f"Texto muito longo. Máximo: {max_tokens} tokens"
+
+    return index, record_id, email_text, None
+
+
+async def _classify_chunk(chunk, executor, progress) -> AsyncIterator[bytes]:
+    texts = [email_text for _, _, email_text, error in chunk if error is None]
+
+    results, responses = [], []
+    if texts:
+        results = await executor.classify_batch(texts)
+        responses = await executor.generate_responses([
+            (result["category"], email_text, result) for result, email_text in zip(results, texts)
+        ])
+
+    classified = iter(zip(results, responses))
+    for index, record_id, _, error in chunk:
+        progress["last_index"] = index
+        progress["updated_at"] = time.time()
+
+        if error is not None:
+            progress["failed"] += 1
+            yield _json_line({"type": "error", "index": index, "id": record_id, "error": error})
+            continue
+
+        result, suggested_response = next(classified)
+        progress["processed"] += 1
+
+        yield _json_line({
+            "type": "result",
+            "index": index,
+            "id": record_id,
+            "category": result["category"].value,
+            "confidence": result["confidence"],
+            "decision_stage": result.get("decision_stage"),
+            "suggested_response": suggested_response,
+            "tokens_processed": result.get("tokens_processed", 0),
+            "detected_topics": result.get("detected_topics", [])
+        })
+
+
+def _json_line(payload: Dict[str, Any]) -> bytes:
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
@@ -0,0 +1,237 @@
+# document_store.py
+import os
+import re
+import json
+import time
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_DOCUMENT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class DocumentTooLarge(Exception):
+    def __init__(self, size: int, max_bytes: int):
+        super().__init__(f"Documento de {size} bytes acima do limite do store ({max_bytes} bytes)")
+        self.size = size
+        self.max_bytes = max_bytes
+
+
+def new_document_id() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def valid_document_id(document_id: str) -> bool:
+    return bool(document_id) and bool(_DOCUMENT_ID_PATTERN.match(document_id))
+
+
+class MemoryDocumentStore:
+    """Textos extraídos de uploads em memória, com TTL e limite de documentos/bytes.
+
+    Cada worker tem o seu: use o backend "disk" com mais de um worker.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_documents: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600):
+        self.max_documents = max(1, max_documents)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+
+        self._documents: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str, filename: str = None) -> str:
+        document_id = new_document_id()
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            raise DocumentTooLarge(size, self.max_bytes)
+
+        with self._lock:
+            # Abre espaço antes de inserir: o documento novo nunca é o despejado
+            while self._documents and (len(self._documents) >= self.max_documents or self._bytes + size > self.max_bytes):
+                self._remove(next(iter(self._documents)))
+                self.evictions += 1
+
+            self._documents[document_id] = (time.time() + self.ttl, size, {"text": text, "filename": filename})
+            self._bytes += size
+
+        return document_id
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._documents.get(document_id)
+            if entry is None:
+                return None
+
+            expires_at, _, document = entry
+            if expires_at < time.time():
+                self._remove(document_id)
+                return None
+
+            return document
+
+    def _remove(self, document_id: str):
+        _, size, _ = self._documents.pop(document_id)
+        self._bytes -= size
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "documents": len(self._documents),
+            "bytes": self._bytes,
+            "max_documents": self.max_documents,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "evictions": self.evictions
+        }
+
+
+class DiskDocumentStore:
+    """Textos extraídos de uploads em um diretório local, compartilhado entre workers.
+
+    Um arquivo JSON por documento; a idade vem do mtime. Documentos expirados
+    e os mais antigos acima dos limites são apagados a cada `put`, antes de
+    gravar o novo. `put` lista o diretório: chame fora do event loop.
+    """
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_documents: int = 256, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600):
+        self.directory = directory
+        self.max_documents = max(1, max_documents)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, document_id: str) -> str:
+        return os.path.join(self.directory, f"{document_id}.json")
+
+    def put(self, text: str, filename: str = None) -> str:
+        document_id = new_document_id()
+        path = self._path(document_id)
+        tmp_path = f"{path}.tmp"
+
+        data = json.dumps({"text": text, "filename": filename}, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            raise DocumentTooLarge(len(data), self.max_bytes)
+
+        self._sweep(reserve_bytes=len(data))
+        with open(tmp_path, "wb") as document_file:
+            document_file.write(data)
+        os.replace(tmp_path, path)
+
+        return document_id
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        path = self._path(document_id)
+        try:
+            if os.stat(path).st_mtime + self.ttl < time.time():
+                self._unlink(path)
+                return None
+            with open(path, encoding="utf-8") as document_file:
+                return json.load(document_file)
+        except (OSError, ValueError):
+            return None
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def _sweep(self, reserve_bytes: int = 0):
+        """Apaga expirados e os mais antigos até caber mais um documento de `reserve_bytes`"""
+        entries = self._entries()
+        now = time.time()
+        total_bytes = sum(size for _, size, _ in entries) + reserve_bytes
+
+        for position, (mtime, size, path) in enumerate(entries):
+            over_limits = len(entries) - position >= self.max_documents or total_bytes > self.max_bytes
+            if mtime + self.ttl >= now and not over_limits:
+                break
+            self._unlink(path)
+            total_bytes -= size
+            if mtime + self.ttl >= now:
+                self.evictions += 1
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        return {
+            "backend": self.name,
+            "directory": self.directory,
+            "documents": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_documents": self.max_documents,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "evictions": self.evictions
+        }
+
+
+class DocumentStore:
+    """Handles curtos para o texto extraído no /upload, reaproveitado por /classify e /classify/file."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, text: str, filename: str = None) -> str:
+        return self.backend.put(text, filename)
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        document = self.backend.get(document_id) if valid_document_id(document_id) else None
+        if document is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return document
+
+    @property
+    def ttl(self) -> float:
+        return self.backend.ttl
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, **self.backend.get_stats()}
+
+
+def create_document_store() -> DocumentStore:
+    """Cria o store de documentos a partir das variáveis de ambiente."""
+    backend_name = os.getenv("DOCUMENT_STORE_BACKEND", "memory").lower()
+    max_documents = int(os.getenv("DOCUMENT_STORE_MAX_DOCUMENTS", "256"))
+    max_bytes = int(float(os.getenv("DOCUMENT_STORE_MAX_MB", "64")) * 1024 * 1024)
+    ttl = float(os.getenv("DOCUMENT_TTL_S", "600"))
+
+    if backend_name == "disk":
+        directory = os.getenv("DOCUMENT_STORE_PATH", "/tmp/email-classifier/documents")
+        backend = DiskDocumentStore(directory, max_documents=max_documents, max_bytes=max_bytes, ttl=ttl)
+    elif backend_name == "memory":
+        backend = MemoryDocumentStore(max_documents=max_documents, max_bytes=max_bytes, ttl=ttl)
+    else:
+        raise ValueError(f"Backend de documentos inválido: {backend_name}. Use memory ou disk")
+
+    logger.info(f"📄 Store de documentos: {backend.name} ({max_documents} documentos, TTL {ttl:.0f}s)")
+    return DocumentStore(backend)
@@ -1,12 +1,22 @@
 import torch
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer, util
 import logging
 import re
-from typing import Dict, Any
+import os
+import time
+import hashlib
+import threading
+from typing import Dict, Any, List, Tuple
 import gc
+import warnings
+from contextlib import nullcontext
 
-from text_processor import TextProcessor
+import numpy as np
+
+from text_processor import TextProcessor, AnalysisContext
+from embedding_store import EmbeddingStore
+from inference_backend import load_inference_models
+from text_windows import token_windows, count_tokens
+from reference_index import ReferenceIndex
 from models import EmailCategory
 
 logger = logging.getLogger(__name__)
@@ -14,194 +24,626 @@ logger = logging.getLogger(__name__)
 class EmailClassifier:
     """Classificador otimizado para produção"""
 
-    def __init__(self, use_ml_models: bool = True):
+    # AUMENTAR peso dos keywords para agradecimentos
+    ML_WEIGHTS = {"primary": 0.45, "similarity": 0.25, "keywords": 0.30}  # ⬅️ Ajustado
+    THANKS_WORDS = ('obrigado', 'agradeço', 'grato', 'obrigada')
+    THANKS_PENALTY = 0.3
+
+    PRIMARY_MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+    SENTENCE_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+    # Janelas de textos longos: limite de posições dos modelos e, sem tokenizer, palavras por janela
+    PRIMARY_MAX_POSITIONS = 512
+    FALLBACK_WINDOW_WORDS = 128
+    WINDOW_POOLINGS = ("mean", "max", "attention")
+    ATTENTION_TEMPERATURE = 0.1
+
+    # Estágio da cascata que decidiu o email -> modelos efetivamente usados
+    STAGE_MODEL_USED = {"rules": "Rule-Based", "primary": "BERT", "similarity": "BERT + Semantic"}
+
+    def __init__(self, use_ml_models: bool = True, inference_batch_size: int = 32,
+                 result_cache=None, model_version: str = "1",
+                 embedding_store_path: str = None, embedding_store_max_rows: int = 0,
+                 inference_backend: str = "torch", onnx_model_dir: str = "models/onnx",
+                 onnx_quantized: bool = True, onnx_intra_op_threads: int = 0, cascade_enabled: bool = False,
+                 cascade_rules_threshold: float = 0.9, cascade_rules_min_keyword_confidence: float = 0.75,
+                 cascade_primary_threshold: float = 0.85, reference_embeddings_path: str = None,
+                 background_loading: bool = False, window_pooling: str = "mean", window_overlap: int = 64,
+                 reference_set_path: str = None, reference_scoring: str = "centroid", reference_knn_k: int = 16,
+                 reference_reload_interval: float = 30, metrics=None, profiler=None):
+        if window_pooling not in self.WINDOW_POOLINGS:
+            raise ValueError(f"Pooling de janelas inválido: {window_pooling}. Use {', '.join(self.WINDOW_POOLINGS)}")
+
         self.text_processor = TextProcessor()
         self.use_ml_models = use_ml_models
+        self.inference_batch_size = max(1, inference_batch_size)
+        self.result_cache = result_cache
+        # Recebe os tempos de cada estágio (PerformanceMetrics ou StageLog nos workers)
+        self.metrics = metrics
+        # Perfis sob demanda de uma fração das chamadas (profiling.Profiler)
+        self.profiler = profiler
+        self.inference_backend = inference_backend
+        self.onnx_model_dir = onnx_model_dir
+        self.onnx_quantized = onnx_quantized
+        self.onnx_intra_op_threads = onnx_intra_op_threads
+        self.window_pooling = window_pooling
+        self.window_overlap = max(0, window_overlap)
+        self.cascade_enabled = cascade_enabled
+        self.cascade_rules_threshold = cascade_rules_threshold
+        self.cascade_rules_min_keyword_confidence = cascade_rules_min_keyword_confidence
+        self.cascade_primary_threshold = cascade_primary_threshold
+        reference_variant = f"{reference_scoring}-{reference_knn_k}" if reference_scoring == "knn" else reference_scoring
+        cascade_variant = (
+            f"cascade-{cascade_rules_threshold}-{cascade_rules_min_keyword_confidence}-{cascade_primary_threshold}"
+            if cascade_enabled else "full"
+        )
+        backend_variant = f"onnx-{'int8' if onnx_quantized else 'fp32'}" if inference_backend == "onnx" else inference_backend
+        self._config_fingerprint = hashlib.sha256(
+            f"{model_version}|{backend_variant}|{cascade_variant}|{window_pooling}-{self.window_overlap}|{reference_variant}|{self.PRIMARY_MODEL_NAME}|{self.SENTENCE_MODEL_NAME}|"
+            f"{sorted(self.ML_WEIGHTS.items())}|{self.THANKS_WORDS}|{self.THANKS_PENALTY}".encode("utf-8")
+        ).hexdigest()[:16]
         self.primary_classifier = None
         self.sentence_model = None
-        self.prod_ref_emb = None
-        self.improd_ref_emb = None
-        
-        if self.use_ml_models:
+        self.reference_index = None
+        self.embedding_store_path = embedding_store_path
+        self.embedding_store_max_rows = embedding_store_max_rows
+        self.embedding_store = None
+        self.reference_embeddings_path = reference_embeddings_path
+        self.reference_set_path = reference_set_path
+        self.reference_scoring = reference_scoring
+        self.reference_knn_k = reference_knn_k
+        self.reference_reload_interval = reference_reload_interval
+        self._embedding_signature = f"{self.SENTENCE_MODEL_NAME}|{backend_variant}"
+
+        # disabled | loading | ready | failed | unloaded | reloading
+        self.model_state = "loading" if self.use_ml_models else "disabled"
+        self.model_load_error = None
+        self.model_load_seconds = None
+        self._loader = None
+        # Lotes usando os modelos agora: a descarga espera por eles
+        self._model_users = 0
+        self._model_condition = threading.Condition()
+        self.models_last_used = time.monotonic()
+        # Ganchos do gerenciador de memória: se a recarga sob demanda pode
+        # começar e quem recebe os eventos de carga/descarga
+        self.reload_guard = None
+        self.on_model_event = None
+
+        if self.use_ml_models and background_loading:
+            # Serve com regras enquanto os modelos carregam; troca quando estiverem prontos
+            self._loader = threading.Thread(target=self._setup_optimized_models, name="model-loader", daemon=True)
+            self._loader.start()
+            logger.info("⏳ Modelos carregando em segundo plano - usando regras até ficarem prontos")
+        elif self.use_ml_models:
             self._setup_optimized_models()
         else:
             logger.info("🔧 Modo sem ML ativado - usando regras baseadas")
 
-    def _setup_optimized_models(self):
-        """Carrega modelos otimizados para baixa memória"""
+    def _setup_optimized_models(self, reason: str = "startup"):
+        """Carrega modelos otimizados para baixa memória.
+
+        `primary_classifier` é atribuído por último, depois do aquecimento: é
+        ele que libera o caminho com ML, então a troca de regras para modelos
+        é atômica para as requisições em andamento.
+        """
+        start_time = time.time()
         try:
-            logger.info("🔄 Carregando modelos otimizados...")
+            logger.info(f"🔄 Carregando modelos otimizados (backend: {self.inference_backend})...")
             
-            # Modelo mais leve para sentiment analysis
-            self.primary_classifier = pipeline(
-                "text-classification",
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-                device=-1,
-                torch_dtype=torch.float32
+            # Modelo mais leve para sentiment analysis + sentence transformer menor
+            primary_classifier, self.sentence_model = load_inference_models(
+                self.inference_backend,
+                self.PRIMARY_MODEL_NAME,
+                self.SENTENCE_MODEL_NAME,
+                onnx_model_dir=self.onnx_model_dir,
+                onnx_quantized=self.onnx_quantized,
+                onnx_intra_op_threads=self.onnx_intra_op_threads
             )
 
-            # Sentence transformer menor
-            self.sentence_model = SentenceTransformer(
-                "sentence-transformers/all-MiniLM-L6-v2",
-                device='cpu'
+            if self.embedding_store_path and self.embedding_store is None:
+                self._open_embedding_store()
+
+            # Exemplos rotulados (arquivo ou referências padrão); embeddings lidos do
+            # disco ou do embedding store quando disponíveis
+            reference_index = ReferenceIndex(
+                self._encode,
+                path=self.reference_set_path,
+                scoring=self.reference_scoring,
+                k=self.reference_knn_k,
+                reload_interval=self.reference_reload_interval,
+                cache_path=self.reference_embeddings_path,
+                model_signature=self._embedding_signature
             )
+            reference_index.load()
+            self.reference_index = reference_index
 
-            # Referências otimizadas
-            productive_references = [
-                "problema erro sistema suporte técnico ajuda",
-                "solicitação pedido status andamento protocolo",
-                "reembolso pagamento transação defeito falha",
-                "urgente crítico não funciona quebrado"
-            ]
-
-            improductive_references = [
-                "obrigado agradeço parabéns feliz natal",
-                "cumprimentos saudações bom dia boa tarde",
-                "ano novo feriado fim de semana comemoração",
-                "elogios felicitações votos sucesso"
-            ]
-
-            # Embeddings pré-computados
-            with torch.no_grad():
-                self.prod_ref_emb = self.sentence_model.encode(
-                    productive_references,
-                    convert_to_tensor=True
-                )
-                self.improd_ref_emb = self.sentence_model.encode(
-                    improductive_references,
-                    convert_to_tensor=True
-                )
+            self._warmup(primary_classifier)
+            self.models_last_used = time.monotonic()
+            self.primary_classifier = primary_classifier
 
-            logger.info("✅ Modelos otimizados carregados com sucesso")
+            self.model_load_seconds = round(time.time() - start_time, 2)
+            self.model_state = "ready"
+            logger.info(f"✅ Modelos otimizados carregados com sucesso ({self.model_load_seconds}s)")
+            self._model_event("load", reason, seconds=self.model_load_seconds)
 
         except Exception as e:
             logger.error(f"❌ Erro ao carregar modelos: {e}")
             self.use_ml_models = False
+            self.model_load_error = str(e)
+            self.model_state = "failed"
             logger.info("🔄 Fallback para modo sem ML")
 
+    def _warmup(self, primary_classifier):
+        """Primeira inferência fora do caminho das requisições (alocações, kernels, caches)"""
+        samples = [
+            "problema erro sistema suporte técnico ajuda",
+            "obrigado agradeço parabéns feliz natal"
+        ]
+        with torch.no_grad():
+            primary_classifier(samples, batch_size=len(samples))
+            self.sentence_model.encode(samples, convert_to_tensor=True, batch_size=len(samples))
+
+    @property
+    def models_ready(self) -> bool:
+        """Indica se o caminho com ML está liberado (modelos carregados e aquecidos)"""
+        return self.use_ml_models and self.primary_classifier is not None
+
+    def wait_for_models(self, timeout: float = None) -> bool:
+        """Bloqueia até o carregamento em segundo plano terminar"""
+        if self._loader is not None:
+            self._loader.join(timeout)
+        return self.models_ready
+
+    def get_model_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.model_state,
+            "ready": self.models_ready,
+            "load_seconds": self.model_load_seconds,
+            "error": self.model_load_error
+        }
+
+    def _acquire_models(self) -> bool:
+        """Reserva os modelos para um lote; descarregados, dispara a recarga e o lote usa regras"""
+        with self._model_condition:
+            if self.models_ready:
+                self._model_users += 1
+                self.models_last_used = time.monotonic()
+                return True
+
+        if self.model_state == "unloaded":
+            self.reload_models()
+        return False
+
+    def _release_models(self):
+        with self._model_condition:
+            self._model_users -= 1
+            self.models_last_used = time.monotonic()
+            if not self._model_users:
+                self._model_condition.notify_all()
+
+    def reload_models(self) -> bool:
+        """Recarrega em segundo plano os modelos descarregados (se o gerenciador de memória permitir)"""
+        with self._model_condition:
+            if self.model_state != "unloaded":
+                return False
+            if self.reload_guard is not None and not self.reload_guard():
+                return False
+            self.model_state = "reloading"
+
+        logger.info("⏳ Recarregando modelos em segundo plano - usando regras até ficarem prontos")
+        self._loader = threading.Thread(
+            target=self._setup_optimized_models, args=("request",), name="model-loader", daemon=True
+        )
+        self._loader.start()
+        return True
+
+    def unload_models(self, reason: str, wait: float = 0) -> bool:
+        """Descarrega os modelos e passa a classificar por regras até a próxima recarga.
+
+        Espera até `wait` segundos pelos lotes que estão usando os modelos
+        (None espera o quanto for preciso); se continuarem ocupados, não
+        descarrega. O índice de referências e o embedding store continuam
+        abertos e são reaproveitados na recarga.
+        """
+        with self._model_condition:
+            if not self.models_ready:
+                return False
+            if not self._model_condition.wait_for(lambda: not self._model_users, wait):
+                return False
+            self.primary_classifier = None
+            self.sentence_model = None
+            self.model_state = "unloaded"
+
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        logger.info(f"💤 Modelos descarregados ({reason}) - usando regras até a próxima requisição")
+        self._model_event("unload", reason)
+        return True
+
+    def _model_event(self, event: str, reason: str, **details):
+        if self.on_model_event is not None:
+            try:
+                self.on_model_event(event, reason, **details)
+            except Exception as e:
+                logger.error(f"❌ Erro ao registrar evento de modelo: {e}")
+
+    def _open_embedding_store(self):
+        """Abre o embedding store compartilhado, compactando se passou do limite"""
+        try:
+            dim = self.sentence_model.get_sentence_embedding_dimension()
+            self.embedding_store = EmbeddingStore(self.embedding_store_path, dim, max_rows=self.embedding_store_max_rows)
+
+            if self.embedding_store_max_rows and len(self.embedding_store) > self.embedding_store_max_rows:
+                self.embedding_store.compact(max_rows=self.embedding_store_max_rows)
+
+            logger.info(f"💾 Embedding store: {self.embedding_store_path} ({len(self.embedding_store)} vetores)")
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao abrir embedding store: {e}")
+            self.embedding_store = None
+
+    def _encode(self, texts: List[str]) -> torch.Tensor:
+        """Embeddings do sentence model, reaproveitando o embedding store quando configurado"""
+        batch_size = min(len(texts), self.inference_batch_size)
+
+        if self.embedding_store is None:
+            with torch.no_grad():
+                return self.sentence_model.encode(texts, convert_to_tensor=True, batch_size=batch_size)
+
+        # Backend e quantização entram na chave: vetores do ONNX int8 e do torch fp32 não se misturam
+        keys = [EmbeddingStore.key(self._embedding_signature, text) for text in texts]
+        found, missing = self.embedding_store.get_many(keys)
+
+        if not missing:
+            # View somente leitura do mmap: sem cópia
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                return torch.from_numpy(found)
+
+        with torch.no_grad():
+            encoded = self.sentence_model.encode(
+                [texts[position] for position in missing],
+                convert_to_numpy=True,
+                batch_size=batch_size
+            ).astype(np.float32)
+        self.embedding_store.add_many([keys[position] for position in missing], encoded)
+
+        embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        missing_mask = np.zeros(len(texts), dtype=bool)
+        missing_mask[missing] = True
+        embeddings[missing_mask] = encoded
+        if found is not None:
+            embeddings[~missing_mask] = found
+
+        return torch.from_numpy(embeddings)
+
     def classify(self, text: str) -> Dict[str, Any]:
         """Classificação otimizada"""
-        if not text or not isinstance(text, str):
-            return self._default_response()
-
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Classifica vários emails com uma única passada por cada modelo"""
+        profiler = self.profiler
+        if profiler is not None and profiler.sample_rate and profiler.should_sample():
+            with profiler.profile("classify_batch", emails=len(texts)):
+                return self._classify_batch(texts)
+        return self._classify_batch(texts)
+
+    def _classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        # Uma única leitura do estado dos modelos para o lote inteiro (a troca pode
+        # ocorrer no meio); reservados, não são descarregados até o lote terminar
+        ml_ready = self._acquire_models()
         try:
-            processed_text = self.text_processor.preprocess(text)
+            return self._classify_texts(texts, ml_ready)
+        finally:
+            if ml_ready:
+                self._release_models()
+
+    def _classify_texts(self, texts: List[str], ml_ready: bool) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = [None] * len(texts)
+        pending = []
+        cache_keys: Dict[int, str] = {}
+        references = None
+        if ml_ready:
+            self.reference_index.maybe_reload()
+            references = self.reference_index.current
+        version = self._version(ml_ready, references)
+        preprocess_seconds = 0.0
+
+        for index, text in enumerate(texts):
+            if not text or not isinstance(text, str):
+                results[index] = self._default_response()
+                continue
+
+            context = self.text_processor.analyze(text)
+            if self.result_cache:
+                # Chave pelo texto original: as regras e os tópicos não olham só o pré-processado
+                cache_key = self.result_cache.make_key(text, version)
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    cached["analysis"] = context
+                    results[index] = cached
+                    continue
+                cache_keys[index] = cache_key
+
+            started = time.perf_counter()
+            processed_text = context.processed_text
+            preprocess_seconds += time.perf_counter() - started
             if not processed_text.strip():
-                return self._default_response()
-
-            if self.use_ml_models and self.primary_classifier:
-                # Classificação com ML otimizada
-                primary_result = self._primary_classification(processed_text)
-                similarity_result = self._semantic_similarity(processed_text)
-                keyword_features = self.text_processor.extract_keyword_features(text)
-                
-                final_category, confidence = self._combine_ml_results(
-                    primary_result,
-                    similarity_result,
-                    keyword_features,
-                    text  # ⬅️ AGORA PASSAMOS O TEXTO ORIGINAL
-                )
-            else:
-                # Classificação baseada em regras
-                final_category, confidence = self._rule_based_classification(text)
+                results[index] = self._default_response()
+                continue
 
-            topics = self.text_processor.detect_topics(text)
+            pending.append((index, context))
 
-            return {
-                "category": final_category,
-                "confidence": confidence,
-                "primary_model_score": confidence,
-                "similarity_score": 0.7,
-                "keyword_score": confidence,
-                "detected_topics": topics,
-                "tokens_processed": len(processed_text.split())
-            }
+        if self.metrics is not None:
+            self.metrics.record_stage("preprocess", preprocess_seconds)
 
-        except Exception as e:
-            logger.error(f"Erro na classificação: {e}")
-            return self._default_response()
+        if not pending:
+            return results
 
-    def _primary_classification(self, text: str) -> Dict[str, Any]:
-        """Classificação usando modelo leve"""
         try:
-            truncated = text[:512]
-            result = self.primary_classifier(truncated)[0]
+            decisions = self._run_cascade([context for _, context in pending], ml_ready, references)
+
+            for (index, context), (category, confidence, stage) in zip(pending, decisions):
+                result = self._build_result(context, category, confidence, stage)
+                if index in cache_keys:
+                    self.result_cache.set(cache_keys[index], result)
+                # O contexto acompanha o resultado até a resposta, mas não entra no cache
+                result["analysis"] = context
+                results[index] = result
+
+        except Exception as e:
+            logger.error(f"Erro na classificação em lote: {e}")
+            for index, _ in pending:
+                if results[index] is None:
+                    results[index] = self._default_response()
+
+        return results
+
+    def _run_cascade(self, contexts: List[AnalysisContext], ml_ready: bool,
+                     references: Dict[str, Any] = None) -> List[Tuple[EmailCategory, float, str]]:
+        """Decide cada email no estágio mais barato que atinge a confiança exigida.
+
+        Estágios: "rules" (palavras-chave), "primary" (modelo de sentimento
+        combinado com as palavras-chave) e "similarity" (combinação completa).
+        Sem cascata, todo email com ML passa pelos três estágios.
+        """
+        decisions: List[Tuple[EmailCategory, float, str]] = [None] * len(contexts)
+        with self._stage("keywords"):
+            keyword_features = [context.keyword_features for context in contexts]
+        remaining = list(range(len(contexts)))
+
+        if not ml_ready or self.cascade_enabled:
+            for i in remaining:
+                category, confidence = self._rule_based_classification(contexts[i].text, keyword_features[i])
+                if not ml_ready or (
+                    keyword_features[i]["keyword_confidence"] >= self.cascade_rules_min_keyword_confidence
+                    and confidence >= self.cascade_rules_threshold
+                ):
+                    decisions[i] = (category, confidence, "rules")
+            remaining = [i for i in remaining if decisions[i] is None]
+
+        if remaining:
+            keyword_scores = torch.tensor(
+                [keyword_features[i]["productive_score"] for i in remaining], dtype=torch.float64
+            )
+            thanks_mask = torch.tensor(
+                [contexts[i].contains_any(self.THANKS_WORDS) for i in remaining],
+                dtype=torch.bool
+            )
+            with self._stage("primary_model"):
+                primary_scores = self._primary_classification_batch([contexts[i].processed_text for i in remaining])
+
+            if self.cascade_enabled:
+                categories, confidences = self._combine_ml_results_batch(
+                    primary_scores, None, keyword_scores, thanks_mask
+                )
+                keep = []
+                for position, (i, category, confidence) in enumerate(zip(remaining, categories, confidences)):
+                    if confidence >= self.cascade_primary_threshold:
+                        decisions[i] = (category, confidence, "primary")
+                    else:
+                        keep.append(position)
+
+                remaining = [remaining[position] for position in keep]
+                primary_scores = primary_scores[keep]
+                keyword_scores = keyword_scores[keep]
+                thanks_mask = thanks_mask[keep]
+
+        if remaining:
+            with self._stage("similarity"):
+                similarity_scores = self._semantic_similarity_batch([contexts[i].processed_text for i in remaining], references)
+            categories, confidences = self._combine_ml_results_batch(
+                primary_scores, similarity_scores, keyword_scores, thanks_mask
+            )
+            for i, category, confidence in zip(remaining, categories, confidences):
+                decisions[i] = (category, confidence, "similarity")
+
+        return decisions
 
-            # Mapear sentimentos do modelo leve
-            sentiment_map = {"negative": 1, "neutral": 2, "positive": 3}
-            sentiment = sentiment_map.get(result["label"], 2)
-            prob = result.get("score", 0.5)
+    def _stage(self, stage: str):
+        return self.metrics.stage(stage) if self.metrics is not None else nullcontext()
 
-            if sentiment <= 2:
-                category = EmailCategory.PRODUTIVO
-                score = min(1.0, 0.7 + (2 - sentiment) * 0.15)
+    @property
+    def config_version(self) -> str:
+        """Versão de modelo/configuração usada na chave do cache de resultados"""
+        ml_ready = self.models_ready
+        return self._version(ml_ready, self.reference_index.current if ml_ready else None)
+
+    def _version(self, ml_ready: bool, references: Dict[str, Any] = None) -> str:
+        if not ml_ready:
+            return f"{self._config_fingerprint}:rules"
+        # Trocar o conjunto de referências muda os scores: entra na chave do cache
+        return f"{self._config_fingerprint}:ml-{references['version']}" if references else f"{self._config_fingerprint}:ml"
+
+    def _build_result(self, context: AnalysisContext, final_category, confidence,
+                      decision_stage: str) -> Dict[str, Any]:
+        """Monta o dicionário de resultado da classificação"""
+        return {
+            "category": final_category,
+            "confidence": confidence,
+            "primary_model_score": confidence,
+            "similarity_score": 0.7,
+            "keyword_score": confidence,
+            "detected_topics": context.topics,
+            "tokens_processed": len(context.tokens),
+            "decision_stage": decision_stage,
+            "model_used": self.STAGE_MODEL_USED[decision_stage]
+        }
+
+    def count_tokens(self, text: str) -> int:
+        """Tokens do texto no tokenizer do modelo primário (estimativa enquanto os modelos não carregam)"""
+        tokenizer = getattr(self.primary_classifier, "tokenizer", None) if self.models_ready else None
+        return count_tokens(text, tokenizer)
+
+    def _split_windows(self, texts: List[str], tokenizer, max_tokens: int):
+        """Janelas de todos os textos em uma lista única, com a quantidade de janelas por texto"""
+        windows, counts = [], []
+        for text in texts:
+            text_windows = token_windows(text, tokenizer, max_tokens, min(self.window_overlap, max_tokens // 2))
+            windows.extend(text_windows)
+            counts.append(len(text_windows))
+        return windows, counts
+
+    @staticmethod
+    def _window_size(tokenizer, max_positions: int) -> int:
+        if tokenizer is None:
+            return EmailClassifier.FALLBACK_WINDOW_WORDS
+        max_positions = min(getattr(tokenizer, "model_max_length", max_positions), max_positions)
+        return max(1, max_positions - tokenizer.num_special_tokens_to_add())
+
+    def _pool_windows(self, scores: torch.Tensor, counts: List[int]) -> torch.Tensor:
+        """Combina os scores produtivos das janelas de cada texto (mean, max ou attention).
+
+        "max" fica com a janela mais decisiva (mais distante de 0.5) e
+        "attention" pondera as janelas por um softmax dessa mesma distância.
+        """
+        pooled = []
+        for windows in torch.split(scores, counts):
+            if len(windows) == 1:
+                pooled.append(windows[0])
+            elif self.window_pooling == "max":
+                pooled.append(windows[(windows - 0.5).abs().argmax()])
+            elif self.window_pooling == "attention":
+                weights = torch.softmax((windows - 0.5).abs() / self.ATTENTION_TEMPERATURE, dim=0)
+                pooled.append((weights * windows).sum())
             else:
-                category = EmailCategory.IMPRODUTIVO
-                score = min(1.0, 0.6 + (sentiment - 2) * 0.15)
+                pooled.append(windows.mean())
+        return torch.stack(pooled)
 
-            return {"category": category, "score": float(score)}
+    def _primary_classification_batch(self, texts: List[str]) -> torch.Tensor:
+        """Score produtivo de um lote: todas as janelas de todos os textos em uma chamada do pipeline"""
+        try:
+            tokenizer = getattr(self.primary_classifier, "tokenizer", None)
+            windows, counts = self._split_windows(
+                texts, tokenizer, self._window_size(tokenizer, self.PRIMARY_MAX_POSITIONS)
+            )
+            results = self.primary_classifier(
+                windows,
+                batch_size=min(len(windows), self.inference_batch_size),
+                truncation=True
+            )
+            scores = [self._as_prod_score(self._map_sentiment(result)) for result in results]
+            return self._pool_windows(torch.tensor(scores, dtype=torch.float64), counts)
 
         except Exception as e:
-            logger.error(f"Erro classificação primária: {e}")
-            return {"category": EmailCategory.PRODUTIVO, "score": 0.5}
+            logger.error(f"Erro classificação primária em lote: {e}")
+            return torch.full((len(texts),), 0.5, dtype=torch.float64)
+
+    def _map_sentiment(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Converte a saída do modelo de sentimento em categoria e score"""
+        # Mapear sentimentos do modelo leve
+        sentiment_map = {"negative": 1, "neutral": 2, "positive": 3}
+        sentiment = sentiment_map.get(result["label"], 2)
+        prob = result.get("score", 0.5)
+
+        if sentiment <= 2:
+            category = EmailCategory.PRODUTIVO
+            score = min(1.0, 0.7 + (2 - sentiment) * 0.15)
+        else:
+            category = EmailCategory.IMPRODUTIVO
+            score = min(1.0, 0.6 + (sentiment - 2) * 0.15)
+
+        return {"category": category, "score": float(score)}
 
-    def _semantic_similarity(self, text: str) -> Dict[str, Any]:
-        """Similaridade semântica otimizada"""
+    def _semantic_similarity_batch(self, texts: List[str], references: Dict[str, Any] = None) -> torch.Tensor:
+        """Score produtivo por similaridade de um lote: um encode e um produto de matrizes com as referências"""
         try:
+            tokenizer = getattr(self.sentence_model, "tokenizer", None)
+            max_positions = getattr(self.sentence_model, "max_seq_length", None) or 256
+            windows, counts = self._split_windows(texts, tokenizer, self._window_size(tokenizer, max_positions))
+            embeddings = self._encode(windows)
+
             with torch.no_grad():
-                emb = self.sentence_model.encode(text, convert_to_tensor=True)
+                embeddings = torch.nn.functional.normalize(embeddings, dim=1)
+
+            return self._pool_windows(self.reference_index.scores(embeddings, references), counts)
 
-            prod_sim = util.pytorch_cos_sim(emb, self.prod_ref_emb)
-            impr_sim = util.pytorch_cos_sim(emb, self.improd_ref_emb)
+        except Exception as e:
+            logger.error(f"Erro similaridade em lote: {e}")
+            return torch.full((len(texts),), 0.5, dtype=torch.float64)
+
+    def _combine_ml_results_batch(self, primary_scores, similarity_scores, keyword_scores, thanks_mask):
+        """Combina os scores do lote com pesos ajustados.
+
+        Sem `similarity_scores` (estágio "primary" da cascata), os pesos de
+        modelo primário e palavras-chave são renormalizados para somar 1.
+        """
+        weights = self.ML_WEIGHTS
+
+        if similarity_scores is None:
+            final_prod_scores = (
+                primary_scores * weights["primary"] +
+                keyword_scores * weights["keywords"]
+            ) / (weights["primary"] + weights["keywords"])
+        else:
+            final_prod_scores = (
+                primary_scores * weights["primary"] +
+                similarity_scores * weights["similarity"] +
+                keyword_scores * weights["keywords"]
+            )
 
-            avg_prod = float(torch.mean(prod_sim))
-            avg_impr = float(torch.mean(impr_sim))
+        # REGRA ESPECIAL para agradecimentos: penaliza o score produtivo
+        final_prod_scores = final_prod_scores - thanks_mask.double() * self.THANKS_PENALTY
+        final_prod_scores = final_prod_scores.clamp(0.0, 1.0)
 
-            total = avg_prod + avg_impr
-            if total == 0:
-                return {"category": EmailCategory.PRODUTIVO, "score": 0.5}
+        is_productive = final_prod_scores >= 0.5
+        confidences = torch.where(is_productive, final_prod_scores, 1 - final_prod_scores)
 
-            prod_score = avg_prod / total
-            if prod_score >= 0.5:
-                return {"category": EmailCategory.PRODUTIVO, "score": prod_score}
-            else:
-                return {"category": EmailCategory.IMPRODUTIVO, "score": 1 - prod_score}
+        categories = [
+            EmailCategory.PRODUTIVO if productive else EmailCategory.IMPRODUTIVO
+            for productive in is_productive.tolist()
+        ]
+        return categories, confidences.tolist()
 
-        except Exception as e:
-            logger.error(f"Erro similaridade: {e}")
-            return {"category": EmailCategory.PRODUTIVO, "score": 0.5}
-
-    def _combine_ml_results(self, primary, sim, keywords, original_text):
-        """Combina resultados dos métodos com pesos ajustados"""
-        
-        # AUMENTAR peso dos keywords para agradecimentos
-        weights = {"primary": 0.45, "similarity": 0.25, "keywords": 0.30}  # ⬅️ Ajustado
-        
-        def as_prod_score(result):
-            return result["score"] if result["category"] == EmailCategory.PRODUTIVO else (1 - result["score"])
-
-        final_prod_score = (
-            as_prod_score(primary) * weights["primary"] +
-            as_prod_score(sim) * weights["similarity"] +
-            keywords["productive_score"] * weights["keywords"]
-        )
+    @staticmethod
+    def _as_prod_score(result: Dict[str, Any]) -> float:
+        return result["score"] if result["category"] == EmailCategory.PRODUTIVO else (1 - result["score"])
+
+    def _rule_based_classification(self, text: str, features: Dict[str, float] = None):
+        """Classificação baseada em regras"""
+        if features is None:
+            features = self.text_processor.extract_keyword_features(text)
 
-        # REGRA ESPECIAL para agradecimentos
-        text_lower = original_text.lower()
-        if any(word in text_lower for word in ['obrigado', 'agradeço', 'grato', 'obrigada']):
-            final_prod_score -= 0.3  # Penaliza score produtivo
-        
-        # Garantir que o score fique entre 0 e 1
-        final_prod_score = max(0.0, min(1.0, final_prod_score))
-        
-        if final_prod_score >= 0.5:
-            return EmailCategory.PRODUTIVO, final_prod_score
+        if features["productive_score"] >= 0.5:
+            return EmailCategory.PRODUTIVO, features["productive_score"]
         else:
-            return EmailCategory.IMPRODUTIVO, 1 - final_prod_score
+            return EmailCategory.IMPRODUTIVO, features["improductive_score"]
 
-    def _rule_based_classification(self, text: str):
-        """Classificação baseada em regras"""
-        return self.text_processor.extract_keyword_features(text)
+    def classify_rules(self, text: str) -> Dict[str, Any]:
+        """Classificação só pelas palavras-chave, sem modelos nem cache (resposta quando o prazo estoura)"""
+        if not text or not isinstance(text, str):
+            return self._default_response()
+
+        context = self.text_processor.analyze(text)
+        if not context.processed_text.strip():
+            return self._default_response()
+
+        category, confidence = self._rule_based_classification(text, context.keyword_features)
+        result = self._build_result(context, category, confidence, "rules")
+        result["analysis"] = context
+        return result
 
     def _default_response(self):
         return {
@@ -216,11 +658,4 @@ class EmailClassifier:
 
     def cleanup(self):
         """Limpeza de memória"""
-        if hasattr(self, 'sentence_model'):
-            del self.sentence_model
-        if hasattr(self, 'primary_classifier'):
-            del self.primary_classifier
-            
-        gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
\ No newline at end of file
+        self.unload_models("cleanup", wait=None)
\ No newline at end of file
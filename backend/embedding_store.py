@@ -0,0 +1,302 @@
+# embedding_store.py
+import os
+import sys
+import json
+import fcntl
+import hashlib
+import logging
+import argparse
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """Armazena embeddings float32 em arquivo mapeado em memória, indexados por hash.
+
+    Layout em disco (prefixo `path`):
+      - `<path>.f32`: linhas float32 contíguas de dimensão `dim`
+      - `<path>.idx`: digests de 16 bytes, um por linha, na mesma ordem
+      - `<path>.meta`: dimensão dos vetores
+
+    O arquivo cresce apenas por append; vários processos leem as mesmas
+    páginas em modo somente leitura e enxergam as linhas novas no próximo
+    acesso. `compact()` reescreve os arquivos sem duplicatas.
+
+    Ordem dos locks, em todos os caminhos: primeiro o flock do arquivo, depois
+    o lock de threads.
+
+    Com `max_rows`, os appends param no limite e uma compactação em segundo
+    plano mantém as `COMPACT_KEEP` linhas mais recentes; enquanto ela roda,
+    os vetores novos só não são gravados.
+    """
+
+    DIGEST_SIZE = 16
+    # Fração de `max_rows` mantida quando o store enche durante a execução
+    COMPACT_KEEP = 0.75
+    # Linhas copiadas por vez na compactação (sem materializar o store inteiro)
+    COMPACT_CHUNK_ROWS = 8192
+
+    def __init__(self, path: str, dim: int, max_rows: int = 0):
+        self.path = path
+        self.dim = dim
+        self.vectors_path = f"{path}.f32"
+        self.index_path = f"{path}.idx"
+        self.meta_path = f"{path}.meta"
+        self.lock_path = f"{path}.lock"
+
+        self.max_rows = max(0, max_rows)
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.compactions = 0
+
+        self._index: Dict[bytes, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._rows = 0
+        # Linhas cobertas pelo mmap atual: appends deste processo só remapeiam quando lidos
+        self._mapped_rows = 0
+        self._compacting = False
+        self._index_stat: Tuple[int, int] = (0, 0)
+        # Se esta thread já tem o flock (cada thread abre o seu)
+        self._local = threading.local()
+        self._thread_lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with self._locked():
+            if os.path.exists(self.meta_path):
+                with open(self.meta_path) as meta_file:
+                    stored_dim = json.load(meta_file)["dim"]
+                if stored_dim != dim:
+                    raise ValueError(f"Dimensão do store ({stored_dim}) difere do modelo ({dim})")
+            else:
+                with open(self.meta_path, "w") as meta_file:
+                    json.dump({"dim": dim}, meta_file)
+                open(self.vectors_path, "ab").close()
+                open(self.index_path, "ab").close()
+
+        self._refresh()
+
+    @staticmethod
+    def key(namespace: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{namespace}\0{text}".encode("utf-8"), digest_size=EmbeddingStore.DIGEST_SIZE).digest()
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._index)
+
+    def get_many(self, keys: List[bytes]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """Busca vetores pelas chaves.
+
+        Retorna (vetores encontrados, posições ausentes). Se todas as chaves
+        estiverem em linhas consecutivas, o resultado é uma view do mmap,
+        sem cópia.
+        """
+        self._refresh()
+
+        with self._thread_lock:
+            rows, missing = [], []
+            for position, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is None:
+                    missing.append(position)
+                else:
+                    rows.append(row)
+
+            self.hits += len(rows)
+            self.misses += len(missing)
+
+            if not rows:
+                return None, missing
+            if max(rows) >= self._mapped_rows:
+                self._map_vectors()
+            if rows == list(range(rows[0], rows[0] + len(rows))):
+                return self._vectors[rows[0]:rows[0] + len(rows)], missing
+            return self._vectors[rows], missing
+
+    def add_many(self, keys: List[bytes], vectors: np.ndarray):
+        """Acrescenta vetores ao final do store (ignorando chaves já presentes e o que passar de `max_rows`)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+
+        # Compactação em andamento segura o flock: descarta sem esperar por ele
+        if self._compacting:
+            with self._thread_lock:
+                self.skipped += len(keys)
+            return
+
+        with self._locked(), self._thread_lock:
+            if self._compacting:
+                self.skipped += len(keys)
+                return
+
+            self._refresh()
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index and key not in new_rows:
+                    new_rows[key] = vector
+
+            full = False
+            if self.max_rows and len(new_rows) > self.max_rows - self._rows:
+                capacity = max(0, self.max_rows - self._rows)
+                self.skipped += len(new_rows) - capacity
+                new_rows = dict(list(new_rows.items())[:capacity])
+                full = True
+
+            if new_rows:
+                # Vetores primeiro, índice por último: o índice é o registro de commit
+                with open(self.vectors_path, "ab") as vectors_file:
+                    vectors_file.write(np.stack(list(new_rows.values())).tobytes())
+                with open(self.index_path, "ab") as index_file:
+                    index_file.write(b"".join(new_rows.keys()))
+
+                for row, key in enumerate(new_rows, start=self._rows):
+                    self._index.setdefault(key, row)
+                self._rows += len(new_rows)
+                stat = os.stat(self.index_path)
+                self._index_stat = (stat.st_ino, stat.st_size)
+
+            if full:
+                self._compacting = True
+                threading.Thread(
+                    target=self._compact_in_background, name="embedding-store-compact", daemon=True
+                ).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact(max_rows=int(self.max_rows * self.COMPACT_KEEP))
+        except Exception as e:
+            logger.error(f"❌ Erro ao compactar embedding store: {e}")
+            with self._thread_lock:
+                self._compacting = False
+
+    def compact(self, max_rows: Optional[int] = None) -> int:
+        """Reescreve o store sem duplicatas, mantendo no máximo as `max_rows` linhas mais recentes.
+
+        As leituras continuam durante a cópia, pelo mapeamento antigo; os
+        appends deste processo são descartados e os de outros esperam o lock.
+        """
+        with self._locked():
+            with self._thread_lock:
+                self._compacting = True
+                self._reload()
+                rows = sorted(self._index.values())
+                if max_rows is not None and len(rows) > max_rows:
+                    rows = rows[len(rows) - max_rows:]
+                keys_by_row = {row: key for key, row in self._index.items()}
+                vectors = self._vectors
+
+            try:
+                tmp_vectors, tmp_index = f"{self.vectors_path}.tmp", f"{self.index_path}.tmp"
+                with open(tmp_vectors, "wb") as vectors_file:
+                    for start in range(0, len(rows), self.COMPACT_CHUNK_ROWS):
+                        chunk = rows[start:start + self.COMPACT_CHUNK_ROWS]
+                        vectors_file.write(np.ascontiguousarray(vectors[chunk]).tobytes())
+                with open(tmp_index, "wb") as index_file:
+                    index_file.write(b"".join(keys_by_row[row] for row in rows))
+
+                with self._thread_lock:
+                    # Quem já mapeou os arquivos antigos continua lendo o inode antigo
+                    os.replace(tmp_vectors, self.vectors_path)
+                    os.replace(tmp_index, self.index_path)
+                    self._index_stat = (0, 0)
+                    self._reload()
+                    self.compactions += 1
+            finally:
+                with self._thread_lock:
+                    self._compacting = False
+
+        logger.info(f"🗜️ Embedding store compactado: {len(rows)} vetores")
+        return len(rows)
+
+    def _refresh(self):
+        """Remapeia os arquivos se outro processo acrescentou linhas ou compactou."""
+        stat = os.stat(self.index_path)
+        if (stat.st_ino, stat.st_size) == self._index_stat:
+            return
+
+        # Lock compartilhado: não remapeia no meio de um append/compactação
+        holding = getattr(self._local, "holding", False)
+        with nullcontext() if holding else self._locked(fcntl.LOCK_SH), self._thread_lock:
+            self._reload()
+
+    def _reload(self):
+        stat = os.stat(self.index_path)
+        current = (stat.st_ino, stat.st_size)
+
+        rows = stat.st_size // self.DIGEST_SIZE
+        vectors_size = os.path.getsize(self.vectors_path)
+        rows = min(rows, vectors_size // (self.dim * 4))
+
+        reload_all = current[0] != self._index_stat[0] or rows < self._rows
+        start = 0 if reload_all else self._rows
+        if reload_all:
+            self._index = {}
+
+        with open(self.index_path, "rb") as index_file:
+            index_file.seek(start * self.DIGEST_SIZE)
+            data = index_file.read((rows - start) * self.DIGEST_SIZE)
+
+        for offset in range(0, len(data), self.DIGEST_SIZE):
+            self._index.setdefault(data[offset:offset + self.DIGEST_SIZE], start + offset // self.DIGEST_SIZE)
+
+        self._rows = rows
+        self._index_stat = current
+        self._map_vectors()
+
+    def _map_vectors(self):
+        self._vectors = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+            if self._rows else np.empty((0, self.dim), dtype=np.float32)
+        )
+        self._mapped_rows = self._rows
+
+    @contextmanager
+    def _locked(self, mode: int = fcntl.LOCK_EX):
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, mode)
+            self._local.holding = True
+            try:
+                yield
+            finally:
+                self._local.holding = False
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_stats(self) -> Dict[str, int]:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "vectors": len(self._index),
+            "rows": self._rows,
+            "max_rows": self.max_rows,
+            "bytes": self._rows * self.dim * 4,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "compactions": self.compactions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manutenção do embedding store")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("path", help="Prefixo dos arquivos do store")
+    parser.add_argument("--max-rows", type=int, default=None, help="Linhas mantidas na compactação")
+    args = parser.parse_args()
+
+    if not os.path.exists(f"{args.path}.meta"):
+        sys.exit(f"Store não encontrado: {args.path}")
+
+    with open(f"{args.path}.meta") as meta:
+        store = EmbeddingStore(args.path, json.load(meta)["dim"])
+
+    if args.command == "compact":
+        store.compact(max_rows=args.max_rows)
+    print(json.dumps(store.get_stats(), indent=2))
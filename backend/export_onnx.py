@@ -0,0 +1,193 @@
+# export_onnx.py
+"""Exporta os modelos do EmailClassifier para ONNX e aplica quantização int8 dinâmica.
+
+Roda offline a partir dos pesos já presentes no cache local do Hugging Face:
+
+    python export_onnx.py --output models/onnx
+    python export_onnx.py --output models/onnx --check   # só a verificação de paridade
+
+Depois inicie a API com INFERENCE_BACKEND=onnx ONNX_MODEL_DIR=models/onnx.
+"""
+import os
+import sys
+import inspect
+import argparse
+import logging
+
+import numpy as np
+import torch
+
+from email_classifier import EmailClassifier
+from inference_backend import (
+    SENTIMENT_SUBDIR, SENTENCE_SUBDIR, model_file, load_inference_models
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("export_onnx")
+
+PARITY_SAMPLES = [
+    "Olá, estou com um problema no sistema e não consigo fazer login desde ontem.",
+    "Gostaria de saber o status do meu pedido de reembolso, protocolo 48213.",
+    "Muito obrigado pelo atendimento, vocês são excelentes!",
+    "Feliz natal e um próspero ano novo para toda a equipe!",
+    "URGENTE: o pagamento foi debitado duas vezes e preciso do estorno.",
+    "Parabéns pelo lançamento da nova versão do aplicativo.",
+    "Bom dia, segue em anexo a fatura referente ao mês de março.",
+    "O sistema apresenta erro 500 ao salvar o formulário de cadastro."
+]
+
+
+class _SentenceTransformerBody(torch.nn.Module):
+    """Transformer do MiniLM sem pooling: a média e a normalização ficam no runtime."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids
+        ).last_hidden_state
+
+
+class _SequenceClassifierLogits(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def _export(module, tokenizer, output_path: str, input_names, output_name: str):
+    sample = tokenizer(PARITY_SAMPLES[:2], padding=True, return_tensors="pt")
+    inputs = tuple(sample[name] for name in input_names)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"} if output_name == "logits" else {0: "batch", 1: "sequence"}
+
+    # torch >= 2.5 usa o exportador dynamo por padrão; mantemos o exportador clássico
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module,
+            inputs,
+            output_path,
+            input_names=list(input_names),
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            do_constant_folding=True,
+            **extra
+        )
+
+
+def _quantize(directory: str):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(model_file(directory, False), model_file(directory, True), weight_type=QuantType.QInt8)
+    logger.info(f"✅ Quantizado: {model_file(directory, True)}")
+
+
+def export_models(output_dir: str, sentiment_model: str, sentence_model: str, quantize: bool = True):
+    from transformers import AutoTokenizer, AutoModel, AutoModelForSequenceClassification
+
+    sentiment_dir = os.path.join(output_dir, SENTIMENT_SUBDIR)
+    sentence_dir = os.path.join(output_dir, SENTENCE_SUBDIR)
+    os.makedirs(sentiment_dir, exist_ok=True)
+    os.makedirs(sentence_dir, exist_ok=True)
+
+    logger.info(f"🔄 Exportando {sentiment_model}...")
+    tokenizer = AutoTokenizer.from_pretrained(sentiment_model, local_files_only=True)
+    model = AutoModelForSequenceClassification.from_pretrained(sentiment_model, local_files_only=True)
+    _export(_SequenceClassifierLogits(model), tokenizer, model_file(sentiment_dir, False),
+            ("input_ids", "attention_mask"), "logits")
+    tokenizer.save_pretrained(sentiment_dir)
+    model.config.save_pretrained(sentiment_dir)
+
+    logger.info(f"🔄 Exportando {sentence_model}...")
+    tokenizer = AutoTokenizer.from_pretrained(sentence_model, local_files_only=True)
+    model = AutoModel.from_pretrained(sentence_model, local_files_only=True)
+    input_names = ("input_ids", "attention_mask", "token_type_ids") if "token_type_ids" in tokenizer.model_input_names \
+        else ("input_ids", "attention_mask")
+    _export(_SentenceTransformerBody(model), tokenizer, model_file(sentence_dir, False),
+            input_names, "last_hidden_state")
+    tokenizer.save_pretrained(sentence_dir)
+    model.config.save_pretrained(sentence_dir)
+
+    if quantize:
+        _quantize(sentiment_dir)
+        _quantize(sentence_dir)
+
+    logger.info(f"✅ Modelos exportados em {output_dir}")
+
+
+def check_parity(output_dir: str, sentiment_model: str, sentence_model: str, quantized: bool = True,
+                 min_label_agreement: float = 0.85, min_cosine: float = 0.97) -> bool:
+    """Compara as saídas ONNX com as do torch nas amostras de paridade."""
+    torch_classifier, torch_encoder = load_inference_models("torch", sentiment_model, sentence_model)
+    onnx_classifier, onnx_encoder = load_inference_models(
+        "onnx", sentiment_model, sentence_model, onnx_model_dir=output_dir, onnx_quantized=quantized
+    )
+
+    torch_results = torch_classifier(PARITY_SAMPLES)
+    onnx_results = onnx_classifier(PARITY_SAMPLES)
+    label_agreement = float(np.mean([
+        a["label"] == b["label"] for a, b in zip(torch_results, onnx_results)
+    ]))
+    score_diff = float(np.max(np.abs(
+        np.array([result["score"] for result in torch_results]) -
+        np.array([result["score"] for result in onnx_results])
+    )))
+
+    with torch.no_grad():
+        torch_emb = torch_encoder.encode(PARITY_SAMPLES, convert_to_numpy=True, normalize_embeddings=True)
+    onnx_emb = onnx_encoder.encode(PARITY_SAMPLES, convert_to_numpy=True)
+    cosines = np.sum(torch_emb * onnx_emb, axis=1) / (
+        np.linalg.norm(torch_emb, axis=1) * np.linalg.norm(onnx_emb, axis=1)
+    )
+    min_observed_cosine = float(np.min(cosines))
+
+    passed = label_agreement >= min_label_agreement and min_observed_cosine >= min_cosine
+    variant = "int8" if quantized else "fp32"
+    logger.info(
+        f"{'✅' if passed else '❌'} Paridade ONNX {variant}: labels {label_agreement:.2%}, "
+        f"maior diferença de score {score_diff:.4f}, menor cosseno {min_observed_cosine:.4f}"
+    )
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta e quantiza os modelos para ONNX Runtime")
+    parser.add_argument("--output", default=os.getenv("ONNX_MODEL_DIR", "models/onnx"))
+    parser.add_argument("--sentiment-model", default=EmailClassifier.PRIMARY_MODEL_NAME)
+    parser.add_argument("--sentence-model", default=EmailClassifier.SENTENCE_MODEL_NAME)
+    parser.add_argument("--no-quantize", action="store_true", help="Exporta apenas fp32")
+    parser.add_argument("--check", action="store_true", help="Apenas verifica a paridade de modelos já exportados")
+    parser.add_argument("--skip-check", action="store_true", help="Não roda a verificação de paridade")
+    parser.add_argument("--min-label-agreement", type=float, default=0.85)
+    parser.add_argument("--min-cosine", type=float, default=0.97)
+    args = parser.parse_args()
+
+    # Nunca baixa pesos: usa apenas o cache local
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+    quantized = not args.no_quantize
+    if not args.check:
+        export_models(args.output, args.sentiment_model, args.sentence_model, quantize=quantized)
+
+    if args.skip_check:
+        return 0
+    passed = check_parity(
+        args.output, args.sentiment_model, args.sentence_model, quantized=quantized,
+        min_label_agreement=args.min_label_agreement, min_cosine=args.min_cosine
+    )
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,75 @@
 # file_processor.py
 import aiofiles
 import PyPDF2
-import io
+import asyncio
+import codecs
+import json
+import email
+import email.policy
 import logging
-from typing import Optional
+from typing import Optional, AsyncIterator, Dict, Any, BinaryIO, Iterable
 from fastapi import UploadFile, HTTPException
 
 logger = logging.getLogger(__name__)
 
 
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(413, f"Arquivo muito grande. Máximo: {max_bytes // (1024 * 1024)} MB")
+
+
+class UploadSizeLimitMiddleware:
+    """Recusa uploads grandes demais antes do parse do multipart.
+
+    Confere o Content-Length e, sem ele (chunked), conta os bytes recebidos:
+    o corpo para de ser lido no primeiro chunk que passa do limite. O 413 é
+    levantado de dentro do `receive`, então passa pelos exception handlers do app.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            if content_length and int(content_length) > self.max_bytes:
+                raise _too_large(self.max_bytes)
+
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
 class FileProcessor:
-    """Processador de arquivos para extração de texto."""
-    
-    @staticmethod
-    async def process_uploaded_file(file: UploadFile) -> str:
+    """Processador de arquivos para extração de texto.
+
+    O upload é lido em chunks, nunca inteiro: .txt passa por um decoder UTF-8
+    incremental e o PDF é lido do arquivo temporário do upload em uma thread,
+    página a página, até o orçamento de páginas ou de caracteres.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, max_upload_bytes: int = 10 * 1024 * 1024, max_pdf_pages: int = 50,
+                 max_text_chars: int = 100_000):
+        self.max_upload_bytes = max_upload_bytes
+        self.max_pdf_pages = max_pdf_pages
+        self.max_text_chars = max_text_chars
+
+    async def process_uploaded_file(self, file: UploadFile) -> str:
         """Process uploaded file and extract text content."""
         try:
             if not file.filename:
@@ -23,16 +79,14 @@ class FileProcessor:
 
             if not filename.endswith(('.txt', '.pdf')):
                 raise HTTPException(400, "Tipo de arquivo não suportado. Use .txt ou .pdf")
-            
-            content = await file.read()
+
+            if file.size is not None and file.size > self.max_upload_bytes:
+                raise _too_large(self.max_upload_bytes)
 
             if filename.endswith('.pdf'):
-                text = await FileProcessor._extract_text_from_pdf(content)
+                text = await self._extract_text_from_pdf(file)
             else:
-                try:
-                    text = content.decode('utf-8')
-                except UnicodeDecodeError:
-                    raise HTTPException(400, "Erro ao decodificar arquivo .txt. Use UTF-8.")
+                text = await self._read_text(file)
 
             if not text.strip():
                 raise HTTPException(400, "Arquivo vazio ou sem texto legível")
@@ -45,24 +99,176 @@ class FileProcessor:
             logger.error(f"Erro ao processar arquivo: {str(e)}")
             raise HTTPException(500, f"Erro ao processar arquivo: {str(e)}")
 
-    @staticmethod
-    async def _extract_text_from_pdf(pdf_content: bytes) -> str:
-        """Extract text from PDF content."""
+    async def _read_text(self, file: UploadFile) -> str:
+        """Lê um .txt em chunks com decoder UTF-8 incremental, até o limite de caracteres"""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        parts = []
+        size = 0
+        chars = 0
+
         try:
-            pdf_file = io.BytesIO(pdf_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
+            while chars < self.max_text_chars:
+                chunk = await file.read(self.CHUNK_SIZE)
+                if not chunk:
+                    parts.append(decoder.decode(b"", final=True))
+                    break
 
-            text = ""
-            for page in pdf_reader.pages:
-                extracted = page.extract_text()
-                if extracted:
-                    text += extracted + "\n"
+                size += len(chunk)
+                if size > self.max_upload_bytes:
+                    raise _too_large(self.max_upload_bytes)
 
-            if not text.strip():
+                part = decoder.decode(chunk)
+                parts.append(part)
+                chars += len(part)
+            else:
+                logger.info(f"✂️ Arquivo .txt truncado em {self.max_text_chars} caracteres")
+
+        except UnicodeDecodeError:
+            raise HTTPException(400, "Erro ao decodificar arquivo .txt. Use UTF-8.")
+
+        return "".join(parts)[:self.max_text_chars]
+
+    async def _extract_text_from_pdf(self, file: UploadFile) -> str:
+        """Extract text from PDF content."""
+        try:
+            # PyPDF2 é síncrono: roda fora do event loop, lendo do arquivo temporário do upload
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(None, self._extract_pdf_pages, file.file)
+
+            if not text:
                 raise ValueError("PDF sem texto extraível")
 
-            return text.strip()
+            return text
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Erro ao extrair texto do PDF: {str(e)}")
-            raise HTTPException(400, "Não foi possível extrair texto do PDF")
\ No newline at end of file
+            raise HTTPException(400, "Não foi possível extrair texto do PDF")
+
+    def _extract_pdf_pages(self, stream: BinaryIO) -> str:
+        """Texto das páginas do PDF, parando no orçamento de páginas ou de caracteres"""
+        stream.seek(0, 2)
+        if stream.tell() > self.max_upload_bytes:
+            raise _too_large(self.max_upload_bytes)
+        stream.seek(0)
+
+        pdf_reader = PyPDF2.PdfReader(stream)
+        total_pages = len(pdf_reader.pages)
+        parts = []
+        chars = 0
+
+        for page_number in range(min(total_pages, self.max_pdf_pages)):
+            extracted = pdf_reader.pages[page_number].extract_text()
+            if extracted:
+                parts.append(extracted)
+                chars += len(extracted) + 1
+            if chars >= self.max_text_chars:
+                logger.info(f"✂️ PDF truncado em {self.max_text_chars} caracteres (página {page_number + 1} de {total_pages})")
+                break
+        else:
+            if total_pages > self.max_pdf_pages:
+                logger.info(f"✂️ PDF truncado em {self.max_pdf_pages} de {total_pages} páginas")
+
+        return "\n".join(parts)[:self.max_text_chars].strip()
+
+    @staticmethod
+    async def iter_ndjson_records(chunks: AsyncIterator[bytes], max_line_bytes: int = 1_000_000) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Lê um stream NDJSON incrementalmente, produzindo um registro por linha.
+
+        Linhas inválidas ou grandes demais produzem None, sem interromper o stream.
+        """
+        buffer = b""
+        oversized = False
+
+        async for chunk in chunks:
+            buffer += chunk
+            lines = buffer.split(b"\n")
+            buffer = lines.pop()
+
+            for line in lines:
+                if oversized:
+                    # Fim da linha grande demais: descarta e segue para a próxima
+                    oversized = False
+                    yield None
+                    continue
+                if line.strip():
+                    yield FileProcessor._parse_ndjson_line(line)
+
+            if len(buffer) > max_line_bytes:
+                buffer = b""
+                oversized = True
+
+        if oversized:
+            yield None
+        elif buffer.strip():
+            yield FileProcessor._parse_ndjson_line(buffer)
+
+    @staticmethod
+    def _parse_ndjson_line(line: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            record = json.loads(line)
+        except (UnicodeDecodeError, ValueError):
+            return None
+        return record if isinstance(record, dict) else None
+
+    @staticmethod
+    async def iter_mbox_messages(chunks: AsyncIterator[bytes], max_message_bytes: int = 5_000_000) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Lê um arquivo .mbox incrementalmente, produzindo um email por vez.
+
+        Mensagens grandes demais ou ilegíveis produzem None.
+        """
+        buffer = b""
+        message_lines = []
+        message_size = 0
+        previous_blank = True
+
+        async for chunk in chunks:
+            buffer += chunk
+            lines = buffer.split(b"\n")
+            buffer = lines.pop()
+
+            for line in lines:
+                if line.startswith(b"From ") and previous_blank:
+                    if message_size:
+                        yield FileProcessor._parse_mbox_message(message_lines, message_size, max_message_bytes)
+                    message_lines, message_size = [], 0
+                    previous_blank = False
+                    continue
+
+                previous_blank = not line.strip()
+                message_size += len(line) + 1
+                if message_size <= max_message_bytes:
+                    # Desfaz o escape ">From " do formato mboxrd
+                    if line.startswith(b">") and line.lstrip(b">").startswith(b"From "):
+                        line = line[1:]
+                    message_lines.append(line)
+
+            if len(buffer) > max_message_bytes:
+                message_size += len(buffer)
+                buffer = b""
+
+        if buffer:
+            message_lines.append(buffer)
+            message_size += len(buffer)
+        if message_size:
+            yield FileProcessor._parse_mbox_message(message_lines, message_size, max_message_bytes)
+
+    @staticmethod
+    def _parse_mbox_message(lines, size: int, max_message_bytes: int) -> Optional[Dict[str, Any]]:
+        if size > max_message_bytes:
+            return None
+
+        try:
+            message = email.message_from_bytes(b"\n".join(lines), policy=email.policy.default)
+            body_part = message.get_body(preferencelist=("plain", "html"))
+            body = body_part.get_content() if body_part else ""
+            subject = message.get("subject", "") or ""
+
+            return {
+                "id": message.get("message-id"),
+                "text": f"Assunto: {subject}\n\n{body}" if subject else body
+            }
+        except Exception as e:
+            logger.error(f"Erro ao ler mensagem do mbox: {str(e)}")
+            return None
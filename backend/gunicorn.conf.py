@@ -0,0 +1,95 @@
+# gunicorn.conf.py
+"""Modo opcional: vários workers uvicorn compartilhando uma única cópia dos modelos.
+
+O master importa `main` (preload_app) e carrega RoBERTa e MiniLM antes do
+fork. Os workers herdam os pesos copy-on-write: como a inferência só lê os
+tensores, as páginas continuam compartilhadas e cada worker novo custa
+apenas a sua memória privada (veja "memory" em /metrics).
+
+O preço é o start: sem carregamento em segundo plano, o gunicorn só aceita
+conexões com os modelos prontos. O padrão da imagem é um único processo
+uvicorn, que sobe na hora em modo regras; use este modo só com CPU e memória
+para mais de um worker:
+
+    WEB_CONCURRENCY=2 gunicorn -c gunicorn.conf.py main:app
+"""
+import gc
+import os
+import math
+
+from memory_stats import MASTER_PID_ENV
+
+
+def available_cpus() -> int:
+    """Núcleos que o processo pode usar: afinidade e cota do cgroup (ex.: docker --cpus)"""
+    cpus = len(os.sched_getaffinity(0))
+
+    quota = None
+    try:
+        # cgroup v2: "<cota> <período>" ou "max <período>"
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            limit, period = cpu_max.read().split()
+        if limit != "max":
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: cota -1 = sem limite
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as quota_file, \
+                    open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as period_file:
+                limit, period = int(quota_file.read()), int(period_file.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+cpus = available_cpus()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Sem WEB_CONCURRENCY, um worker por núcleo disponível, no máximo dois
+workers = int(os.getenv("WEB_CONCURRENCY") or min(2, cpus))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Modelos carregados uma vez, no master
+preload_app = True
+
+# Threads de inferência por worker: os núcleos são divididos entre os workers
+inference_threads = int(os.getenv("INFERENCE_THREADS") or max(1, cpus // workers))
+
+# Com preload os modelos precisam estar prontos antes do fork: uma thread de
+# carregamento em segundo plano não sobrevive ao fork
+os.environ["MODEL_BACKGROUND_LOADING"] = "false"
+# Os workers compartilham os modelos do master: o gerenciador de memória fica desligado
+os.environ["APP_PRELOADED"] = "true"
+# Pool de processos por worker duplicaria os modelos
+os.environ.setdefault("INFERENCE_MODE", "thread")
+# Threads criadas antes do fork não existem nos workers: o master roda com uma
+# só (o app é importado antes de qualquer hook) e cada worker ajusta em post_fork
+os.environ["OMP_NUM_THREADS"] = "1"
+# Documentos do /upload precisam ser visíveis para o worker que recebe o /classify
+os.environ.setdefault("DOCUMENT_STORE_BACKEND", "disk")
+# O thread pool do ONNX Runtime é criado com a sessão, ainda no master
+os.environ.setdefault("ONNX_INTRA_OP_THREADS", "1")
+
+
+def when_ready(server):
+    # Objetos criados até aqui (inclusive os modelos) saem da coleta do gc, que
+    # de outra forma escreveria nos cabeçalhos e copiaria as páginas em cada worker
+    gc.collect()
+    gc.freeze()
+    os.environ[MASTER_PID_ENV] = str(os.getpid())
+    server.log.info(
+        f"🧊 Modelos pré-carregados; {workers} workers com {inference_threads} thread(s) de inferência ({cpus} CPU(s))"
+    )
+
+
+def post_fork(server, worker):
+    import torch
+    torch.set_num_threads(inference_threads)
@@ -0,0 +1,161 @@
+# inference_backend.py
+import os
+import json
+import logging
+from typing import Dict, Any, List, Tuple, Union
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+
+SENTIMENT_SUBDIR = "sentiment"
+SENTENCE_SUBDIR = "minilm"
+
+
+def model_file(directory: str, quantized: bool) -> str:
+    return os.path.join(directory, "model.int8.onnx" if quantized else "model.onnx")
+
+
+def load_inference_models(backend: str, primary_model_name: str, sentence_model_name: str,
+                          onnx_model_dir: str = "models/onnx", onnx_quantized: bool = True,
+                          onnx_intra_op_threads: int = 0) -> Tuple[Any, Any]:
+    """Carrega (classificador primário, sentence model) para o backend escolhido.
+
+    Os objetos retornados pelo backend ONNX têm a mesma interface usada pelo
+    EmailClassifier: o classificador é chamável como um pipeline do
+    transformers e o sentence model expõe `encode()`.
+    """
+    if backend == "torch":
+        from transformers import pipeline
+        from sentence_transformers import SentenceTransformer
+
+        primary_classifier = pipeline(
+            "text-classification",
+            model=primary_model_name,
+            device=-1,
+            torch_dtype=torch.float32
+        )
+        sentence_model = SentenceTransformer(sentence_model_name, device='cpu')
+        return primary_classifier, sentence_model
+
+    if backend == "onnx":
+        primary_classifier = OnnxSentimentPipeline(
+            os.path.join(onnx_model_dir, SENTIMENT_SUBDIR), onnx_quantized, intra_op_threads=onnx_intra_op_threads
+        )
+        sentence_model = OnnxSentenceEncoder(
+            os.path.join(onnx_model_dir, SENTENCE_SUBDIR), onnx_quantized, intra_op_threads=onnx_intra_op_threads
+        )
+        return primary_classifier, sentence_model
+
+    raise ValueError(f"Backend de inferência inválido: {backend}. Use {', '.join(BACKENDS)}")
+
+
+def _create_session(path: str, intra_op_threads: int = 0):
+    import onnxruntime
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Modelo ONNX não encontrado: {path}. Rode export_onnx.py antes")
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    # 0 = padrão do ONNX Runtime (um thread por núcleo físico)
+    options.intra_op_num_threads = intra_op_threads
+    return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+def _session_inputs(session, encoded: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    names = {model_input.name for model_input in session.get_inputs()}
+    return {name: value.astype(np.int64) for name, value in encoded.items() if name in names}
+
+
+class OnnxSentimentPipeline:
+    """Equivalente ONNX do pipeline "text-classification" do transformers."""
+
+    def __init__(self, directory: str, quantized: bool = True, max_length: int = 512, intra_op_threads: int = 0):
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(directory, local_files_only=True)
+        self.session = _create_session(model_file(directory, quantized), intra_op_threads)
+        self.max_length = max_length
+
+        with open(os.path.join(directory, "config.json")) as config_file:
+            id2label = json.load(config_file)["id2label"]
+        self.id2label = {int(index): label for index, label in id2label.items()}
+
+    def predict_proba(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Probabilidades por classe (softmax dos logits), uma linha por texto."""
+        probabilities = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            logits = self.session.run(None, _session_inputs(self.session, encoded))[0]
+            logits = logits - logits.max(axis=1, keepdims=True)
+            exp = np.exp(logits)
+            probabilities.append(exp / exp.sum(axis=1, keepdims=True))
+
+        return np.concatenate(probabilities) if probabilities else np.empty((0, len(self.id2label)))
+
+    def __call__(self, texts: Union[str, List[str]], batch_size: int = None, top_k: int = 1, **kwargs):
+        items = [texts] if isinstance(texts, str) else list(texts)
+        probabilities = self.predict_proba(items, batch_size or 32)
+
+        results = []
+        for row in probabilities:
+            ranked = [
+                {"label": self.id2label[index], "score": float(row[index])}
+                for index in np.argsort(row)[::-1]
+            ]
+            results.append(ranked if top_k is None else (ranked[0] if top_k == 1 else ranked[:top_k]))
+        return results
+
+
+class OnnxSentenceEncoder:
+    """Equivalente ONNX do SentenceTransformer all-MiniLM-L6-v2 (mean pooling + normalização)."""
+
+    def __init__(self, directory: str, quantized: bool = True, max_seq_length: int = 256, intra_op_threads: int = 0):
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(directory, local_files_only=True)
+        self.session = _create_session(model_file(directory, quantized), intra_op_threads)
+        self.max_seq_length = max_seq_length
+        self._dimension = self.session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_tensor: bool = False, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        items = [sentences] if single else list(sentences)
+
+        embeddings = []
+        for start in range(0, len(items), batch_size):
+            encoded = self.tokenizer(
+                items[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            token_embeddings = self.session.run(None, _session_inputs(self.session, encoded))[0]
+
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings.append(pooled.astype(np.float32))
+
+        result = np.concatenate(embeddings) if embeddings else np.empty((0, self._dimension), dtype=np.float32)
+        if single:
+            result = result[0]
+
+        return torch.from_numpy(result) if convert_to_tensor else result
@@ -0,0 +1,195 @@
+# inference_executor.py
+import asyncio
+import logging
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, List, Tuple
+
+from models import EmailCategory
+from performance_metrics import StageLog
+
+logger = logging.getLogger(__name__)
+
+# Serviços carregados em cada processo do pool (modo "process")
+_worker_services: Dict[str, Any] = {}
+
+
+def _init_worker(classifier_options: Dict[str, Any]):
+    """Pré-carrega os modelos uma única vez em cada processo do pool."""
+    from email_classifier import EmailClassifier
+    from response_generator import ResponseGenerator
+    from result_cache import create_result_cache
+    from profiling import create_profiler
+
+    # O worker só recebe tarefas depois do initializer: carrega de forma síncrona
+    options = dict(classifier_options, background_loading=False)
+    _worker_services["stage_log"] = StageLog()
+    _worker_services["classifier"] = EmailClassifier(
+        result_cache=create_result_cache(), metrics=_worker_services["stage_log"],
+        profiler=create_profiler(), **options
+    )
+    _worker_services["response_generator"] = ResponseGenerator()
+
+
+def _worker_call(service: str, method: str, args: tuple):
+    """Resultado da chamada e os tempos de estágio medidos durante ela"""
+    result = getattr(_worker_services[service], method)(*args)
+    return result, _worker_services["stage_log"].drain()
+
+
+def _worker_status() -> bool:
+    return _worker_services["classifier"].models_ready
+
+
+class InferenceExecutor:
+    """Executa classificação e geração de resposta fora do event loop."""
+
+    MODES = ("thread", "process")
+
+    def __init__(self, classifier, response_generator, mode: str = "thread",
+                 max_workers: int = 1, classifier_options: Dict[str, Any] = None, metrics=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de execução inválido: {mode}. Use {', '.join(self.MODES)}")
+
+        self.mode = mode
+        self.max_workers = max(1, max_workers)
+        self.classifier = classifier
+        self.response_generator = response_generator
+        self.metrics = metrics
+        self._workers_ml_loaded = False
+        self._workers_ready = False
+        self._workers_task = None
+        self._classifier_options = classifier_options or {}
+        self._pool = None
+        self.stage_exits = {stage: 0 for stage in classifier.STAGE_MODEL_USED}
+
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+
+    async def start(self):
+        """Cria o pool de processos e pré-carrega os modelos em cada worker.
+
+        Não espera o carregamento: até todos os workers responderem, as chamadas
+        usam o classificador local (regras) do processo principal.
+        """
+        if self.mode != "process" or self._pool is not None:
+            return
+
+        # spawn evita herdar estado do torch/threads do processo principal
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._classifier_options,)
+        )
+
+        self._workers_task = asyncio.ensure_future(self._wait_for_workers())
+
+    async def _wait_for_workers(self):
+        # Força a criação e o carregamento de modelos de todos os workers
+        loop = asyncio.get_running_loop()
+        try:
+            pings = [loop.run_in_executor(self._pool, _worker_status) for _ in range(self.max_workers)]
+            self._workers_ml_loaded = all(await asyncio.gather(*pings))
+            self._workers_ready = True
+            logger.info(f"⚙️ Pool de processos pronto ({self.max_workers} workers, ML: {self._workers_ml_loaded})")
+        except Exception as e:
+            logger.error(f"❌ Erro ao iniciar workers de inferência: {e}")
+
+    @property
+    def models_loaded(self) -> bool:
+        """Indica se a inferência está usando os modelos de ML."""
+        if self.mode == "process":
+            return self._workers_ml_loaded
+        return self.classifier.models_ready
+
+    @property
+    def model_state(self) -> str:
+        """Estado do carregamento: disabled, loading, ready ou failed."""
+        if self.mode == "thread":
+            return self.classifier.model_state
+        if not self._workers_ready:
+            return "loading"
+        if self._workers_ml_loaded:
+            return "ready"
+        return "failed" if self._classifier_options.get("use_ml_models", True) else "disabled"
+
+    async def _run(self, service: str, method: str, *args):
+        loop = asyncio.get_running_loop()
+
+        if self.mode == "process" and self._workers_ready:
+            result, stage_samples = await loop.run_in_executor(self._pool, _worker_call, service, method, args)
+            if self.metrics is not None:
+                self.metrics.record_stages(stage_samples)
+            return result
+
+        # No modo "process", enquanto os workers carregam, as regras rodam no processo principal
+        pool = self._pool if self.mode == "thread" else None
+        target = self.classifier if service == "classifier" else self.response_generator
+        return await loop.run_in_executor(pool, getattr(target, method), *args)
+
+    async def classify(self, text: str) -> Dict[str, Any]:
+        result = await self._run("classifier", "classify", text)
+        self._record_stages([result])
+        return result
+
+    async def classify_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        results = await self._run("classifier", "classify_batch", texts)
+        self._record_stages(results)
+        return results
+
+    def _record_stages(self, results: List[Dict[str, Any]]):
+        # Contado aqui (e não no classificador) para somar todos os workers do pool
+        for result in results:
+            stage = result.get("decision_stage")
+            if stage in self.stage_exits:
+                self.stage_exits[stage] += 1
+
+    async def generate_response(self, category: EmailCategory, text: str,
+                                classification_data: Dict = None) -> str:
+        with self._stage("response_generation"):
+            return await self._run("response_generator", "generate", category, text, classification_data)
+
+    async def generate_responses(self, items: List[Tuple[EmailCategory, str, Dict]]) -> List[str]:
+        with self._stage("response_generation"):
+            return await self._run("response_generator", "generate_batch", items)
+
+    def _stage(self, stage: str):
+        return self.metrics.stage(stage) if self.metrics is not None else nullcontext()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "models_loaded": self.models_loaded,
+            "model_state": self.model_state
+        }
+        if self.mode == "thread":
+            stats["model_load"] = self.classifier.get_model_status()
+        return stats
+
+    def get_cascade_stats(self) -> Dict[str, Any]:
+        """Quantos emails cada estágio da cascata decidiu"""
+        decided = sum(self.stage_exits.values())
+        return {
+            "enabled": self.classifier.cascade_enabled,
+            "rules_threshold": self.classifier.cascade_rules_threshold,
+            "rules_min_keyword_confidence": self.classifier.cascade_rules_min_keyword_confidence,
+            "primary_threshold": self.classifier.cascade_primary_threshold,
+            "decided": decided,
+            "exits": dict(self.stage_exits),
+            "exit_rates": {
+                stage: round(count / decided, 4) if decided else 0.0
+                for stage, count in self.stage_exits.items()
+            }
+        }
+
+    def shutdown(self):
+        if self._workers_task is not None:
+            self._workers_task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
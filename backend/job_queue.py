@@ -0,0 +1,521 @@
+# job_queue.py
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional
+
+import PyPDF2
+
+from bulk_stream import stream_classifications
+from file_processor import FileProcessor
+
+logger = logging.getLogger(__name__)
+
+# Extensão do arquivo -> tipo de job
+JOB_KINDS = {".pdf": "pdf", ".txt": "txt", ".mbox": "mbox", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+FINAL_STATUSES = ("completed", "failed")
+
+
+class JobQueue:
+    """Fila durável de jobs em SQLite, compartilhada entre processos.
+
+    O arquivo enviado fica em `payload_dir` e os resultados em `job_results`,
+    gravados a cada lote junto com o progresso. Um job em execução tem um lease
+    renovado pelo worker; se o processo morre, o lease expira e outro worker
+    retoma o job a partir do último registro gravado. Depois de `max_attempts`
+    tentativas o job é marcado como falho.
+    """
+
+    def __init__(self, path: str, payload_dir: str, lease_s: float = 60, max_attempts: int = 3,
+                 retention_s: float = 7 * 24 * 3600):
+        self.path = path
+        self.payload_dir = payload_dir
+        self.lease_s = lease_s
+        self.max_attempts = max(1, max_attempts)
+        self.retention_s = retention_s
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(payload_dir, exist_ok=True)
+        self._connect()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn_pid = os.getpid()
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, filename TEXT, options TEXT NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_expires_at REAL, "
+            "total INTEGER, processed INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, "
+            "last_index INTEGER NOT NULL DEFAULT -1, error TEXT, created_at REAL NOT NULL, "
+            "started_at REAL, updated_at REAL NOT NULL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_results ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, result TEXT NOT NULL, "
+            "PRIMARY KEY (job_id, idx)) WITHOUT ROWID"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # Conexões SQLite não podem atravessar um fork (gunicorn com preload_app)
+        if self._conn_pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def payload_path(self, job_id: str) -> str:
+        return os.path.join(self.payload_dir, job_id)
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    def create(self, job_id: str, kind: str, filename: str = None, options: Dict[str, Any] = None,
+               total: int = None) -> Dict[str, Any]:
+        """Registra um job cujo arquivo já foi gravado em `payload_path(job_id)`"""
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO jobs (id, kind, filename, options, status, total, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, filename, json.dumps(options or {}), total, now, now)
+            )
+        return self.get(job_id)
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Reserva o job mais antigo na fila (ou com lease expirado) para `worker`"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        "SELECT id, attempts FROM jobs WHERE status = 'queued' "
+                        "OR (status = 'running' AND lease_expires_at < ?) ORDER BY created_at LIMIT 1",
+                        (now,)
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+
+                    if row["attempts"] >= self.max_attempts:
+                        conn.execute(
+                            "UPDATE jobs SET status = 'failed', error = ?, worker = NULL, finished_at = ?, "
+                            "updated_at = ? WHERE id = ?",
+                            (f"Job interrompido {row['attempts']} vezes", now, now, row["id"])
+                        )
+                        continue
+
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                        "lease_expires_at = ?, started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?",
+                        (worker, now + self.lease_s, now, now, row["id"])
+                    )
+                    conn.execute("COMMIT")
+                    return self._get(conn, row["id"])
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def heartbeat(self, job_id: str, worker: str) -> bool:
+        """Renova o lease; False se o job não pertence mais a este worker"""
+        now = time.time()
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_s, job_id, worker)
+            )
+        return cursor.rowcount == 1
+
+    def set_total(self, job_id: str, total: int):
+        with self._lock:
+            self._connection().execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+
+    def save_progress(self, job_id: str, worker: str, lines: List[Dict[str, Any]]) -> bool:
+        """Grava um lote de resultados e o progresso na mesma transação (False se o lease foi perdido)"""
+        if not lines:
+            return self.heartbeat(job_id, worker)
+
+        now = time.time()
+        processed = sum(1 for line in lines if line["type"] == "result")
+        failed = len(lines) - processed
+
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "UPDATE jobs SET processed = processed + ?, failed = failed + ?, last_index = ?, "
+                    "lease_expires_at = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                    (processed, failed, lines[-1]["index"], now + self.lease_s, now, job_id, worker)
+                )
+                if cursor.rowcount != 1:
+                    conn.execute("ROLLBACK")
+                    return False
+
+                conn.executemany(
+                    "INSERT OR REPLACE INTO job_results (job_id, idx, result) VALUES (?, ?, ?)",
+                    [(job_id, line["index"], json.dumps(line, ensure_ascii=False)) for line in lines]
+                )
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def finish(self, job_id: str, worker: str, status: str, error: str = None):
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, error = ?, worker = NULL, lease_expires_at = NULL, "
+                "finished_at = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                (status, error, now, now, job_id, worker)
+            )
+        if status in FINAL_STATUSES:
+            self.remove_payload(job_id)
+
+    def fail(self, job_id: str, worker: str, error: str):
+        """Devolve o job à fila, ou o marca como falho depois de `max_attempts` tentativas"""
+        job = self.get(job_id)
+        if job and job["attempts"] < self.max_attempts:
+            self.release(job_id, worker, error)
+        else:
+            self.finish(job_id, worker, "failed", error)
+
+    def release(self, job_id: str, worker: str, error: str = None, graceful: bool = False):
+        """Devolve o job à fila, mantendo o progresso.
+
+        `graceful` (desligamento do processo) devolve também a tentativa: só
+        falhas e leases expirados contam para `max_attempts`.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = 'queued', error = ?, worker = NULL, lease_expires_at = NULL, "
+                "attempts = MAX(attempts - ?, 0), updated_at = ? WHERE id = ? AND worker = ?",
+                (error, int(graceful), now, job_id, worker)
+            )
+
+    def _get(self, conn: sqlite3.Connection, job_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._get(self._connection(), job_id)
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT result FROM job_results WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        return [json.loads(row["result"]) for row in rows]
+
+    def cleanup(self) -> int:
+        """Apaga jobs finalizados há mais de `retention_s` e seus resultados"""
+        cutoff = time.time() - self.retention_s
+        with self._lock:
+            conn = self._connection()
+            expired = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?", (cutoff,)
+            ).fetchall()]
+            for job_id in expired:
+                conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        for job_id in expired:
+            self.remove_payload(job_id)
+        return len(expired)
+
+    def remove_payload(self, job_id: str):
+        try:
+            os.unlink(self.payload_path(job_id))
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in ("queued", "running") + FINAL_STATUSES}
+        counts.update({row["status"]: row["count"] for row in rows})
+        return {"path": self.path, "lease_seconds": self.lease_s, "max_attempts": self.max_attempts, "jobs": counts}
+
+
+def job_summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Estado público de um job"""
+    done = job["processed"] + job["failed"]
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "filename": job["filename"],
+        "options": job["options"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "total": job["total"],
+        "processed": job["processed"],
+        "failed": job["failed"],
+        "progress": round(done / job["total"], 4) if job["total"] else None,
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "updated_at": job["updated_at"],
+        "finished_at": job["finished_at"]
+    }
+
+
+class JobRunner:
+    """Workers em segundo plano que consomem a fila de jobs.
+
+    A quantidade de workers é fixa (não depende de conexões HTTP abertas): cada
+    um reserva um job por vez e o classifica em lotes pelo executor de
+    inferência, com o mesmo pipeline do /classify/stream.
+    """
+
+    def __init__(self, queue: JobQueue, executor, file_processor: FileProcessor, workers: int = 1,
+                 chunk_size: int = 32, max_tokens: int = 65536,
+                 count_tokens: Optional[Callable[[str], int]] = None, poll_interval: float = 2.0):
+        self.queue = queue
+        self.executor = executor
+        self.file_processor = file_processor
+        self.workers = max(0, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+        self.poll_interval = poll_interval
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self):
+        if self._tasks or not self.workers:
+            return
+        self._wakeup = asyncio.Event()
+        prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks = [asyncio.ensure_future(self._work(f"{prefix}-{n}")) for n in range(self.workers)]
+        logger.info(f"🗂️ {self.workers} worker(s) de jobs ativos ({self.queue.path})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Acorda os workers deste processo (job novo na fila)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _work(self, worker: str):
+        loop = asyncio.get_running_loop()
+        last_cleanup = 0.0
+
+        while True:
+            try:
+                job = await loop.run_in_executor(None, self.queue.claim, worker)
+            except Exception as e:
+                logger.error(f"❌ Erro ao reservar job: {e}")
+                job = None
+
+            if job is None:
+                if time.monotonic() - last_cleanup > 3600:
+                    last_cleanup = time.monotonic()
+                    await loop.run_in_executor(None, self.queue.cleanup)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run_job(job, worker)
+
+    async def _run_job(self, job: Dict[str, Any], worker: str):
+        loop = asyncio.get_running_loop()
+        job_id = job["id"]
+        resume_from = job["last_index"] + 1
+        logger.info(f"🗂️ Job {job_id} ({job['kind']}) iniciado por {worker} a partir do registro {resume_from}")
+
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, worker))
+        progress = {
+            "stream_id": job_id, "status": "running", "resume_from": resume_from, "received": 0,
+            "skipped": 0, "processed": 0, "failed": 0, "last_index": resume_from - 1,
+            "started_at": time.time(), "updated_at": time.time()
+        }
+        lines = stream_classifications(
+            self._records(job, resume_from), self.executor, progress, chunk_size=self.chunk_size,
+            max_tokens=self.max_tokens, count_tokens=self.count_tokens
+        )
+
+        pending: List[Dict[str, Any]] = []
+        owned = True
+        try:
+            async for raw_line in lines:
+                line = json.loads(raw_line)
+                if line["type"] in ("result", "error") and "index" in line:
+                    pending.append(line)
+                if len(pending) >= self.chunk_size:
+                    owned = await loop.run_in_executor(None, self.queue.save_progress, job_id, worker, pending)
+                    pending = []
+                    if not owned:
+                        break
+
+            if owned:
+                owned = await loop.run_in_executor(None, self.queue.save_progress, job_id, worker, pending)
+
+            if not owned:
+                logger.warning(f"⚠️ Job {job_id}: lease perdido, outro worker assumiu")
+            elif progress["status"] == "completed":
+                await loop.run_in_executor(None, self.queue.finish, job_id, worker, "completed")
+                self.completed += 1
+                logger.info(f"✅ Job {job_id} concluído ({progress['processed']} ok, {progress['failed']} com erro)")
+            else:
+                await loop.run_in_executor(None, self.queue.fail, job_id, worker, "Erro interno ao processar o job")
+                self.failed += 1
+
+        except asyncio.CancelledError:
+            # Desligamento: o job volta para a fila e é retomado do último lote gravado
+            self.queue.release(job_id, worker, graceful=True)
+            raise
+        except Exception as e:
+            logger.error(f"❌ Erro no job {job_id}: {e}")
+            await loop.run_in_executor(None, self.queue.fail, job_id, worker, str(e))
+            self.failed += 1
+        finally:
+            heartbeat.cancel()
+            await lines.aclose()
+
+    async def _heartbeat(self, job_id: str, worker: str):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.queue.lease_s / 3)
+            await loop.run_in_executor(None, self.queue.heartbeat, job_id, worker)
+
+    async def _records(self, job: Dict[str, Any], resume_from: int) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Registros do job na ordem de entrada (os anteriores a `resume_from` podem vir como None)"""
+        loop = asyncio.get_running_loop()
+        path = self.queue.payload_path(job["id"])
+        kind = job["kind"]
+
+        if kind == "ndjson":
+            async for record in FileProcessor.iter_ndjson_records(_file_chunks(path)):
+                yield record
+        elif kind == "mbox":
+            async for record in FileProcessor.iter_mbox_messages(_file_chunks(path)):
+                yield record
+        elif kind == "pdf" and job["options"].get("split") == "pages":
+            async for record in self._pdf_pages(job, path, resume_from):
+                yield record
+        else:
+            if resume_from > 0:
+                return
+            text = await loop.run_in_executor(None, self._document_text, kind, path)
+            yield {"id": job["filename"], "text": text}
+
+    async def _pdf_pages(self, job: Dict[str, Any], path: str, resume_from: int):
+        loop = asyncio.get_running_loop()
+        with open(path, "rb") as pdf_file:
+            reader = await loop.run_in_executor(None, PyPDF2.PdfReader, pdf_file)
+            total = min(len(reader.pages), self.file_processor.max_pdf_pages)
+            if job["total"] != total:
+                await loop.run_in_executor(None, self.queue.set_total, job["id"], total)
+
+            for page_number in range(total):
+                if page_number < resume_from:
+                    yield None
+                    continue
+                text = await loop.run_in_executor(None, reader.pages[page_number].extract_text)
+                yield {"id": f"page-{page_number + 1}", "text": text or ""}
+
+    def _document_text(self, kind: str, path: str) -> str:
+        if kind == "pdf":
+            with open(path, "rb") as pdf_file:
+                return self.file_processor._extract_pdf_pages(pdf_file)
+        with open(path, encoding="utf-8", errors="replace") as text_file:
+            return text_file.read(self.file_processor.max_text_chars)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "completed": self.completed,
+            "failed": self.failed,
+            **self.queue.get_stats()
+        }
+
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as payload_file:
+        while True:
+            chunk = await loop.run_in_executor(None, payload_file.read, FileProcessor.CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def create_job_queue() -> JobQueue:
+    """Cria a fila de jobs a partir das variáveis de ambiente."""
+    directory = os.getenv("JOB_QUEUE_DIR", "/tmp/email-classifier/jobs")
+    queue = JobQueue(
+        path=os.path.join(directory, "jobs.sqlite3"),
+        payload_dir=os.path.join(directory, "payloads"),
+        lease_s=float(os.getenv("JOB_LEASE_S", "60")),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+        retention_s=float(os.getenv("JOB_RETENTION_H", "168")) * 3600
+    )
+    logger.info(f"🗂️ Fila de jobs: {queue.path}")
+    return queue
+
+
+async def job_events(queue: JobQueue, job_id: str, interval: float = 0.5,
+                     keepalive: float = 15.0) -> AsyncIterator[str]:
+    """Server-Sent Events com o progresso do job até ele terminar.
+
+    Lê o estado do SQLite, então funciona com o job rodando em qualquer processo.
+    """
+    loop = asyncio.get_running_loop()
+    last_update = None
+    last_sent = time.monotonic()
+
+    while True:
+        job = await loop.run_in_executor(None, queue.get, job_id)
+        if job is None:
+            yield _sse_event("error", {"job_id": job_id, "error": "Job não encontrado"})
+            return
+
+        if job["updated_at"] != last_update:
+            last_update = job["updated_at"]
+            last_sent = time.monotonic()
+            finished = job["status"] in FINAL_STATUSES
+            yield _sse_event("done" if finished else "progress", job_summary(job))
+            if finished:
+                return
+        elif time.monotonic() - last_sent > keepalive:
+            last_sent = time.monotonic()
+            yield ": keepalive\n\n"
+
+        await asyncio.sleep(interval)
+
+
+def _sse_event(event: str, payload: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
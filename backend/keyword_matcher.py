@@ -0,0 +1,60 @@
+# keyword_matcher.py
+import re
+from collections import Counter
+from typing import Dict, Tuple
+
+
+class KeywordMatcher:
+    """Conta vários conjuntos de palavras-chave ponderadas em uma única varredura.
+
+    Todos os termos (inclusive os de várias palavras, como "ano novo") viram
+    uma única alternação compilada, com fronteiras de palavra equivalentes a
+    `\\b`. Os termos mais longos vêm primeiro, e um termo que contém outros
+    termos inteiros credita também os termos contidos, de modo que as
+    contagens batem com um `re.findall(rf"\\b{kw}\\b")` por palavra-chave.
+
+    Exemplo:
+        matcher = KeywordMatcher({"produtivo": {"erro": 2.0}, "improdutivo": {"ano novo": 2.0}})
+        matcher.scores("feliz ano novo, sem erro")  # {"produtivo": 2.0, "improdutivo": 2.0}
+    """
+
+    def __init__(self, keyword_sets: Dict[str, Dict[str, float]]):
+        self.keyword_sets = {name: dict(keywords) for name, keywords in keyword_sets.items()}
+
+        terms = sorted({term for keywords in self.keyword_sets.values() for term in keywords}, key=len, reverse=True)
+        self.pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(re.escape(term) for term in terms) + r")(?!\w)"
+        ) if terms else None
+
+        # Termos inteiros contidos em cada termo (ex.: "natal" dentro de "feliz natal")
+        self._contained: Dict[str, Tuple[Tuple[str, int], ...]] = {}
+        for term in terms:
+            contained = []
+            for other in terms:
+                if other == term:
+                    continue
+                occurrences = len(re.findall(rf"(?<!\w){re.escape(other)}(?!\w)", term))
+                if occurrences:
+                    contained.append((other, occurrences))
+            self._contained[term] = tuple(contained)
+
+    def counts(self, text_lower: str) -> Counter:
+        """Ocorrências de cada termo em um texto já em minúsculas."""
+        counts = Counter()
+        if self.pattern is None or not text_lower:
+            return counts
+
+        counts.update(self.pattern.findall(text_lower))
+        for term, found in list(counts.items()):
+            for other, occurrences in self._contained[term]:
+                counts[other] += found * occurrences
+
+        return counts
+
+    def scores(self, text_lower: str) -> Dict[str, float]:
+        """Soma ponderada de cada conjunto para um texto já em minúsculas."""
+        counts = self.counts(text_lower)
+        return {
+            name: sum(counts[term] * weight for term, weight in keywords.items())
+            for name, keywords in self.keyword_sets.items()
+        }
@@ -1,17 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request, Query, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import time
 import os
+import json
+import asyncio
 import logging
-from typing import Optional
+import secrets
+from typing import List, Optional
 
 # Import dos seus módulos existentes
 from email_classifier import EmailClassifier
 from response_generator import ResponseGenerator
-from file_processor import FileProcessor
+from file_processor import FileProcessor, UploadSizeLimitMiddleware
+from admission import AdmissionMiddleware, create_admission_controller
 from performance_metrics import PerformanceMetrics
-from models import EmailRequest, ClassificationResult, HealthCheck
+from batch_scheduler import MicroBatchScheduler
+from inference_executor import InferenceExecutor
+from result_cache import create_result_cache
+from memory_stats import worker_memory
+from memory_manager import create_memory_manager
+from document_store import create_document_store, DocumentTooLarge
+from profiling import create_profiler
+from job_queue import JOB_KINDS, JobRunner, create_job_queue, job_events, job_summary
+from bulk_stream import NDJSONStreamingResponse, StreamProgressRegistry, stream_classifications
+from text_windows import exceeds_char_bound, MAX_CHARS_PER_TOKEN, TYPICAL_CHARS_PER_TOKEN
+from models import EmailRequest, ClassificationResult, HealthCheck, BatchEmailRequest, BatchClassificationResult, ProfilingRequest
 
 # Configuração de logging
 logging.basicConfig(
@@ -29,7 +43,153 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# CORS para frontend no Vercel
+# Instâncias globais
+logger.info("🚀 Inicializando Email Classifier Premium...")
+
+try:
+    use_ml = os.getenv("USE_ML_MODELS", "true").lower() == "true"
+    inference_mode = os.getenv("INFERENCE_MODE", "thread").lower()
+
+    classifier_options = {
+        "use_ml_models": use_ml,
+        "inference_batch_size": int(os.getenv("INFERENCE_BATCH_SIZE", "32")),
+        "model_version": os.getenv("MODEL_VERSION", "1"),
+        "embedding_store_path": os.getenv("EMBEDDING_STORE_PATH") or None,
+        "embedding_store_max_rows": int(os.getenv("EMBEDDING_STORE_MAX_ROWS", "0")),
+        "inference_backend": os.getenv("INFERENCE_BACKEND", "torch").lower(),
+        "onnx_model_dir": os.getenv("ONNX_MODEL_DIR", "models/onnx"),
+        "onnx_quantized": os.getenv("ONNX_QUANTIZED", "true").lower() == "true",
+        "onnx_intra_op_threads": int(os.getenv("ONNX_INTRA_OP_THREADS", "0")),
+        "cascade_enabled": os.getenv("CASCADE_ENABLED", "false").lower() == "true",
+        "cascade_rules_threshold": float(os.getenv("CASCADE_RULES_THRESHOLD", "0.9")),
+        "cascade_rules_min_keyword_confidence": float(os.getenv("CASCADE_RULES_MIN_KEYWORD_CONFIDENCE", "0.75")),
+        "cascade_primary_threshold": float(os.getenv("CASCADE_PRIMARY_THRESHOLD", "0.85")),
+        "reference_embeddings_path": os.getenv("REFERENCE_EMBEDDINGS_PATH") or None,
+        "reference_set_path": os.getenv("REFERENCE_SET_PATH") or None,
+        "reference_scoring": os.getenv("REFERENCE_SCORING", "centroid").lower(),
+        "reference_knn_k": int(os.getenv("REFERENCE_KNN_K", "16")),
+        "reference_reload_interval": float(os.getenv("REFERENCE_RELOAD_INTERVAL", "30")),
+        "background_loading": os.getenv("MODEL_BACKGROUND_LOADING", "true").lower() == "true",
+        "window_pooling": os.getenv("WINDOW_POOLING", "mean").lower(),
+        "window_overlap": int(os.getenv("WINDOW_OVERLAP_TOKENS", "64"))
+    }
+
+    performance_metrics = PerformanceMetrics()
+    # Desligado por padrão; PROFILING_* no ambiente ou POST /admin/profiling
+    profiler = create_profiler()
+    admin_token = os.getenv("ADMIN_TOKEN") or None
+
+    # No modo "process" os modelos (e o cache) ficam apenas nos workers do pool
+    if inference_mode == "process":
+        classifier = EmailClassifier(
+            metrics=performance_metrics, profiler=profiler, **dict(classifier_options, use_ml_models=False)
+        )
+    else:
+        classifier = EmailClassifier(
+            result_cache=create_result_cache(), metrics=performance_metrics, profiler=profiler, **classifier_options
+        )
+    response_generator = ResponseGenerator()
+    max_upload_bytes = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+    file_processor = FileProcessor(
+        max_upload_bytes=max_upload_bytes,
+        max_pdf_pages=int(os.getenv("PDF_MAX_PAGES", "50")),
+        max_text_chars=int(os.getenv("MAX_EXTRACTED_CHARS", "100000"))
+    )
+    # Texto extraído no /upload, reaproveitado por /classify e /classify/file via document_id
+    document_store = create_document_store()
+    # Limite aplicado ao corpo inteiro (arquivo + envelope do multipart) antes do parse
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        max_bytes=max_upload_bytes + FileProcessor.CHUNK_SIZE,
+        paths=("/upload", "/classify/file")
+    )
+
+    # Descarga dos modelos ociosos ou sob pressão de memória (modo "thread":
+    # no modo "process" os modelos ficam nos workers do pool)
+    memory_manager = create_memory_manager(classifier)
+
+    inference_executor = InferenceExecutor(
+        classifier,
+        response_generator,
+        mode=inference_mode,
+        max_workers=int(os.getenv("INFERENCE_WORKERS", "1")),
+        classifier_options=classifier_options,
+        metrics=performance_metrics
+    )
+
+    batch_max_items = int(os.getenv("BATCH_ENDPOINT_MAX_ITEMS", "1000"))
+    # Textos longos são divididos em janelas; o custo cresce linearmente até este limite
+    max_input_tokens = int(os.getenv("MAX_INPUT_TOKENS", "4096"))
+
+    # Prazo padrão das classificações (0 = sem prazo) e a margem reservada para
+    # as regras e a resposta quando os modelos são abandonados
+    default_deadline_ms = int(os.getenv("DEFAULT_DEADLINE_MS", "0"))
+    deadline_reserve = float(os.getenv("DEADLINE_RESERVE_MS", "20")) / 1000
+
+    stream_progress = StreamProgressRegistry()
+    stream_chunk_size = int(os.getenv("STREAM_CHUNK_SIZE", "32"))
+
+    # Jobs assíncronos para documentos e lotes grandes: fila SQLite local e
+    # workers em segundo plano, em número fixo por processo
+    job_max_upload_bytes = int(float(os.getenv("JOB_MAX_UPLOAD_MB", "200")) * 1024 * 1024)
+    job_max_items = int(os.getenv("JOB_MAX_ITEMS", "100000"))
+    job_max_tokens = int(os.getenv("JOB_MAX_INPUT_TOKENS", "65536"))
+    # O texto extraído precisa caber no limite de tokens: sem isso o upload é
+    # aceito e o documento falha depois como "Texto muito longo"
+    job_max_chars = int(os.getenv("JOB_MAX_EXTRACTED_CHARS") or job_max_tokens * TYPICAL_CHARS_PER_TOKEN)
+    if job_max_chars > job_max_tokens * MAX_CHARS_PER_TOKEN:
+        logger.warning(
+            f"⚠️ JOB_MAX_EXTRACTED_CHARS ({job_max_chars}) acima do que JOB_MAX_INPUT_TOKENS ({job_max_tokens}) "
+            f"aceita; usando {job_max_tokens * MAX_CHARS_PER_TOKEN}"
+        )
+        job_max_chars = job_max_tokens * MAX_CHARS_PER_TOKEN
+    job_queue = create_job_queue()
+    job_runner = JobRunner(
+        job_queue,
+        inference_executor,
+        FileProcessor(
+            max_upload_bytes=job_max_upload_bytes,
+            max_pdf_pages=int(os.getenv("JOB_MAX_PDF_PAGES", "1000")),
+            max_text_chars=job_max_chars
+        ),
+        workers=int(os.getenv("JOB_WORKERS", "1")),
+        chunk_size=stream_chunk_size,
+        max_tokens=job_max_tokens,
+        count_tokens=classifier.count_tokens
+    )
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        max_bytes=job_max_upload_bytes + FileProcessor.CHUNK_SIZE,
+        paths=("/jobs",)
+    )
+
+    # Fila limitada e recusas rápidas (429/503 + Retry-After) na frente do pipeline
+    admission = create_admission_controller()
+    if admission:
+        app.add_middleware(
+            AdmissionMiddleware,
+            controller=admission,
+            paths=("/classify", "/classify/batch", "/classify/file"),
+            trust_forwarded=os.getenv("ADMISSION_TRUST_FORWARDED", "false").lower() == "true"
+        )
+
+    batch_scheduler = None
+    if os.getenv("ENABLE_MICRO_BATCHING", "true").lower() == "true":
+        batch_scheduler = MicroBatchScheduler(
+            inference_executor,
+            max_batch_size=int(os.getenv("BATCH_MAX_SIZE", "16")),
+            max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "5")),
+            max_in_flight=inference_executor.max_workers
+        )
+    
+    logger.info(f"✅ Serviços inicializados! ML: {inference_executor.models_loaded} (modelos: {inference_executor.model_state})")
+    
+except Exception as e:
+    logger.error(f"❌ Erro na inicialização: {e}")
+    raise
+
+# CORS para frontend no Vercel (registrado por último: envolve os outros
+# middlewares, inclusive as recusas 413/429/503)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -41,23 +201,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
-# Instâncias globais
-logger.info("🚀 Inicializando Email Classifier Premium...")
+@app.on_event("startup")
+async def startup():
+    await inference_executor.start()
+    await job_runner.start()
+    if memory_manager:
+        await memory_manager.start()
 
-try:
-    use_ml = os.getenv("USE_ML_MODELS", "true").lower() == "true"
-    classifier = EmailClassifier(use_ml_models=use_ml)
-    response_generator = ResponseGenerator()
-    file_processor = FileProcessor()
-    performance_metrics = PerformanceMetrics()
-    
-    logger.info(f"✅ Serviços inicializados! ML: {classifier.use_ml_models}")
-    
-except Exception as e:
-    logger.error(f"❌ Erro na inicialização: {e}")
-    raise
+@app.on_event("shutdown")
+async def shutdown():
+    await job_runner.stop()
+    if memory_manager:
+        await memory_manager.stop()
+    if batch_scheduler:
+        await batch_scheduler.stop()
+    inference_executor.shutdown()
+
+def resolve_email_text(request: EmailRequest) -> str:
+    """Texto do email: enviado na requisição ou de um documento já extraído pelo /upload"""
+    if request.document_id and not (request.text or request.file_content):
+        document = document_store.get(request.document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Documento não encontrado ou expirado. Envie o arquivo novamente")
+        return document["text"].strip()
+
+    return (request.text or request.file_content or "").strip()
+
+def default_model_used() -> str:
+    """Rótulo de modelo para resultados sem estágio de decisão (ex.: resposta padrão)"""
+    return "BERT + Semantic" if inference_executor.models_loaded else "Rule-Based"
 
 @app.get("/")
 async def root():
@@ -73,50 +248,200 @@ async def health_check():
     return HealthCheck(
         status="healthy",
         timestamp=time.strftime("%Y-%m-%d %H:%M:%S"),
-        model_status="ml_loaded" if classifier.use_ml_models else "rule_based",
+        model_status="ml_loaded" if inference_executor.models_loaded else "rule_based",
         version="2.1.0"
     )
 
+@app.get("/ready")
+async def readiness_check():
+    """Prontidão (separada da vivacidade em /health): 503 enquanto os modelos carregam"""
+    model_state = inference_executor.model_state
+    # Só o carregamento inicial: na recarga ("reloading") as regras continuam atendendo
+    ready = model_state != "loading"
+
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "model_state": model_state,
+            "ml_models_loaded": inference_executor.models_loaded,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+    )
+
 @app.get("/model-status")
 async def model_status():
     return {
-        "ml_models_loaded": classifier.use_ml_models,
-        "using_ml": classifier.use_ml_models,
+        "ml_models_loaded": inference_executor.models_loaded,
+        "using_ml": inference_executor.models_loaded,
+        "model_state": inference_executor.model_state,
+        "inference": inference_executor.get_stats(),
+        "inference_backend": classifier_options["inference_backend"],
         "memory_optimized": True,
         "environment": os.getenv("ENVIRONMENT", "production")
     }
 
 @app.get("/metrics")
 async def get_metrics():
-    return performance_metrics.get_metrics()
+    metrics = performance_metrics.get_metrics()
+    metrics["batching"] = batch_scheduler.get_stats() if batch_scheduler else {"enabled": False}
+    metrics["streams"] = stream_progress.get_stats()
+    metrics["result_cache"] = classifier.result_cache.get_stats() if classifier.result_cache else {"enabled": False}
+    metrics["embedding_store"] = classifier.embedding_store.get_stats() if classifier.embedding_store else {"enabled": False}
+    metrics["cascade"] = inference_executor.get_cascade_stats()
+    metrics["references"] = classifier.reference_index.get_stats() if classifier.reference_index else {"enabled": False}
+    metrics["documents"] = document_store.get_stats()
+    metrics["jobs"] = await asyncio.get_running_loop().run_in_executor(None, job_runner.get_stats)
+    metrics["admission"] = admission.get_stats() if admission else {"enabled": False}
+    metrics["memory"] = worker_memory()
+    metrics["model_memory"] = memory_manager.get_stats() if memory_manager else {"enabled": False}
+    return metrics
+
+@app.get("/metrics/prometheus")
+async def get_prometheus_metrics():
+    """Histogramas de latência por endpoint e por estágio no formato do Prometheus (por worker)"""
+    text = (
+        performance_metrics.prometheus()
+        + (admission.prometheus() if admission else "")
+        + (memory_manager.prometheus() if memory_manager else "")
+    )
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Endpoints de administração desabilitados. Defina ADMIN_TOKEN")
+    if not secrets.compare_digest(x_admin_token or "", admin_token):
+        raise HTTPException(status_code=401, detail="Token de administração inválido")
+
+@app.get("/admin/profiling", dependencies=[Depends(require_admin)])
+async def profiling_status():
+    return profiler.get_stats()
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+async def configure_profiling(request: ProfilingRequest):
+    """Liga/desliga o profiling deste processo (no modo "process", os workers usam PROFILING_* do ambiente)"""
+    try:
+        return profiler.configure(
+            sample_rate=request.sample_rate,
+            mode=request.mode,
+            torch_ops=request.torch_ops,
+            duration_s=request.duration_s
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+ML_STAGES = ("primary_model", "similarity")
+
+def ml_stage_at(budget: float) -> Optional[str]:
+    """Estágio de ML em que `budget` segundos se esgotam pelos tempos típicos (p50); None se couber"""
+    if budget <= 0:
+        return ML_STAGES[0]
+
+    needed = 0.0
+    for stage in ML_STAGES:
+        estimate = performance_metrics.stage_estimate(stage)
+        if estimate is None:
+            return None
+        needed += estimate
+        if needed > budget:
+            return stage
+    return None
+
+def _consume_result(task: asyncio.Future):
+    if not task.cancelled():
+        task.exception()
+
+async def run_classification(email_text: str):
+    # Classificação (agrupada em micro-lotes quando habilitado)
+    if batch_scheduler:
+        return await batch_scheduler.classify(email_text)
+    return await inference_executor.classify(email_text)
+
+async def classify_text(email_text: str, deadline_at: Optional[float] = None):
+    """Resultado da classificação e se ele veio das regras por falta de tempo.
+
+    Com prazo, os modelos só rodam se os tempos típicos dos estágios couberem
+    no que resta; se ainda assim não terminarem, a requisição responde pelas
+    regras e a inferência segue em segundo plano até gravar o cache de resultados.
+    """
+    if deadline_at is None or not inference_executor.models_loaded:
+        return await run_classification(email_text), False
+
+    budget = deadline_at - time.time() - deadline_reserve
+    missed_stage = ml_stage_at(budget)
+    if missed_stage is None:
+        task = asyncio.ensure_future(run_classification(email_text))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), budget), False
+        except asyncio.TimeoutError:
+            task.add_done_callback(_consume_result)
+            # Os tempos típicos cabiam no prazo: os modelos é que demoraram mais que o
+            # normal, sem como saber em qual estágio; contado à parte da previsão
+            missed_stage = "timeout"
+
+    performance_metrics.record_deadline_miss(missed_stage)
+    logger.info(f"⏱️ Prazo insuficiente para os modelos ({missed_stage}): classificação por regras")
+    return classifier.classify_rules(email_text), True
+
+async def count_input_tokens(texts: List[str]) -> List[int]:
+    """Tokens de cada texto, com o tokenizer fora do event loop.
+
+    Textos muito acima do limite (mais de MAX_CHARS_PER_TOKEN caracteres por
+    token) nem são tokenizados: contam como max_input_tokens + 1.
+    """
+    over_limit = max_input_tokens + 1
+    if all(exceeds_char_bound(text, max_input_tokens) for text in texts):
+        return [over_limit] * len(texts)
+
+    return await asyncio.get_running_loop().run_in_executor(None, lambda: [
+        over_limit if exceeds_char_bound(text, max_input_tokens) else classifier.count_tokens(text)
+        for text in texts
+    ])
 
 @app.post("/classify", response_model=ClassificationResult)
-async def classify_email(request: EmailRequest):
+async def classify_email(request: EmailRequest, http_request: Request,
+                         x_deadline_ms: Optional[int] = Header(None, gt=0)):
     start_time = time.time()
+    deadline_ms = min(filter(None, (request.deadline_ms, x_deadline_ms, default_deadline_ms)), default=None)
+    # O prazo conta desde a chegada (antes da fila de admissão e da leitura do corpo)
+    arrived_at = getattr(http_request.state, "arrived_at", start_time)
+    deadline_at = arrived_at + deadline_ms / 1000 if deadline_ms else None
+    return await classify_request(request, "/classify", start_time, deadline_at)
 
+async def classify_request(request: EmailRequest, endpoint: str, start_time: float,
+                           deadline_at: Optional[float] = None) -> ClassificationResult:
+    """Classifica um email registrando a latência em `endpoint`"""
     try:
-        email_text = (request.text or request.file_content or "").strip()
+        email_text = resolve_email_text(request)
 
         if not email_text:
             raise HTTPException(status_code=400, detail="Texto do email é obrigatório")
 
-        if len(email_text) > 10_000:
-            raise HTTPException(status_code=400, detail="Texto muito longo. Máximo: 10.000 caracteres")
+        if (await count_input_tokens([email_text]))[0] > max_input_tokens:
+            raise HTTPException(status_code=400, detail=f"Texto muito longo. Máximo: {max_input_tokens} tokens")
 
         logger.info(f"📧 Classificando email com {len(email_text)} caracteres")
 
-        # Classificação
-        classification_result = classifier.classify(email_text)
-        
+        classification_result, degraded = await classify_text(email_text, deadline_at)
+
         # Resposta sugerida
-        suggested_response = response_generator.generate(
-            classification_result["category"],
-            email_text,
-            classification_result
-        )
+        if degraded:
+            # Sem passar pelo pool, que pode estar ocupado com a inferência abandonada
+            with performance_metrics.stage("response_generation"):
+                suggested_response = response_generator.generate(
+                    classification_result["category"], email_text, classification_result
+                )
+        else:
+            suggested_response = await inference_executor.generate_response(
+                classification_result["category"],
+                email_text,
+                classification_result
+            )
+            if deadline_at is not None and time.time() > deadline_at:
+                performance_metrics.record_deadline_miss("response_generation")
 
         processing_time = round(time.time() - start_time, 3)
-        performance_metrics.record_request(processing_time, True)
+        performance_metrics.record_request(processing_time, True, endpoint)
 
         logger.info(f"✅ Classificação: {classification_result['category']} (conf: {classification_result['confidence']:.2f})")
 
@@ -125,52 +450,164 @@ async def classify_email(request: EmailRequest):
             confidence=classification_result["confidence"],
             suggested_response=suggested_response,
             processing_time=processing_time,
-            model_used="BERT + Semantic" if classifier.use_ml_models else "Rule-Based",
+            model_used=classification_result.get("model_used", default_model_used()),
+            decision_stage=classification_result.get("decision_stage"),
             tokens_processed=classification_result.get("tokens_processed", 0),
-            detected_topics=classification_result.get("detected_topics", [])
+            detected_topics=classification_result.get("detected_topics", []),
+            degraded=degraded if deadline_at is not None else None
         )
 
     except HTTPException:
         processing_time = round(time.time() - start_time, 3)
-        performance_metrics.record_request(processing_time, False)
+        performance_metrics.record_request(processing_time, False, endpoint)
         raise
     except Exception as e:
         logger.error(f"❌ Erro na classificação: {e}")
         processing_time = round(time.time() - start_time, 3)
-        performance_metrics.record_request(processing_time, False)
+        performance_metrics.record_request(processing_time, False, endpoint)
         raise HTTPException(status_code=500, detail="Erro interno ao classificar o email")
 
+@app.post("/classify/batch", response_model=BatchClassificationResult)
+async def classify_email_batch(request: BatchEmailRequest):
+    start_time = time.time()
+
+    try:
+        if len(request.items) > batch_max_items:
+            raise HTTPException(status_code=400, detail=f"Lote muito grande. Máximo: {batch_max_items} emails")
+
+        email_texts = [resolve_email_text(item) for item in request.items]
+
+        for index, email_text in enumerate(email_texts):
+            if not email_text:
+                raise HTTPException(status_code=400, detail=f"Texto do email é obrigatório (item {index})")
+        for index, tokens in enumerate(await count_input_tokens(email_texts)):
+            if tokens > max_input_tokens:
+                raise HTTPException(status_code=400, detail=f"Texto muito longo no item {index}. Máximo: {max_input_tokens} tokens")
+
+        logger.info(f"📦 Classificando lote com {len(email_texts)} emails")
+
+        # Uma única passada pelos modelos para o lote inteiro
+        classification_results = await inference_executor.classify_batch(email_texts)
+        suggested_responses = await inference_executor.generate_responses([
+            (result["category"], email_text, result)
+            for result, email_text in zip(classification_results, email_texts)
+        ])
+
+        processing_time = round(time.time() - start_time, 3)
+        performance_metrics.record_request(processing_time, True, "/classify/batch")
+
+        item_time = round(processing_time / len(email_texts), 4)
+
+        return BatchClassificationResult(
+            results=[
+                ClassificationResult(
+                    category=result["category"],
+                    confidence=result["confidence"],
+                    suggested_response=suggested_response,
+                    processing_time=item_time,
+                    model_used=result.get("model_used", default_model_used()),
+                    decision_stage=result.get("decision_stage"),
+                    tokens_processed=result.get("tokens_processed", 0),
+                    detected_topics=result.get("detected_topics", [])
+                )
+                for result, suggested_response in zip(classification_results, suggested_responses)
+            ],
+            total=len(classification_results),
+            processing_time=processing_time
+        )
+
+    except HTTPException:
+        processing_time = round(time.time() - start_time, 3)
+        performance_metrics.record_request(processing_time, False, "/classify/batch")
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erro na classificação em lote: {e}")
+        processing_time = round(time.time() - start_time, 3)
+        performance_metrics.record_request(processing_time, False, "/classify/batch")
+        raise HTTPException(status_code=500, detail="Erro interno ao classificar o lote")
+
+@app.post("/classify/stream")
+async def classify_email_stream(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson ou mbox (padrão: pelo Content-Type)"),
+    stream_id: Optional[str] = Query(None, description="Identificador para consultar o progresso"),
+    resume_from: int = Query(0, ge=0, description="Índice do primeiro registro a classificar")
+):
+    content_type = request.headers.get("content-type", "")
+    input_format = (format or ("mbox" if "mbox" in content_type else "ndjson")).lower()
+
+    if input_format == "ndjson":
+        records = file_processor.iter_ndjson_records(request.stream())
+    elif input_format == "mbox":
+        records = file_processor.iter_mbox_messages(request.stream())
+    else:
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use ndjson ou mbox")
+
+    progress = stream_progress.open(stream_id, resume_from)
+    logger.info(f"🌊 Stream {progress['stream_id']} ({input_format}) iniciado a partir do registro {resume_from}")
+
+    return NDJSONStreamingResponse(
+        stream_classifications(
+            records, inference_executor, progress, chunk_size=stream_chunk_size,
+            max_tokens=max_input_tokens, count_tokens=classifier.count_tokens
+        ),
+        headers={"X-Stream-Id": progress["stream_id"]}
+    )
+
+@app.get("/classify/stream/{stream_id}")
+async def classify_email_stream_progress(stream_id: str):
+    progress = stream_progress.get(stream_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Stream não encontrado")
+    return progress
+
 @app.post("/classify/file")
-async def classify_email_file(file: UploadFile = File(...)):
+async def classify_email_file(file: Optional[UploadFile] = File(None), document_id: Optional[str] = Form(None)):
     start_time = time.time()
 
+    if document_id:
+        # Arquivo já enviado e extraído pelo /upload: sem nova transferência nem parse
+        return await classify_request(EmailRequest(document_id=document_id), "/classify/file", start_time)
+
     try:
+        if file is None:
+            raise HTTPException(status_code=400, detail="Envie um arquivo ou o document_id retornado pelo /upload")
+
         logger.info(f"📁 Processando arquivo: {file.filename}")
-        text_content = await file_processor.process_uploaded_file(file)
+        with performance_metrics.stage("file_parsing"):
+            text_content = await file_processor.process_uploaded_file(file)
         logger.info(f"✅ Arquivo processado: {len(text_content)} caracteres")
 
-        request = EmailRequest(text=text_content)
-        return await classify_email(request)
-
     except HTTPException:
         processing_time = round(time.time() - start_time, 3)
-        performance_metrics.record_request(processing_time, False)
+        performance_metrics.record_request(processing_time, False, "/classify/file")
         raise
     except Exception as e:
         logger.error(f"❌ Erro ao processar arquivo: {str(e)}")
         processing_time = round(time.time() - start_time, 3)
-        performance_metrics.record_request(processing_time, False)
+        performance_metrics.record_request(processing_time, False, "/classify/file")
         raise HTTPException(status_code=500, detail=f"Erro ao processar arquivo: {str(e)}")
 
+    return await classify_request(EmailRequest(text=text_content), "/classify/file", start_time)
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     try:
         logger.info(f"📤 Upload: {file.filename}")
-        text_content = await file_processor.process_uploaded_file(file)
-        
+        with performance_metrics.stage("file_parsing"):
+            text_content = await file_processor.process_uploaded_file(file)
+        # O store em disco grava e varre o diretório: fora do event loop
+        loop = asyncio.get_running_loop()
+        try:
+            document_id = await loop.run_in_executor(None, document_store.put, text_content, file.filename)
+        except DocumentTooLarge as e:
+            raise HTTPException(413, f"Texto extraído muito grande para o store de documentos (máximo: {e.max_bytes} bytes)")
+
         return {
             "status": "success",
             "filename": file.filename,
+            "document_id": document_id,
+            "expires_in": document_store.ttl,
             "text_length": len(text_content),
             "message": "Arquivo processado com sucesso"
         }
@@ -181,6 +618,101 @@ async def upload_file(file: UploadFile = File(...)):
         logger.error(f"❌ Erro no upload: {str(e)}")
         raise HTTPException(500, f"Erro no processamento: {str(e)}")
 
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request):
+    """Enfileira um arquivo (.pdf, .txt, .mbox, .ndjson) ou um lote JSON (`items`) para processamento em segundo plano"""
+    # A fila SQLite bloqueia (lock e busy timeout compartilhados com os workers): fora do event loop
+    loop = asyncio.get_running_loop()
+    job_id = job_queue.new_job_id()
+    payload_path = job_queue.payload_path(job_id)
+
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            file = form.get("file")
+            if not getattr(file, "filename", None):
+                raise HTTPException(status_code=400, detail="Envie o arquivo no campo 'file'")
+
+            kind = JOB_KINDS.get(os.path.splitext(file.filename.lower())[1])
+            if kind is None:
+                raise HTTPException(status_code=400, detail=f"Tipo de arquivo não suportado. Use {', '.join(JOB_KINDS)}")
+
+            options = {}
+            if kind == "pdf":
+                options["split"] = form.get("split") or "pages"
+                if options["split"] not in ("pages", "document"):
+                    raise HTTPException(status_code=400, detail="split deve ser pages ou document")
+
+            # Copiado em chunks para o diretório da fila, nunca inteiro em memória
+            with open(payload_path, "wb") as payload_file:
+                while True:
+                    chunk = await file.read(FileProcessor.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    payload_file.write(chunk)
+
+            total = 1 if kind == "txt" or options.get("split") == "document" else None
+            job = await loop.run_in_executor(None, job_queue.create, job_id, kind, file.filename, options, total)
+
+        else:
+            try:
+                batch = BatchEmailRequest(**await request.json())
+            except Exception:
+                raise HTTPException(status_code=400, detail="Envie um arquivo (multipart) ou um JSON com 'items'")
+            if len(batch.items) > job_max_items:
+                raise HTTPException(status_code=400, detail=f"Lote muito grande. Máximo: {job_max_items} emails")
+
+            with open(payload_path, "w", encoding="utf-8") as payload_file:
+                for item in batch.items:
+                    payload_file.write(json.dumps({"text": resolve_email_text(item)}, ensure_ascii=False) + "\n")
+
+            job = await loop.run_in_executor(
+                None, job_queue.create, job_id, "ndjson", None, {"source": "batch"}, len(batch.items)
+            )
+
+    except HTTPException:
+        job_queue.remove_payload(job_id)
+        raise
+    except Exception as e:
+        job_queue.remove_payload(job_id)
+        logger.error(f"❌ Erro ao criar job: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno ao criar o job")
+
+    job_runner.notify()
+    logger.info(f"🗂️ Job {job_id} enfileirado ({job['kind']})")
+    return {
+        **job_summary(job),
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    """Estado do job e uma página dos resultados já gravados"""
+    loop = asyncio.get_running_loop()
+    job = await loop.run_in_executor(None, job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    results = await loop.run_in_executor(None, job_queue.results, job_id, offset, limit)
+    return {
+        **job_summary(job),
+        "results": results,
+        "next_offset": offset + len(results) if len(results) == limit else None
+    }
+
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """Progresso do job por Server-Sent Events (eventos progress e done)"""
+    if await asyncio.get_running_loop().run_in_executor(None, job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    return StreamingResponse(
+        job_events(job_queue, job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -190,7 +722,8 @@ async def http_exception_handler(request, exc):
             "status": "error",
             "error": exc.detail,
             "message": "Erro na requisição"
-        }
+        },
+        headers=exc.headers
     )
 
 @app.exception_handler(Exception)
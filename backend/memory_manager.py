@@ -0,0 +1,216 @@
+# memory_manager.py
+import os
+import time
+import ctypes
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+from memory_stats import process_memory
+
+# Definido pelo gunicorn.conf.py: o app é importado no master antes do fork
+PRELOADED_ENV = "APP_PRELOADED"
+
+logger = logging.getLogger(__name__)
+
+
+def _trim_heap():
+    """Devolve ao sistema a memória livre do heap do glibc (sem efeito em outras libc)"""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ModelMemoryManager:
+    """Descarrega os modelos ociosos ou sob pressão de memória e controla a recarga.
+
+    A cada `check_interval` segundos compara o RSS do processo com o
+    orçamento (`budget_bytes`): modelos sem uso há `idle_timeout` segundos,
+    ou com o RSS acima de `pressure_ratio` do orçamento, são descarregados e
+    o classificador passa a usar as regras. A primeira requisição depois
+    disso dispara a recarga em segundo plano, que só começa se o RSS atual
+    mais o tamanho medido dos modelos couber no orçamento.
+    """
+
+    # Eventos de carga/descarga guardados para o /metrics
+    EVENT_HISTORY = 20
+    # Idade máxima da leitura de RSS reaproveitada nas requisições com os modelos fora
+    RSS_MAX_AGE = 1.0
+
+    def __init__(self, classifier, budget_bytes: int = 0, idle_timeout: float = 1800,
+                 pressure_ratio: float = 0.9, check_interval: float = 15):
+        self.classifier = classifier
+        self.budget_bytes = max(0, budget_bytes)
+        self.idle_timeout = max(0.0, idle_timeout)
+        self.pressure_ratio = pressure_ratio
+        self.check_interval = max(1.0, check_interval)
+
+        # Memória liberada na última descarga: estimativa do custo de recarregar
+        self.model_bytes: Optional[int] = None
+        self.rss = 0
+        self._rss_read_at = 0.0
+        self._deferral_logged = False
+        self.events: deque = deque(maxlen=self.EVENT_HISTORY)
+        self.stats = {"loads": 0, "unloads_idle": 0, "unloads_pressure": 0, "reloads_deferred": 0}
+        self._task = None
+
+        classifier.reload_guard = self.reload_allowed
+        classifier.on_model_event = self._record_event
+
+    def _read_rss(self) -> int:
+        try:
+            self.rss = process_memory()["rss"]
+            self._rss_read_at = time.monotonic()
+        except OSError as e:
+            logger.error(f"❌ Erro ao ler memória do processo: {e}")
+        return self.rss
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                # Ler o /proc e liberar os modelos bloqueiam: fora do event loop
+                await loop.run_in_executor(None, self.check)
+            except Exception as e:
+                logger.error(f"❌ Erro no gerenciador de memória: {e}")
+
+    def check(self) -> Optional[str]:
+        """Uma rodada de verificação; devolve o motivo da descarga, se houve"""
+        rss = self._read_rss()
+        if not self.classifier.models_ready:
+            return None
+
+        if self.budget_bytes and rss >= self.budget_bytes * self.pressure_ratio:
+            reason = "pressure"
+        elif self.idle_timeout and time.monotonic() - self.classifier.models_last_used >= self.idle_timeout:
+            reason = "idle"
+        else:
+            return None
+
+        # Sob pressão vale esperar um pouco pelos lotes em andamento; ociosos, não há nenhum
+        if not self.classifier.unload_models(reason, wait=self.check_interval if reason == "pressure" else 0):
+            return None
+        return reason
+
+    def reload_allowed(self) -> bool:
+        """Se a recarga cabe no orçamento (sem orçamento ou sem medida dos modelos, sempre cabe)"""
+        if not self.budget_bytes or self.model_bytes is None:
+            return True
+
+        rss = self.rss if time.monotonic() - self._rss_read_at < self.RSS_MAX_AGE else self._read_rss()
+        if rss + self.model_bytes <= self.budget_bytes * self.pressure_ratio:
+            return True
+
+        self.stats["reloads_deferred"] += 1
+        if self._deferral_logged:
+            return False
+        self._deferral_logged = True
+        logger.warning(
+            f"⚠️ Recarga dos modelos adiada: RSS {rss / 2**20:.0f} MB + modelos {self.model_bytes / 2**20:.0f} MB "
+            f"acima do orçamento de {self.budget_bytes / 2**20:.0f} MB"
+        )
+        return False
+
+    def _record_event(self, event: str, reason: str, **details):
+        rss_before = self.rss
+        if event == "unload":
+            _trim_heap()
+        rss = self._read_rss()
+        self._deferral_logged = False
+
+        if event == "unload":
+            self.stats[f"unloads_{reason}"] = self.stats.get(f"unloads_{reason}", 0) + 1
+            if rss_before > rss:
+                self.model_bytes = rss_before - rss
+        else:
+            self.stats["loads"] += 1
+
+        self.events.append({
+            "event": event,
+            "reason": reason,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "rss_bytes": rss,
+            **details
+        })
+        logger.info(f"🧠 Modelos: {event} ({reason}), RSS {rss / 2**20:.0f} MB")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "model_state": self.classifier.model_state,
+            "models_loaded": self.classifier.models_ready,
+            "rss_bytes": self.rss,
+            "budget_bytes": self.budget_bytes,
+            "pressure_ratio": self.pressure_ratio,
+            "idle_timeout_s": self.idle_timeout,
+            "idle_seconds": round(time.monotonic() - self.classifier.models_last_used, 1),
+            "model_bytes": self.model_bytes,
+            "events": list(self.events),
+            **self.stats
+        }
+
+    def prometheus(self) -> str:
+        """Memória residente e eventos dos modelos no formato texto do Prometheus"""
+        lines = [
+            "# HELP email_classifier_process_resident_memory_bytes RSS do processo na última verificação.",
+            "# TYPE email_classifier_process_resident_memory_bytes gauge",
+            f"email_classifier_process_resident_memory_bytes {self.rss}",
+            "# HELP email_classifier_models_loaded Modelos de ML carregados (1) ou descarregados (0).",
+            "# TYPE email_classifier_models_loaded gauge",
+            f"email_classifier_models_loaded {int(self.classifier.models_ready)}",
+            "# HELP email_classifier_model_loads_total Cargas dos modelos.",
+            "# TYPE email_classifier_model_loads_total counter",
+            f"email_classifier_model_loads_total {self.stats['loads']}",
+            "# HELP email_classifier_model_unloads_total Descargas dos modelos por motivo.",
+            "# TYPE email_classifier_model_unloads_total counter"
+        ]
+        for reason in ("idle", "pressure"):
+            lines.append(f'email_classifier_model_unloads_total{{reason="{reason}"}} {self.stats[f"unloads_{reason}"]}')
+        lines += [
+            "# HELP email_classifier_model_reloads_deferred_total Recargas adiadas por falta de memória.",
+            "# TYPE email_classifier_model_reloads_deferred_total counter",
+            f"email_classifier_model_reloads_deferred_total {self.stats['reloads_deferred']}"
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def create_memory_manager(classifier) -> Optional[ModelMemoryManager]:
+    """Cria o gerenciador de memória dos modelos a partir das variáveis de ambiente (None se desligado)."""
+    if os.getenv("MODEL_MEMORY_MANAGER_ENABLED", "false").lower() != "true" or not classifier.use_ml_models:
+        return None
+
+    # Com preload (gunicorn) ou vários workers, descarregar em um worker não libera as
+    # páginas copy-on-write do master, e cada recarga criaria uma cópia privada
+    if os.getenv(PRELOADED_ENV) == "true" or int(os.getenv("WEB_CONCURRENCY") or "1") > 1:
+        logger.warning("⚠️ Gerenciador de memória desligado: modelos compartilhados entre workers (preload/WEB_CONCURRENCY)")
+        return None
+
+    budget_bytes = int(float(os.getenv("MEMORY_BUDGET_MB", "0")) * 1024 * 1024)
+    idle_timeout = float(os.getenv("MODEL_IDLE_TIMEOUT_S", "1800"))
+    if budget_bytes <= 0 and idle_timeout <= 0:
+        return None
+
+    manager = ModelMemoryManager(
+        classifier,
+        budget_bytes=budget_bytes,
+        idle_timeout=idle_timeout,
+        pressure_ratio=float(os.getenv("MEMORY_PRESSURE_RATIO", "0.9")),
+        check_interval=float(os.getenv("MEMORY_CHECK_INTERVAL_S", "15"))
+    )
+    budget = f"{manager.budget_bytes / 2**20:.0f} MB" if manager.budget_bytes else "sem orçamento"
+    idle = f"{manager.idle_timeout:.0f}s" if manager.idle_timeout else "desligado"
+    logger.info(f"🧠 Gerenciador de memória: {budget}, descarga por ociosidade {idle}")
+    return manager
@@ -0,0 +1,86 @@
+# memory_stats.py
+import os
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Definido pelo gunicorn.conf.py no master antes do fork dos workers
+MASTER_PID_ENV = "APP_MASTER_PID"
+
+_SMAPS_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Shared_Clean": "shared",
+    "Shared_Dirty": "shared",
+    "Private_Clean": "unique",
+    "Private_Dirty": "unique",
+    "Swap": "swap"
+}
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, int]:
+    """Memória de um processo em bytes, a partir de /proc/<pid>/smaps_rollup.
+
+    - rss: páginas residentes (conta as compartilhadas em cada processo)
+    - shared: páginas residentes também mapeadas por outro processo (ex.: pesos herdados do master)
+    - unique: páginas privadas deste processo (USS), o que sobra ao matar o worker
+    - pss: rss com as páginas compartilhadas divididas entre quem as mapeia
+    """
+    proc = f"/proc/{pid or 'self'}"
+    path = f"{proc}/smaps_rollup" if os.path.exists(f"{proc}/smaps_rollup") else f"{proc}/smaps"
+
+    memory = {"rss": 0, "pss": 0, "shared": 0, "unique": 0, "swap": 0}
+    with open(path) as smaps:
+        for line in smaps:
+            field, _, value = line.partition(":")
+            key = _SMAPS_FIELDS.get(field)
+            if key and value.strip().endswith("kB"):
+                memory[key] += int(value.split()[0]) * 1024
+
+    return memory
+
+
+def _children(pid: int) -> List[int]:
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for task in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{task}/children") as children_file:
+                children.extend(int(child) for child in children_file.read().split())
+        except OSError:
+            continue
+    return sorted(set(children))
+
+
+def worker_memory() -> Dict[str, Any]:
+    """Memória deste worker e, sob o gunicorn, do master e de todos os workers irmãos."""
+    pid = os.getpid()
+    try:
+        stats: Dict[str, Any] = {"pid": pid, "current": process_memory()}
+    except OSError as e:
+        return {"available": False, "error": str(e)}
+
+    master_pid = os.getenv(MASTER_PID_ENV)
+    if not master_pid or int(master_pid) == pid:
+        return stats
+
+    try:
+        master_pid = int(master_pid)
+        workers = []
+        for worker_pid in _children(master_pid):
+            try:
+                workers.append({"pid": worker_pid, **process_memory(worker_pid)})
+            except OSError:
+                continue
+
+        master = process_memory(master_pid)
+        stats["master"] = {"pid": master_pid, **master}
+        stats["workers"] = workers
+        # PSS soma sem contar duas vezes as páginas compartilhadas
+        stats["total_pss"] = master["pss"] + sum(worker["pss"] for worker in workers)
+        stats["total_unique"] = master["unique"] + sum(worker["unique"] for worker in workers)
+    except Exception as e:
+        logger.error(f"❌ Erro ao ler memória dos workers: {e}")
+
+    return stats
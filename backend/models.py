@@ -12,6 +12,8 @@ class EmailCategory(str, Enum):
 class EmailRequest(BaseModel):
     text: Optional[str] = Field(None, description="Texto direto do email")
     file_content: Optional[str] = Field(None, description="Conteúdo de arquivo processado")
+    document_id: Optional[str] = Field(None, description="Handle retornado pelo /upload (texto já extraído no servidor)")
+    deadline_ms: Optional[int] = Field(None, gt=0, description="Prazo de resposta em ms; se os modelos não couberem, responde pelas regras")
 
     model_config = {
         "protected_namespaces": ()
@@ -24,8 +26,39 @@ class ClassificationResult(BaseModel):
     suggested_response: str
     processing_time: float
     model_used: str
+    decision_stage: Optional[str] = Field(None, description="Estágio da cascata que decidiu: rules, primary ou similarity")
     tokens_processed: Optional[int] = None
     detected_topics: Optional[List[str]] = None
+    degraded: Optional[bool] = Field(None, description="True quando o prazo da requisição levou à classificação por regras")
+
+    model_config = {
+        "protected_namespaces": ()
+    }
+
+
+class BatchEmailRequest(BaseModel):
+    items: List[EmailRequest] = Field(..., min_length=1, description="Emails a classificar")
+
+    model_config = {
+        "protected_namespaces": ()
+    }
+
+
+class BatchClassificationResult(BaseModel):
+    results: List[ClassificationResult]
+    total: int
+    processing_time: float
+
+    model_config = {
+        "protected_namespaces": ()
+    }
+
+
+class ProfilingRequest(BaseModel):
+    sample_rate: float = Field(..., ge=0, le=1, description="Fração das chamadas perfiladas (0 desliga)")
+    mode: Optional[str] = Field(None, description="sampling (pilhas para flamegraph) ou cprofile")
+    torch_ops: Optional[bool] = Field(None, description="Inclui tempos por operador do torch")
+    duration_s: Optional[float] = Field(None, gt=0, description="Desliga sozinho depois de N segundos")
 
     model_config = {
         "protected_namespaces": ()
@@ -59,6 +92,9 @@ class PerformanceMetrics(BaseModel):
     successful_classifications: int
     average_processing_time: float
     error_count: int
+    endpoints: Dict[str, Any] = Field(default_factory=dict, description="Latência (p50/p95/p99) e erros por endpoint")
+    stages: Dict[str, Any] = Field(default_factory=dict, description="Latência (p50/p95/p99) por estágio do pipeline")
+    deadline_misses: Dict[str, int] = Field(default_factory=dict, description="Prazos estourados por estágio do pipeline (\"timeout\": modelos mais lentos que o previsto)")
 
     model_config = {
         "protected_namespaces": ()
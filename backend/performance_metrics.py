@@ -1,12 +1,106 @@
 # performance_metrics.py
 import time
-from typing import Dict
+import threading
+from bisect import bisect_left
+from typing import Dict, Any, List, Optional, Tuple
 from models import PerformanceMetrics as PerformanceMetricsModel
 
+# Limites superiores dos buckets em segundos (o último bucket, implícito, é +Inf)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Estágios do pipeline medidos por lote
+STAGES = ("preprocess", "keywords", "primary_model", "similarity", "response_generation", "file_parsing")
+
+
+class LatencyHistogram:
+    """Histograma de buckets fixos: registrar é um bisect e três somas."""
+
+    __slots__ = ("counts", "total", "count", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Quantil estimado por interpolação linear dentro do bucket (como o histogram_quantile)"""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                if index == len(LATENCY_BUCKETS):
+                    return lower
+                upper = LATENCY_BUCKETS[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return LATENCY_BUCKETS[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.50), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6)
+        }
+
+
+class _StageTimer:
+    __slots__ = ("recorder", "stage", "start")
+
+    def __init__(self, recorder, stage: str):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.recorder.record_stage(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class StageLog:
+    """Tempos de estágio registrados em um worker do pool de processos.
+
+    O worker devolve as amostras junto com cada resultado (`drain`) e o
+    processo principal as repassa ao seu PerformanceMetrics.
+    """
+
+    def __init__(self):
+        self._samples: List[Tuple[str, float]] = []
+
+    def record_stage(self, stage: str, seconds: float):
+        self._samples.append((stage, seconds))
+
+    def stage(self, stage: str) -> _StageTimer:
+        return _StageTimer(self, stage)
+
+    def drain(self) -> List[Tuple[str, float]]:
+        samples, self._samples = self._samples, []
+        return samples
+
 
 class PerformanceMetrics:
-    """Coleta e gerencia métricas de performance do sistema."""
-    
+    """Coleta e gerencia métricas de performance do sistema.
+
+    Além dos contadores, mantém histogramas de latência por endpoint e por
+    estágio do pipeline, expostos como p50/p95/p99 e no formato texto do Prometheus.
+    """
+
     def __init__(self):
         self.metrics = {
             "total_requests": 0,
@@ -15,12 +109,22 @@ class PerformanceMetrics:
             "error_count": 0,
             "last_updated": time.time()
         }
+        self.endpoints: Dict[str, LatencyHistogram] = {}
+        self.endpoint_errors: Dict[str, int] = {}
+        self.stages: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self.deadline_misses: Dict[str, int] = {}
 
-    def record_request(self, processing_time: float, success: bool = True):
+    def record_request(self, processing_time: float, success: bool = True, endpoint: str = "/classify"):
         """Record metrics for each request."""
         self.metrics["total_requests"] += 1
         self.metrics["last_updated"] = time.time()
 
+        histogram = self.endpoints.get(endpoint)
+        if histogram is None:
+            histogram = self.endpoints.setdefault(endpoint, LatencyHistogram())
+            self.endpoint_errors.setdefault(endpoint, 0)
+        histogram.observe(processing_time)
+
         if success:
             self.metrics["successful_classifications"] += 1
             total = self.metrics["successful_classifications"]
@@ -30,7 +134,84 @@ class PerformanceMetrics:
             )
         else:
             self.metrics["error_count"] += 1
+            self.endpoint_errors[endpoint] += 1
+
+    def record_stage(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages.setdefault(stage, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def record_stages(self, samples: List[Tuple[str, float]]):
+        for stage, seconds in samples:
+            self.record_stage(stage, seconds)
+
+    def stage(self, stage: str) -> _StageTimer:
+        """Context manager que mede um estágio: `with metrics.stage("file_parsing"): ...`"""
+        return _StageTimer(self, stage)
+
+    def stage_estimate(self, stage: str, q: float = 0.5, min_samples: int = 20) -> Optional[float]:
+        """Tempo típico de um estágio pelo histograma (None enquanto houver poucas amostras)"""
+        histogram = self.stages.get(stage)
+        if histogram is None or histogram.count < min_samples:
+            return None
+        return histogram.quantile(q)
+
+    def record_deadline_miss(self, stage: str):
+        self.deadline_misses[stage] = self.deadline_misses.get(stage, 0) + 1
 
     def get_metrics(self) -> Dict:
         """Return a copy of current metrics."""
-        return PerformanceMetricsModel(**self.metrics).dict()
\ No newline at end of file
+        return PerformanceMetricsModel(
+            **self.metrics,
+            endpoints={
+                endpoint: {**histogram.summary(), "errors": self.endpoint_errors.get(endpoint, 0)}
+                for endpoint, histogram in list(self.endpoints.items())
+            },
+            stages={stage: histogram.summary() for stage, histogram in list(self.stages.items())},
+            deadline_misses=dict(self.deadline_misses)
+        ).dict()
+
+    def prometheus(self) -> str:
+        """Métricas no formato texto de exposição do Prometheus (0.0.4)."""
+        lines = [
+            "# HELP email_classifier_requests_total Requisições por endpoint e resultado.",
+            "# TYPE email_classifier_requests_total counter"
+        ]
+        for endpoint, histogram in list(self.endpoints.items()):
+            errors = self.endpoint_errors.get(endpoint, 0)
+            lines.append(f'email_classifier_requests_total{{endpoint="{endpoint}",status="success"}} {histogram.count - errors}')
+            lines.append(f'email_classifier_requests_total{{endpoint="{endpoint}",status="error"}} {errors}')
+
+        lines += [
+            "# HELP email_classifier_deadline_misses_total Prazos estourados (resposta pelas regras) por estágio.",
+            "# TYPE email_classifier_deadline_misses_total counter"
+        ]
+        for stage, count in list(self.deadline_misses.items()):
+            lines.append(f'email_classifier_deadline_misses_total{{stage="{stage}"}} {count}')
+
+        lines += _histogram_lines(
+            "email_classifier_request_duration_seconds", "Latência das requisições por endpoint.",
+            "endpoint", self.endpoints
+        )
+        lines += _histogram_lines(
+            "email_classifier_stage_duration_seconds", "Latência de cada estágio do pipeline (por chamada ou lote).",
+            "stage", self.stages
+        )
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, help_text: str, label: str, histograms: Dict[str, LatencyHistogram]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for value, histogram in list(histograms.items()):
+        with histogram._lock:
+            counts, total, count = list(histogram.counts), histogram.total, histogram.count
+
+        cumulative = 0
+        for upper, bucket_count in zip(LATENCY_BUCKETS, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{label}="{value}",le="{upper}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label}="{value}",le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{{label}="{value}"}} {total}')
+        lines.append(f'{name}_count{{{label}="{value}"}} {count}')
+    return lines
@@ -0,0 +1,206 @@
+# profiling.py
+import os
+import sys
+import time
+import random
+import cProfile
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Amostra a pilha Python de uma thread em intervalo fixo, no formato "folded" do flamegraph.
+
+    Cada linha da saída é `frame;frame;...;frame contagem`, pronta para o
+    flamegraph.pl, speedscope ou inferno.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    """Perfis sob demanda de uma fração das classificações.
+
+    Desligado (`sample_rate` 0) custa uma comparação por chamada. Ligado, cada
+    chamada sorteada gera em `output_dir`:
+      - `*.folded`: pilhas amostradas (modo "sampling", padrão) ou
+        `*.prof`: estatísticas do cProfile (modo "cprofile", para snakeviz/pstats)
+      - `*.torch.json` e `*.torch.txt`: tempos por operador do torch (chrome
+        trace e tabela), com `torch_ops`
+    Só um perfil roda por vez no processo; chamadas sorteadas enquanto outro
+    perfil está ativo seguem sem perfil.
+    """
+
+    MODES = ("sampling", "cprofile")
+
+    def __init__(self, output_dir: str, sample_rate: float = 0.0, mode: str = "sampling",
+                 torch_ops: bool = False, interval_ms: float = 1.0, max_profiles: int = 100):
+        self.output_dir = output_dir
+        self.max_profiles = max(1, max_profiles)
+        self.sample_rate = 0.0
+        self.mode = "sampling"
+        self.torch_ops = False
+        self.interval_ms = interval_ms
+        self.expires_at = None
+        self.captured = 0
+        self.last_profile = None
+
+        self._active = threading.Lock()
+        self.configure(sample_rate=sample_rate, mode=mode, torch_ops=torch_ops)
+
+    def configure(self, sample_rate: float = None, mode: str = None, torch_ops: bool = None,
+                  duration_s: float = None) -> Dict[str, Any]:
+        """Altera a amostragem em tempo de execução; `duration_s` desliga sozinho depois do prazo"""
+        if mode is not None:
+            if mode not in self.MODES:
+                raise ValueError(f"Modo de profiling inválido: {mode}. Use {', '.join(self.MODES)}")
+            self.mode = mode
+        if torch_ops is not None:
+            self.torch_ops = torch_ops
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError("sample_rate deve estar entre 0 e 1")
+            self.expires_at = time.monotonic() + duration_s if duration_s and sample_rate else None
+            # Por último: é o que liga a amostragem no caminho das requisições
+            self.sample_rate = sample_rate
+            if sample_rate:
+                logger.info(f"🔬 Profiling ligado: {sample_rate:.1%} das chamadas ({self.mode}) em {self.output_dir}")
+        return self.get_stats()
+
+    def should_sample(self) -> bool:
+        if self.expires_at is not None and time.monotonic() > self.expires_at:
+            self.sample_rate = 0.0
+            self.expires_at = None
+            logger.info("🔬 Profiling desligado: prazo encerrado")
+            return False
+        return random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, name: str, **details):
+        """Perfila o bloco, se nenhum outro perfil estiver ativo neste processo"""
+        if not self._active.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            sampler = profiler = torch_profiler = None
+            if self.mode == "cprofile":
+                profiler = cProfile.Profile()
+            else:
+                sampler = StackSampler(threading.get_ident(), self.interval_ms / 1000)
+            if self.torch_ops:
+                import torch
+                torch_profiler = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU])
+
+            started = time.perf_counter()
+            if torch_profiler is not None:
+                torch_profiler.__enter__()
+            if sampler is not None:
+                sampler.start()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                if sampler is not None:
+                    sampler.stop()
+                if torch_profiler is not None:
+                    torch_profiler.__exit__(None, None, None)
+                elapsed = time.perf_counter() - started
+
+            self._write(name, elapsed, details, sampler, profiler, torch_profiler)
+        finally:
+            self._active.release()
+
+    def _write(self, name: str, elapsed: float, details: Dict[str, Any], sampler, profiler, torch_profiler):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            prefix = os.path.join(
+                self.output_dir,
+                f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self.captured:05d}-{name}-{elapsed * 1000:.0f}ms"
+            )
+
+            if sampler is not None:
+                with open(f"{prefix}.folded", "w") as folded_file:
+                    folded_file.write(sampler.folded())
+            if profiler is not None:
+                profiler.dump_stats(f"{prefix}.prof")
+            if torch_profiler is not None:
+                torch_profiler.export_chrome_trace(f"{prefix}.torch.json")
+                with open(f"{prefix}.torch.txt", "w") as table_file:
+                    table_file.write(torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=40))
+
+            self.captured += 1
+            self.last_profile = {"prefix": prefix, "seconds": round(elapsed, 4), **details}
+            self._prune()
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar perfil: {e}")
+
+    def _prune(self):
+        """Mantém só os `max_profiles` perfis mais recentes no diretório"""
+        profiles = {}
+        for filename in os.listdir(self.output_dir):
+            profiles.setdefault(filename.split(".", 1)[0], []).append(filename)
+        for prefix in sorted(profiles)[:-self.max_profiles]:
+            for filename in profiles[prefix]:
+                try:
+                    os.unlink(os.path.join(self.output_dir, filename))
+                except OSError:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.sample_rate > 0,
+            "sample_rate": self.sample_rate,
+            "mode": self.mode,
+            "torch_ops": self.torch_ops,
+            "output_dir": self.output_dir,
+            "expires_in": round(self.expires_at - time.monotonic(), 1) if self.expires_at else None,
+            "captured": self.captured,
+            "last_profile": self.last_profile
+        }
+
+
+def create_profiler() -> Profiler:
+    """Cria o profiler a partir das variáveis de ambiente (desligado por padrão)."""
+    return Profiler(
+        output_dir=os.getenv("PROFILING_DIR", "/tmp/email-classifier/profiles"),
+        sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+        mode=os.getenv("PROFILING_MODE", "sampling").lower(),
+        torch_ops=os.getenv("PROFILING_TORCH_OPS", "false").lower() == "true",
+        interval_ms=float(os.getenv("PROFILING_INTERVAL_MS", "1")),
+        max_profiles=int(os.getenv("PROFILING_MAX_PROFILES", "100"))
+    )
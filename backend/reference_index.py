@@ -0,0 +1,254 @@
+# reference_index.py
+import os
+import csv
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from models import EmailCategory
+
+logger = logging.getLogger(__name__)
+
+# Referências usadas quando nenhum arquivo de exemplos é configurado
+DEFAULT_REFERENCES = {
+    EmailCategory.PRODUTIVO: [
+        "problema erro sistema suporte técnico ajuda",
+        "solicitação pedido status andamento protocolo",
+        "reembolso pagamento transação defeito falha",
+        "urgente crítico não funciona quebrado"
+    ],
+    EmailCategory.IMPRODUTIVO: [
+        "obrigado agradeço parabéns feliz natal",
+        "cumprimentos saudações bom dia boa tarde",
+        "ano novo feriado fim de semana comemoração",
+        "elogios felicitações votos sucesso"
+    ]
+}
+
+
+def load_examples(path: str) -> Dict[EmailCategory, List[str]]:
+    """Exemplos rotulados de um arquivo .jsonl ({"text", "label"} por linha) ou .csv (colunas text,label)."""
+    examples = {category: [] for category in EmailCategory}
+
+    with open(path, encoding="utf-8", newline="") as examples_file:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(examples_file)
+        else:
+            rows = (json.loads(line) for line in examples_file if line.strip())
+
+        for line_number, row in enumerate(rows, start=1):
+            text = str(row.get("text") or "").strip()
+            label = str(row.get("label") or "").strip().upper()
+            if not text:
+                continue
+            if label not in EmailCategory.__members__:
+                raise ValueError(f"Rótulo inválido na linha {line_number}: {row.get('label')!r}")
+            examples[EmailCategory[label]].append(text)
+
+    for category, texts in examples.items():
+        if not texts:
+            raise ValueError(f"Nenhum exemplo {category.value} em {path}")
+
+    return examples
+
+
+class ReferenceIndex:
+    """Exemplos rotulados por categoria com embeddings normalizados, trocáveis sem restart.
+
+    O score produtivo de um lote sai de produtos de matrizes contra as referências:
+      - "centroid": similaridade com a média dos exemplos de cada categoria
+        (igual à média das similaridades); custo constante no tamanho do conjunto
+      - "knn": média das `k` maiores similaridades em cada categoria (busca exata)
+
+    Com `path`, o arquivo é verificado a cada `reload_interval` segundos (no
+    caminho das requisições, só um stat) e, se mudou, re-codificado em uma
+    thread; o conjunto novo entra com uma única atribuição e as requisições em
+    andamento terminam com o anterior.
+    """
+
+    SCORINGS = ("centroid", "knn")
+
+    def __init__(self, encode: Callable[[List[str]], torch.Tensor], path: str = None,
+                 scoring: str = "centroid", k: int = 16, reload_interval: float = 30,
+                 cache_path: str = None, model_signature: str = ""):
+        if scoring not in self.SCORINGS:
+            raise ValueError(f"Scoring de referências inválido: {scoring}. Use {', '.join(self.SCORINGS)}")
+
+        self.encode = encode
+        self.path = path
+        self.scoring = scoring
+        self.k = max(1, k)
+        self.reload_interval = reload_interval
+        self.cache_path = cache_path
+        self.model_signature = model_signature
+
+        self.current: Optional[Dict[str, Any]] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._failed_stat = None
+        self._last_check = time.monotonic()
+
+    def load(self) -> Dict[str, Any]:
+        """Carrega (ou recarrega) o conjunto de referências e o coloca em uso"""
+        snapshot = self._build()
+        self.current = snapshot
+        logger.info(
+            f"📚 Referências {snapshot['version']} em uso ({snapshot['source']}): "
+            f"{snapshot['counts'][EmailCategory.PRODUTIVO.value]} produtivas, "
+            f"{snapshot['counts'][EmailCategory.IMPRODUTIVO.value]} improdutivas"
+        )
+        return snapshot
+
+    def maybe_reload(self):
+        """Dispara a recarga em segundo plano se o arquivo mudou desde o último carregamento"""
+        if not self.path or self.reload_interval <= 0 or self.current is None:
+            return
+
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+
+        with self._lock:
+            if self._reloading or now - self._last_check < self.reload_interval:
+                return
+            self._last_check = now
+            file_stat = self._file_stat()
+            # Uma versão do arquivo que já falhou só é tentada de novo quando mudar
+            if file_stat in (self.current["file_stat"], self._failed_stat):
+                return
+            self._reloading = True
+
+        threading.Thread(target=self._reload, args=(file_stat,), name="reference-reload", daemon=True).start()
+
+    def _reload(self, file_stat):
+        try:
+            self.load()
+            self.reloads += 1
+            self.last_error = None
+        except Exception as e:
+            self._failed_stat = file_stat
+            self.reload_errors += 1
+            self.last_error = str(e)
+            logger.error(f"❌ Erro ao recarregar referências de {self.path} - mantendo as atuais: {e}")
+        finally:
+            self._reloading = False
+
+    def _file_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _build(self) -> Dict[str, Any]:
+        file_stat = None
+        if self.path:
+            file_stat = self._file_stat()
+            examples = load_examples(self.path)
+            source = self.path
+        else:
+            examples = DEFAULT_REFERENCES
+            source = "padrão"
+
+        productive = examples[EmailCategory.PRODUTIVO]
+        improductive = examples[EmailCategory.IMPRODUTIVO]
+        signature = hashlib.sha256(
+            f"{self.model_signature}|{productive}|{improductive}".encode("utf-8")
+        ).hexdigest()
+
+        embeddings = self._load_cached(signature)
+        if embeddings is None:
+            encoded = self.encode(productive + improductive).detach().cpu().float()
+            embeddings = (encoded[:len(productive)], encoded[len(productive):])
+            self._save_cached(signature, embeddings)
+
+        prod_refs, improd_refs = (torch.nn.functional.normalize(refs, dim=1) for refs in embeddings)
+        return {
+            "version": signature[:12],
+            "source": source,
+            "file_stat": file_stat,
+            "loaded_at": time.time(),
+            "counts": {EmailCategory.PRODUTIVO.value: len(productive), EmailCategory.IMPRODUTIVO.value: len(improductive)},
+            "productive": prod_refs,
+            "improductive": improd_refs,
+            # Média das referências normalizadas: e·mean(r) == mean(e·r)
+            "centroids": torch.stack([prod_refs.mean(dim=0), improd_refs.mean(dim=0)])
+        }
+
+    def _load_cached(self, signature: str):
+        """Embeddings salvos em disco, se foram gerados com o mesmo modelo e os mesmos exemplos"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with np.load(self.cache_path) as saved:
+                if str(saved["signature"]) == signature:
+                    logger.info(f"💾 Embeddings de referência carregados de {self.cache_path}")
+                    return torch.from_numpy(saved["productive"]), torch.from_numpy(saved["improductive"])
+            logger.info("🔄 Embeddings de referência desatualizados - recalculando")
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler embeddings de referência: {e}")
+        return None
+
+    def _save_cached(self, signature: str, embeddings):
+        if not self.cache_path:
+            return
+        try:
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as tmp_file:
+                np.savez(
+                    tmp_file,
+                    signature=np.array(signature),
+                    productive=embeddings[0].numpy().astype(np.float32),
+                    improductive=embeddings[1].numpy().astype(np.float32)
+                )
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"❌ Erro ao salvar embeddings de referência: {e}")
+
+    def scores(self, embeddings: torch.Tensor, snapshot: Dict[str, Any] = None) -> torch.Tensor:
+        """Score produtivo (float64) de cada linha de `embeddings`, já normalizadas"""
+        snapshot = snapshot or self.current
+
+        with torch.no_grad():
+            if self.scoring == "knn":
+                prod = self._top_k_mean(embeddings @ snapshot["productive"].T)
+                impr = self._top_k_mean(embeddings @ snapshot["improductive"].T)
+            else:
+                similarities = embeddings @ snapshot["centroids"].T
+                prod, impr = similarities[:, 0], similarities[:, 1]
+
+        prod, impr = prod.double(), impr.double()
+        total = prod + impr
+        return torch.where(total == 0, torch.full_like(total, 0.5), prod / total)
+
+    def _top_k_mean(self, similarities: torch.Tensor) -> torch.Tensor:
+        return similarities.topk(min(self.k, similarities.shape[1]), dim=1).values.mean(dim=1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self.current
+        return {
+            "enabled": snapshot is not None,
+            "scoring": self.scoring,
+            "k": self.k if self.scoring == "knn" else None,
+            "source": snapshot["source"] if snapshot else self.path,
+            "version": snapshot["version"] if snapshot else None,
+            "counts": snapshot["counts"] if snapshot else {},
+            "loaded_at": snapshot["loaded_at"] if snapshot else None,
+            "reload_interval": self.reload_interval if self.path else None,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error
+        }
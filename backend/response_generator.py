@@ -2,8 +2,9 @@
 import random
 import time
 import logging
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from models import EmailCategory
+from text_processor import AnalysisContext
 
 logger = logging.getLogger(__name__)
 
@@ -57,22 +58,30 @@ class ResponseGenerator:
         }
 
     def generate(self, category: EmailCategory, original_text: str, classification_data: Dict = None) -> str:
-        """Gera a resposta completa baseada na categoria."""
+        """Gera a resposta completa baseada na categoria.
+
+        Reaproveita o contexto de análise que o classificador deixa em
+        `classification_data["analysis"]`; sem ele, monta um contexto próprio.
+        """
         try:
-            text_lower = original_text.lower()
-            
+            context = (classification_data or {}).get("analysis") or AnalysisContext(original_text)
+
             if category == EmailCategory.PRODUTIVO:
-                return self._generate_productive_response(text_lower, original_text)
+                return self._generate_productive_response(context)
             else:
-                return self._generate_improductive_response(text_lower, original_text)
+                return self._generate_improductive_response(context)
                 
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
             return self._generate_fallback_response(category)
 
-    def _generate_productive_response(self, text_lower: str, original_text: str) -> str:
+    def generate_batch(self, items: List[Tuple[EmailCategory, str, Dict]]) -> List[str]:
+        """Gera respostas para um lote de (categoria, texto, dados da classificação)."""
+        return [self.generate(category, text, data) for category, text, data in items]
+
+    def _generate_productive_response(self, context: AnalysisContext) -> str:
         """Gera resposta para emails produtivos."""
-        if 'reembolso' in text_lower or 'estorno' in text_lower:
+        if context.contains_any(('reembolso', 'estorno')):
             return (
                 "Prezado(a),\n\n"
                 "Recebemos sua solicitação de reembolso. Sua solicitação foi registrada sob o protocolo "
@@ -80,14 +89,14 @@ class ResponseGenerator:
                 "O prazo para análise é de até 5 dias úteis.\n\n"
                 "Atenciosamente,\nEquipe Financeira"
             )
-        elif any(word in text_lower for word in ['login', 'senha', 'acesso', 'conta']):
+        elif context.contains_any(('login', 'senha', 'acesso', 'conta')):
             return (
                 "Prezado(a),\n\n"
                 "Identificamos sua solicitação de acesso. Sua demanda foi registrada sob o protocolo "
                 f"ACS-{int(time.time())} e será atendida por nossa equipe de segurança em até 24 horas.\n\n"
                 "Atenciosamente,\nEquipe de Acesso"
             )
-        elif 'urgente' in text_lower or 'emergência' in text_lower or 'crítico' in text_lower:
+        elif context.contains_any(('urgente', 'emergência', 'crítico')):
             return (
                 "Prezado(a),\n\n"
                 "URGENTE: Sua solicitação foi recebida com prioridade máxima. "
@@ -95,25 +104,25 @@ class ResponseGenerator:
                 "Atenciosamente,\nEquipe de Emergência"
             )
         else:
-            return self._generate_generic_productive_response(original_text)
+            return self._generate_generic_productive_response(context.text)
 
-    def _generate_improductive_response(self, text_lower: str, original_text: str) -> str:
+    def _generate_improductive_response(self, context: AnalysisContext) -> str:
         """Gera resposta para emails improdutivos."""
-        if any(word in text_lower for word in ['obrigado', 'agradeço', 'grato', 'obrigada']):
+        if context.contains_any(('obrigado', 'agradeço', 'grato', 'obrigada')):
             return (
                 "Prezado(a),\n\n"
                 "Agradecemos profundamente suas palavras! Ficamos muito felizes em saber "
                 "que nosso atendimento foi satisfatório. Conte sempre conosco!\n\n"
                 "Atenciosamente,\nNossa Equipe"
             )
-        elif any(word in text_lower for word in ['parabéns', 'felicitações', 'congratulations']):
+        elif context.contains_any(('parabéns', 'felicitações', 'congratulations')):
             return (
                 "Prezado(a),\n\n"
                 "Que alegria receber suas felicitações! Muito obrigado pelo carinho e atenção. "
                 "Desejamos tudo de bom para você também!\n\n"
                 "Atenciosamente,\nNossa Equipe"
             )
-        elif any(word in text_lower for word in ['natal', 'ano novo', 'réveillon']):
+        elif context.contains_any(('natal', 'ano novo', 'réveillon')):
             return (
                 "Prezado(a),\n\n"
                 "Agradecemos seus votos! Desejamos a você e sua família um excelente "
@@ -121,11 +130,10 @@ class ResponseGenerator:
                 "Atenciosamente,\nToda a Equipe"
             )
         else:
-            return self._generate_generic_improductive_response(original_text)
+            return self._generate_generic_improductive_response(context.text)
 
     def _generate_generic_productive_response(self, text: str) -> str:
         """Gera resposta genérica para emails produtivos."""
-        subject = self._extract_subject(text)
         protocol = self._generate_protocol()
         prazo = self._get_time_frame("medium")
 
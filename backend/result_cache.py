@@ -0,0 +1,277 @@
+# result_cache.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from models import EmailCategory
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    """Cache em memória com despejo LRU, TTL e limite de entradas/bytes."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10_000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "evictions": self.evictions
+        }
+
+
+class DiskCacheBackend:
+    """Cache em SQLite local, compartilhado entre processos workers.
+
+    Mesma política do backend em memória (LRU + TTL + limites), usando a
+    coluna `last_access` para a ordem LRU.
+    """
+
+    name = "disk"
+
+    EVICTION_CHECK_INTERVAL = 32
+
+    def __init__(self, path: str, max_entries: int = 10_000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = None
+        self._conn_pid = None
+        self._connect()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn_pid = os.getpid()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Conexões SQLite não podem atravessar um fork (gunicorn com preload_app)
+        if self._conn_pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at < now:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+
+            conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + self.ttl, now)
+            )
+
+            self._writes += 1
+            if self._writes % self.EVICTION_CHECK_INTERVAL == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+
+        entries, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+
+        while entries > self.max_entries or total_bytes > self.max_bytes:
+            excess = max(entries - self.max_entries, 1)
+            rows = self._conn.execute(
+                "SELECT key, size FROM cache ORDER BY last_access LIMIT ?", (excess,)
+            ).fetchall()
+            if not rows:
+                break
+
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key, _ in rows])
+            entries -= len(rows)
+            total_bytes -= sum(size for _, size in rows)
+            self.evictions += len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total_bytes = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "entries": entries,
+            "bytes": total_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "evictions": self.evictions
+        }
+
+
+class ClassificationCache:
+    """Cache de resultados de classificação endereçado por conteúdo.
+
+    A chave é o hash do texto original junto com a versão de
+    modelo/configuração: palavras-chave, tópicos e regras olham o texto
+    original, então dois emails que só coincidem depois do pré-processamento
+    não compartilham resultado.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        # Consultado pelas threads do executor de inferência
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(text: str, version: str) -> str:
+        return hashlib.sha256(f"{version}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.error(f"Erro ao ler cache: {e}")
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None:
+            return None
+
+        result = json.loads(value)
+        result["category"] = EmailCategory(result["category"])
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        payload = dict(result, category=EmailCategory(result["category"]).value)
+        try:
+            self.backend.set(key, json.dumps(payload, ensure_ascii=False))
+        except Exception as e:
+            logger.error(f"Erro ao gravar cache: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "enabled": True,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "miss_rate": round(misses / lookups, 4) if lookups else 0.0,
+            **self.backend.get_stats()
+        }
+
+
+def create_result_cache() -> Optional[ClassificationCache]:
+    """Cria o cache de resultados a partir das variáveis de ambiente."""
+    backend_name = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()
+    if backend_name in ("", "none", "off", "false"):
+        return None
+
+    max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+    max_bytes = int(float(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024)
+    ttl = float(os.getenv("RESULT_CACHE_TTL_S", "3600"))
+
+    if backend_name == "disk":
+        path = os.getenv("RESULT_CACHE_PATH", "/tmp/email-classifier/result-cache.sqlite3")
+        backend = DiskCacheBackend(path, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+    elif backend_name == "memory":
+        backend = MemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+    else:
+        raise ValueError(f"Backend de cache inválido: {backend_name}. Use memory, disk ou none")
+
+    logger.info(f"🗃️ Cache de resultados: {backend.name} ({max_entries} entradas, TTL {ttl:.0f}s)")
+    return ClassificationCache(backend)
@@ -1,14 +1,99 @@
 # text_processor.py
 import re
 import logging
-from typing import List, Dict
+from collections import Counter
+from typing import List, Dict, Iterable, Iterator, Optional
+
+from keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+NEUTRAL_KEYWORD_FEATURES = {"productive_score": 0.5, "improductive_score": 0.5, "keyword_confidence": 0.05}
+
+
+class AnalysisContext:
+    """Análise de um email feita uma vez e compartilhada pelo classificador e pelo gerador de respostas.
+
+    O texto em minúsculas, o texto preprocessado, as contagens de termos
+    (palavras-chave e tópicos em uma única varredura), as features e os
+    tópicos são calculados na primeira vez em que são pedidos. A presença de
+    trechos (`contains`) é memorizada por termo. Sem `processor`, só o texto
+    em minúsculas e os trechos estão disponíveis (como depois de atravessar
+    o pool de processos, que não leva o TextProcessor junto).
+    """
+
+    __slots__ = ("text", "_processor", "_lower", "_processed", "_counts", "_features", "_topics", "_contains")
+
+    def __init__(self, text: str, processor: "TextProcessor" = None):
+        self.text = text
+        self._processor = processor
+        self._lower: Optional[str] = None
+        self._processed: Optional[str] = None
+        self._counts: Optional[Counter] = None
+        self._features: Optional[Dict[str, float]] = None
+        self._topics: Optional[List[str]] = None
+        self._contains: Dict[str, bool] = {}
+
+    @property
+    def text_lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def processed_text(self) -> str:
+        if self._processed is None:
+            self._processed = self._processor.preprocess(self.text)
+        return self._processed
+
+    @property
+    def tokens(self) -> List[str]:
+        return self.processed_text.split()
+
+    @property
+    def term_counts(self) -> Counter:
+        if self._counts is None:
+            self._counts = self._processor.term_matcher.counts(self.text_lower) if self.text else Counter()
+        return self._counts
+
+    @property
+    def keyword_features(self) -> Dict[str, float]:
+        if self._features is None:
+            self._features = self._processor.keyword_features_from_counts(self.term_counts)
+        return self._features
+
+    @property
+    def topics(self) -> List[str]:
+        if self._topics is None:
+            self._topics = self._processor.topics_from_counts(self.term_counts)
+        return self._topics
+
+    def contains(self, term: str) -> bool:
+        """Se o trecho aparece no texto em minúsculas (busca de substring, como `in`)"""
+        found = self._contains.get(term)
+        if found is None:
+            found = self._contains[term] = term in self.text_lower
+        return found
+
+    def contains_any(self, terms: Iterable[str]) -> bool:
+        return any(self.contains(term) for term in terms)
+
+    def __getstate__(self):
+        # O TextProcessor fica de fora; o que já foi calculado vai junto
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != "_processor"}
+
+    def __setstate__(self, state):
+        self._processor = None
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
 
 class TextProcessor:
     """Processamento de texto otimizado para classificação de emails."""
 
+    # Vocabulário de emails é pequeno: token bruto -> token normalizado
+    TOKEN_CACHE_SIZE = 50_000
+
     def __init__(self):
         self.stop_words = {
             'para','com','de','da','do','em','um','uma','os','as','ao','aos','na','nas','no','nos',
@@ -22,8 +107,10 @@ class TextProcessor:
             'email': re.compile(r'\b[\w\.-]+@[\w\.-]+\.\w+\b'),
             'url': re.compile(r'https?://\S+'),
             'phone': re.compile(r'\(?\d{2}\)?\s?\d{4,5}-?\d{4}'),
-            'token': re.compile(r'\b[\wçáàâãéêíóôõú]+(?:-[\w]+)?\b')
+            # Letras/dígitos mantidos pela limpeza; qualquer outro caractere separa tokens
+            'token': re.compile(r'[0-9A-Za-zÀ-ÖØ-öø-ÿ]+(?:-[0-9A-Za-zÀ-ÖØ-öø-ÿ]+)?')
         }
+        self._normalized_tokens: Dict[str, Optional[str]] = {}
 
         self.productive_keywords = {
             'problema': 2.0, 'erro': 2.0, 'falha': 2.0, 'defeito': 2.0,
@@ -40,28 +127,71 @@ class TextProcessor:
             'feriado': 1.6, 'cumprimentos': 1.4
         }
 
+        self.topic_categories = {
+            'suporte técnico': ['problema', 'erro', 'falha', 'bug', 'sistema', 'aplicação'],
+            'financeiro': ['pagamento', 'fatura', 'reembolso', 'transação'],
+            'acesso': ['login', 'senha', 'conta', 'acesso'],
+            'cumprimentos': ['obrigado', 'parabéns', 'feliz', 'saudações'],
+        }
+
+        # Palavras-chave e tópicos contados juntos: uma única varredura do texto por email
+        self.term_matcher = KeywordMatcher({
+            'productive': self.productive_keywords,
+            'improductive': self.improductive_keywords,
+            **{topic: dict.fromkeys(keywords, 1.0) for topic, keywords in self.topic_categories.items()}
+        })
+
+    def analyze(self, text: str) -> AnalysisContext:
+        """Contexto de análise do email, calculado sob demanda e reaproveitado no pipeline."""
+        return AnalysisContext(text, self)
+
     def preprocess(self, text: str) -> str:
         """Limpa e prepara texto para análise."""
         if not text or not isinstance(text, str):
             return ""
 
         try:
-            text = self._clean_text(text)
-            tokens = self.patterns['token'].findall(text.lower())
-            tokens = [t for t in tokens if t not in self.stop_words and len(t) > 2]
-            tokens = [self._simple_lemmatize(t) for t in tokens]
-            return " ".join(tokens)
+            return " ".join(self.iter_tokens(text))
         except Exception as e:
             logger.error(f"Erro no preprocessamento: {e}")
             return text
 
-    def _clean_text(self, text: str) -> str:
-        """Remove emails, URLs, telefones e caracteres indesejados."""
-        text = self.patterns['email'].sub("", text)
-        text = self.patterns['url'].sub("", text)
-        text = self.patterns['phone'].sub("", text)
-        text = re.sub(r"[^0-9A-Za-zÀ-ÖØ-öø-ÿ!?.,\s-]", " ", text)
-        return re.sub(r"\s+", " ", text).strip()
+    def iter_tokens(self, text: str) -> Iterator[str]:
+        """Gera os tokens normalizados do texto sob demanda, em uma única passada.
+
+        Depois de remover emails, URLs e telefones, cada token é minúsculo,
+        filtrado (stop words, tamanho) e lematizado conforme é encontrado, sem
+        materializar o texto limpo nem listas intermediárias. A normalização de
+        cada token distinto é memorizada.
+        """
+        text = self._remove_contacts(text)
+        normalized = self._normalized_tokens
+        if len(normalized) > self.TOKEN_CACHE_SIZE:
+            normalized.clear()
+
+        for match in self.patterns['token'].finditer(text):
+            raw = match.group()
+            token = normalized.get(raw, False)
+            if token is False:
+                token = self._normalize_token(raw)
+                normalized[raw] = token
+            if token is not None:
+                yield token
+
+    def _normalize_token(self, raw: str) -> Optional[str]:
+        """Minúsculas, filtro de stop words/tamanho e lematização; None se o token é descartado."""
+        token = raw.lower()
+        if len(token) <= 2 or token in self.stop_words:
+            return None
+        return self._simple_lemmatize(token)
+
+    def _remove_contacts(self, text: str) -> str:
+        """Remove emails, URLs e telefones (pulando os padrões que não podem casar)."""
+        if "@" in text:
+            text = self.patterns['email'].sub("", text)
+        if "http" in text:
+            text = self.patterns['url'].sub("", text)
+        return self.patterns['phone'].sub("", text)
 
     def _simple_lemmatize(self, token: str) -> str:
         """Lematização simples: plural → singular."""
@@ -72,21 +202,17 @@ class TextProcessor:
     def extract_keyword_features(self, text: str) -> Dict[str, float]:
         """Calcula scores de palavras-chave produtivas e improdutivas."""
         if not text:
-            return {"productive_score": 0.5, "improductive_score": 0.5, "keyword_confidence": 0.05}
-
-        text_lower = text.lower()
-        productive_score = sum(
-            len(re.findall(rf"\b{re.escape(kw)}\b", text_lower)) * weight
-            for kw, weight in self.productive_keywords.items()
-        )
-        improductive_score = sum(
-            len(re.findall(rf"\b{re.escape(kw)}\b", text_lower)) * weight
-            for kw, weight in self.improductive_keywords.items()
-        )
+            return dict(NEUTRAL_KEYWORD_FEATURES)
+
+        return self.keyword_features_from_counts(self.term_matcher.counts(text.lower()))
+
+    def keyword_features_from_counts(self, counts: Counter) -> Dict[str, float]:
+        productive_score = sum(counts[term] * weight for term, weight in self.productive_keywords.items())
+        improductive_score = sum(counts[term] * weight for term, weight in self.improductive_keywords.items())
 
         total = productive_score + improductive_score
         if total == 0:
-            return {"productive_score": 0.5, "improductive_score": 0.5, "keyword_confidence": 0.05}
+            return dict(NEUTRAL_KEYWORD_FEATURES)
 
         return {
             "productive_score": productive_score / total,
@@ -99,18 +225,11 @@ class TextProcessor:
         if not text:
             return []
 
-        text_lower = text.lower()
-        topics = []
-
-        topic_categories = {
-            'suporte técnico': ['problema', 'erro', 'falha', 'bug', 'sistema', 'aplicação'],
-            'financeiro': ['pagamento', 'fatura', 'reembolso', 'transação'],
-            'acesso': ['login', 'senha', 'conta', 'acesso'],
-            'cumprimentos': ['obrigado', 'parabéns', 'feliz', 'saudações'],
-        }
-
-        for topic, keywords in topic_categories.items():
-            if any(re.search(rf"\b{kw}\b", text_lower) for kw in keywords):
-                topics.append(topic)
+        return self.topics_from_counts(self.term_matcher.counts(text.lower()))
 
-        return topics[:3]
\ No newline at end of file
+    def topics_from_counts(self, counts: Counter) -> List[str]:
+        topics = [
+            topic for topic, keywords in self.topic_categories.items()
+            if any(counts[keyword] for keyword in keywords)
+        ]
+        return topics[:3]
@@ -0,0 +1,64 @@
+# text_windows.py
+import re
+from typing import List
+
+# Estimativa de tokens sem tokenizer: palavras e sinais de pontuação
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+_WORD_PATTERN = re.compile(r"\S+")
+# Limite folgado de caracteres por token: textos acima de max_tokens * isto são
+# recusados sem passar pelo tokenizer
+MAX_CHARS_PER_TOKEN = 8
+# Média de caracteres por token em texto corrido: dimensiona limites de
+# extração para que o texto extraído caiba no limite de tokens
+TYPICAL_CHARS_PER_TOKEN = 4
+
+
+def exceeds_char_bound(text: str, max_tokens: int) -> bool:
+    return len(text) > max_tokens * MAX_CHARS_PER_TOKEN
+
+
+def count_tokens(text: str, tokenizer=None) -> int:
+    """Tokens do texto no tokenizer do modelo (ou uma estimativa, sem tokenizer)."""
+    if not text:
+        return 0
+    if tokenizer is None:
+        return sum(1 for _ in _PIECE_PATTERN.finditer(text))
+    return len(tokenizer(text, add_special_tokens=False, truncation=False, verbose=False)["input_ids"])
+
+
+def token_windows(text: str, tokenizer, max_tokens: int, overlap: int = 0) -> List[str]:
+    """Divide o texto em janelas de até `max_tokens` tokens, alinhadas aos tokens do modelo.
+
+    Janelas consecutivas compartilham `overlap` tokens. Cada janela é um
+    trecho do texto original (pelos offsets do tokenizer), então o modelo
+    re-tokeniza exatamente os mesmos tokens. O custo é linear no tamanho do
+    texto: uma tokenização completa mais uma por janela.
+
+    Sem tokenizer (ou sem offsets), usa palavras separadas por espaço como tokens.
+    """
+    if not text:
+        return [text]
+
+    spans = None
+    if tokenizer is not None:
+        try:
+            spans = tokenizer(
+                text, add_special_tokens=False, truncation=False, return_offsets_mapping=True, verbose=False
+            )["offset_mapping"]
+        except (NotImplementedError, KeyError, TypeError, ValueError):
+            spans = None
+    if spans is None:
+        spans = [match.span() for match in _WORD_PATTERN.finditer(text)]
+
+    if len(spans) <= max_tokens:
+        return [text]
+
+    step = max(1, max_tokens - overlap)
+    windows = []
+    for start in range(0, len(spans), step):
+        end = min(start + max_tokens, len(spans))
+        windows.append(text[spans[start][0]:spans[end - 1][1]])
+        if end == len(spans):
+            break
+
+    return windows
@@ -2,6 +2,7 @@
 class EmailClassifierApp {
     constructor() {
         this.currentFile = null;
+        this.currentDocument = null; // { file, documentId } do último /upload
         this.isProcessing = false;
         this.backendAvailable = false;
         this.init();
@@ -158,36 +159,35 @@ class EmailClassifierApp {
     }
 
     // Manipulação de arquivos
-    async extractTextFromFile(file) {
+    async buildFilePayload(file) {
         if (file.type === 'application/pdf') {
-            // Para PDF, faz upload e extração no backend
-            return await this.uploadAndExtractFile(file);
-        } else {
-            return await this.readAsText(file);
+            // PDF é extraído uma única vez no backend; /classify reaproveita o texto pelo document_id
+            return { document_id: await this.uploadFile(file) };
         }
+        return { text: (await this.readAsText(file)).trim() };
     }
 
-    async uploadAndExtractFile(file) {
+    async uploadFile(file) {
+        if (this.currentDocument?.file === file) {
+            return this.currentDocument.documentId;
+        }
+
         const formData = new FormData();
         formData.append('file', file);
 
-        try {
-            const response = await fetch(CONFIG.getApiUrl('upload'), {
-                method: 'POST',
-                body: formData
-            });
-
-            if (!response.ok) {
-                throw new Error(`Erro no upload: ${response.status}`);
-            }
+        const response = await fetch(CONFIG.getApiUrl('upload'), {
+            method: 'POST',
+            body: formData
+        });
 
-            const result = await response.json();
-            return result.text || "Conteúdo extraído com sucesso. Clique em 'Analisar Email'.";
-            
-        } catch (error) {
-            console.error('Erro no upload:', error);
-            return await this.readAsText(file); // Fallback para leitura local
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => null);
+            throw new Error(errorData?.detail || errorData?.error || `Erro no upload: ${response.status}`);
         }
+
+        const result = await response.json();
+        this.currentDocument = { file, documentId: result.document_id };
+        return result.document_id;
     }
 
     readAsText(file) {
@@ -232,6 +232,7 @@ class EmailClassifierApp {
         }
 
         this.currentFile = file;
+        this.currentDocument = null;
         this.displayFileInfo(file);
 
         document.querySelectorAll('.input-option').forEach(opt => opt.classList.remove('active'));
@@ -270,28 +271,30 @@ class EmailClassifierApp {
 
         const activeOption = document.querySelector('.input-option.active');
         const optionType = activeOption?.dataset.option;
-        let emailContent = '';
+        let payload = null;
 
         // Validação de conteúdo
         if (optionType === 'text') {
-            emailContent = document.getElementById('emailText').value.trim();
+            payload = { text: document.getElementById('emailText').value.trim() };
         } else if (optionType === 'file' && this.currentFile) {
             try {
                 this.showNotification('📁 Processando arquivo...', 'info');
-                emailContent = await this.extractTextFromFile(this.currentFile);
+                payload = await this.buildFilePayload(this.currentFile);
             } catch (err) {
                 this.showNotification('Erro ao processar arquivo: ' + err.message, 'error');
                 return;
             }
         }
 
-        if (!emailContent) {
+        if (!payload || !(payload.text || payload.document_id)) {
             this.showNotification('Por favor, insira o conteúdo do email ou selecione um arquivo.', 'warning');
             return;
         }
 
-        if (emailContent.length > 10000) {
-            this.showNotification('Texto muito longo. Máximo: 10.000 caracteres.', 'warning');
+        // O limite exato é em tokens do modelo (MAX_INPUT_TOKENS, verificado pelo
+        // backend); textos muito acima dele nem são enviados
+        if (emailContent.length > 32768) {
+            this.showNotification('Texto muito longo. Máximo: 32.768 caracteres.', 'warning');
             return;
         }
 
@@ -299,20 +302,22 @@ class EmailClassifierApp {
         this.isProcessing = true;
 
         try {
-            const payload = { text: emailContent };
-            const response = await fetch(CONFIG.getApiUrl('classify'), {
-                method: 'POST',
-                headers: { 
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                },
-                body: JSON.stringify(payload),
-                signal: AbortSignal.timeout(CONFIG.timeout)
-            });
+            let response = await this.requestClassification(payload);
+
+            if (response.status === 404 && payload.document_id) {
+                // Documento expirou no servidor: envia o arquivo de novo uma vez
+                this.currentDocument = null;
+                payload = await this.buildFilePayload(this.currentFile);
+                response = await this.requestClassification(payload);
+            }
 
             if (!response.ok) {
                 const errorData = await response.json().catch(() => null);
-                const msg = errorData?.detail || errorData?.error || `Erro HTTP ${response.status}`;
+                let msg = errorData?.detail || errorData?.error || `Erro HTTP ${response.status}`;
+                const retryAfter = response.headers.get('Retry-After');
+                if ((response.status === 429 || response.status === 503) && retryAfter) {
+                    msg += ` (tente novamente em ${retryAfter}s)`;
+                }
                 throw new Error(msg);
             }
 
@@ -329,6 +334,18 @@ class EmailClassifierApp {
         }
     }
 
+    requestClassification(payload) {
+        return fetch(CONFIG.getApiUrl('classify'), {
+            method: 'POST',
+            headers: { 
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            body: JSON.stringify(payload),
+            signal: AbortSignal.timeout(CONFIG.timeout)
+        });
+    }
+
     displayResults(data) {
         const resultsSection = document.getElementById('resultsSection');
         const categoryBadge = document.getElementById('categoryBadge');
@@ -404,6 +421,7 @@ class EmailClassifierApp {
         uploadArea.style.display = 'block';
         fileInput.value = '';
         this.currentFile = null;
+        this.currentDocument = null;
 
         document.querySelectorAll('.input-option').forEach(opt => opt.classList.remove('active'));
         document.querySelector('[data-option="text"]').classList.add('active');